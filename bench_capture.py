@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+二进制抓包测试
+写入一个较大的抓包文件 (交通报告为主，夹杂心跳和自机报告)，比较与JSON消息日志的体积，
+并统计写入速度和mmap扫描速度。
+"""
+
+import sys
+import os
+import importlib.util
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_capture import CaptureWriter, CaptureReader
+from gdl90_msglog import format_log_record
+
+# xp/目录下有同名模块，按路径加载根目录的接收端 (用于生成对比用的JSON日志行)
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+FRAMES = 500000
+ADDR = ('192.168.1.20', 49002)
+
+def _frames(rng):
+    """约98%交通报告，其余为心跳和自机报告 (与仓库中的receiver_messages.log比例相近)"""
+    encoder = InlineGDL90Encoder()
+    traffic = [bytes(encoder.create_traffic_report({
+        'icao_address': 0xA00000 + i, 'lat': 47.0 + rng.uniform(-1, 1), 'lon': -122.0 + rng.uniform(-1, 1),
+        'alt': rng.uniform(1000, 30000), 'speed': rng.uniform(80, 450), 'track': rng.uniform(0, 360),
+        'vs': rng.uniform(-1500, 1500), 'callsign': f'T{i:04d}'})) for i in range(200)]
+    others = [bytes(encoder.create_heartbeat()),
+              bytes(encoder.create_position_report({'lat': 47.0, 'lon': -122.0, 'alt': 3000.0}))]
+    return [rng.choice(others) if rng.random() < 0.02 else rng.choice(traffic) for _ in range(FRAMES)]
+
+def _json_bytes_per_frame(frames):
+    """用接收端的消息日志格式化函数估算JSON日志每帧字节数"""
+    decoder = _receiver.GDL90Decoder()
+    sample = frames[:5000]
+    total = sum(len(format_log_record(decoder, (i, time.time(), ADDR, frame)).encode('utf-8')) + 1
+                for i, frame in enumerate(sample))
+    return total / len(sample)
+
+def run_benchmark():
+    frames = _frames(random.Random(9))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.gdl90cap')
+        writer = CaptureWriter(path)
+        base = writer.start_mono_ns
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            writer.write(frame, ADDR, base + i * 200_000)
+        writer.close()
+        write_elapsed = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        count = 0
+        with CaptureReader(path) as reader:
+            for _, _, frame in reader:
+                count += 1
+        scan_elapsed = time.perf_counter() - start
+        assert count == FRAMES
+
+    capture_per_frame = size / FRAMES
+    json_per_frame = _json_bytes_per_frame(frames)
+    print(f"📊 二进制抓包 ({FRAMES} 帧)")
+    print(f"   体积: 抓包 {capture_per_frame:.1f} 字节/帧, JSON日志 {json_per_frame:.1f} 字节/帧 "
+          f"({json_per_frame / capture_per_frame:.1f}x)")
+    print(f"   写入: {FRAMES / write_elapsed:,.0f} 帧/秒")
+    print(f"   扫描: {FRAMES / scan_elapsed:,.0f} 帧/秒, {size / 1e6 / scan_elapsed:.0f}MB/s")
+
+if __name__ == "__main__":
+    run_benchmark()
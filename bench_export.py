@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+列式导出测试
+生成一个较大的抓包文件和JSON消息日志，比较:
+  - 逐行解析为字典列表 (原来分析脚本的做法) 与分块导出的耗时和内存峰值
+  - 单进程与进程池并行导出的耗时
+"""
+
+import sys
+import os
+import datetime
+import importlib.util
+import json
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_capture import CaptureWriter
+from gdl90_export import export, load_columns, update_rates
+
+# xp/目录下有同名模块，按路径加载根目录的接收端 (用于生成JSON消息日志)
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+TARGETS = 200
+SECONDS = 1000           # 每个目标每秒一个交通报告
+ADDR = ('192.168.1.20', 49002)
+
+def _write_inputs(tmp):
+    encoder = InlineGDL90Encoder()
+    capture = os.path.join(tmp, 'session.gdl90cap')
+    writer = CaptureWriter(capture, index=False)
+    receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, 'receiver.log'), quiet=True)
+    receiver.message_log.max_queue = TARGETS * SECONDS
+    for second in range(SECONDS):
+        for i in range(TARGETS):
+            frame = bytes(encoder.create_traffic_report({
+                'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.01 + second * 0.0005, 'lon': -122.0,
+                'alt': 3000.0, 'speed': 200.0, 'track': 0.0, 'vs': 0.0, 'callsign': f'T{i:04d}'}))
+            offset_ns = second * 1_000_000_000 + i * 4_000_000
+            writer.write(frame, ADDR, writer.start_mono_ns + offset_ns)
+            receiver._log_message(frame, ADDR, writer.start_wall_ns / 1e9 + offset_ns / 1e9)
+    writer.close()
+    receiver.message_log.close()
+    return capture, receiver.message_log.path
+
+def _dict_rates(path):
+    """原来的做法: 逐行解析为字典，再按飞机分组计算更新率"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line.split(' - ', 1)[1])
+            if entry['message_type'] == 'Traffic Report':
+                entry['ts'] = datetime.datetime.fromisoformat(entry['timestamp']).timestamp()
+                entries.append(entry)
+    times = {}
+    for entry in entries:
+        times.setdefault(entry['data']['icao_address'], []).append(entry['ts'])
+    return {icao: (len(t) - 1) / (t[-1] - t[0]) for icao, t in times.items()}
+
+def _measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def _columns_rates(export_dir, path, workers):
+    export(path, export_dir, workers=workers)
+    return update_rates(load_columns(os.path.join(export_dir, 'traffic.npz')))
+
+def run_benchmark():
+    workers = min(4, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        capture, log = _write_inputs(tmp)
+        frames = TARGETS * SECONDS
+        print(f"📊 列式导出 ({frames} 个交通报告, 抓包 {os.path.getsize(capture) / 1e6:.0f}MB, "
+              f"JSON日志 {os.path.getsize(log) / 1e6:.0f}MB)")
+
+        rates, elapsed, peak = _measure(_dict_rates, log)
+        print(f"   JSON逐行解析为字典 + 更新率:  {elapsed:6.2f}s, 内存峰值 {peak / 1e6:6.1f}MB")
+        for name, path in (('JSON', log), ('抓包', capture)):
+            for count in (0, workers):
+                start = time.perf_counter()
+                result = export(path, os.path.join(tmp, f'export-{name}-{count}'), workers=count)
+                elapsed = time.perf_counter() - start
+                label = f"{count}进程" if count else "单进程"
+                print(f"   {name}导出 {label:5s}: {elapsed:6.2f}s ({frames / elapsed:,.0f} 条/秒, {result['chunks']} 块)")
+        _, elapsed, peak = _measure(export, log, os.path.join(tmp, 'export-peak'))
+        print(f"   JSON导出内存峰值 (单进程): {peak / 1e6:.1f}MB")
+        columns_rates, elapsed, peak = _measure(
+            lambda: update_rates(load_columns(os.path.join(tmp, 'export-peak', 'traffic.npz'))))
+        print(f"   读取列 + 更新率: {elapsed:6.2f}s, 内存峰值 {peak / 1e6:6.1f}MB")
+        assert len(columns_rates) == len(rates) == TARGETS
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+帧切分吞吐量测试
+比较原来的 "buffer += data; buffer = buffer[end + 1:]" 切分方式和共享帧切分器
+在每个数据报携带1-50帧时的每秒切分帧数，以及TCP式64KB大块读取时的情况。
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_framing import iter_frames, FrameSplitter, FLAG_BYTE
+from main import InlineGDL90Encoder
+
+TOTAL_FRAMES = 200000
+
+def reslice_split(buffer, data):
+    """原xp接收端的切分方式: 每帧重新切片剩余缓冲区 (每数据报O(帧数^2)拷贝)"""
+    buffer += data
+    frames = []
+    while FLAG_BYTE in buffer:
+        start_idx = buffer.find(FLAG_BYTE)
+        end_idx = buffer.find(FLAG_BYTE, start_idx + 1)
+        if end_idx == -1:
+            break
+        frames.append(buffer[start_idx:end_idx + 1])
+        buffer = buffer[end_idx + 1:]
+    return buffer, frames
+
+def _datagrams(per_datagram):
+    encoder = InlineGDL90Encoder()
+    frames = [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.01,
+                                                   'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+              for i in range(per_datagram)]
+    return b''.join(frames), TOTAL_FRAMES // per_datagram
+
+def _best_rate(split, datagram, count, frames_per_call, repeat=3):
+    """重复几次取最快一次，减少调度抖动的影响"""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        split(datagram, count)
+        best = max(best, count * frames_per_call / (time.perf_counter() - start))
+    return best
+
+def _run_reslice(datagram, count):
+    buffer = b''
+    for _ in range(count):
+        buffer, frames = reslice_split(buffer, datagram)
+
+def _run_iter_frames(datagram, count):
+    for _ in range(count):
+        for frame in iter_frames(datagram):
+            pass
+
+def _run_splitter(datagram, count):
+    splitter = FrameSplitter()
+    for _ in range(count):
+        for frame in splitter.feed(datagram):
+            pass
+    assert splitter.frames == count * len(list(iter_frames(datagram)))
+
+def run_benchmark():
+    print(f"📊 帧切分吞吐量 (共 {TOTAL_FRAMES} 帧，取3次中最快)")
+    print(f"{'帧/数据报':>9} | {'重新切片 帧/秒':>14} | {'iter_frames':>12} | {'FrameSplitter':>13} | {'加速':>6}")
+    print("-" * 70)
+    for per_datagram in (1, 5, 10, 25, 50, 1500):  # 1500帧约64KB，相当于一次TCP大块读取
+        datagram, count = _datagrams(per_datagram)
+        reslice = _best_rate(_run_reslice, datagram, count, per_datagram)
+        stateless = _best_rate(_run_iter_frames, datagram, count, per_datagram)
+        stream = _best_rate(_run_splitter, datagram, count, per_datagram)
+        print(f"{per_datagram:>9} | {reslice:>14,.0f} | {stateless:>12,.0f} | {stream:>13,.0f} | "
+              f"{stream / reslice:>5.1f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
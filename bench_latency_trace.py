@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+延迟追踪开销测试
+按广播主循环的方式 (编码 -> sendto) 发送自机位置报告，比较没有追踪代码、未启用和启用延迟追踪时
+每条消息的耗时，以及另一个线程持续写入时读取快照的耗时。
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import GDL90Encoder
+from latency_trace import LatencyTracer
+
+MESSAGES = 100000
+
+def _baseline_loop(sock, target):
+    encoder = GDL90Encoder()
+    data = {'lat': 47.5, 'lon': -122.3, 'alt': 3000.0, 'speed': 120.0, 'track': 90.0, 'vs': 0.0}
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        sock.sendto(encoder.create_position_report(data), target)
+    return (time.perf_counter() - start) / MESSAGES
+
+def _send_loop(position_trace, sock, target):
+    encoder = GDL90Encoder()
+    data = {'lat': 47.5, 'lon': -122.3, 'alt': 3000.0, 'speed': 120.0, 'track': 90.0, 'vs': 0.0}
+    trace_stamp = (time.monotonic_ns(), time.monotonic_ns())
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        if position_trace is not None:
+            receive_ns, update_ns = trace_stamp
+            encode_start = time.monotonic_ns()
+        position_msg = encoder.create_position_report(data)
+        if position_trace is not None:
+            encode_end = time.monotonic_ns()
+        sock.sendto(position_msg, target)
+        if position_trace is not None:
+            position_trace.record(receive_ns, update_ns, encode_start, encode_end, time.monotonic_ns())
+    return (time.perf_counter() - start) / MESSAGES
+
+def run_benchmark():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))   # 不读取，只作为发送目标
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = sink.getsockname()
+
+    print(f"📊 延迟追踪开销 ({MESSAGES} 条自机位置报告)")
+    baseline = min(_baseline_loop(sender, target) for _ in range(3))
+    plain = min(_send_loop(None, sender, target) for _ in range(3))
+    tracer = LatencyTracer()
+    traced = min(_send_loop(tracer.lane('position'), sender, target) for _ in range(3))
+    print(f"   没有追踪代码: {baseline * 1e6:5.2f} µs/条")
+    print(f"   未启用:       {plain * 1e6:5.2f} µs/条 (+{(plain - baseline) * 1e6:.2f} µs)")
+    print(f"   启用:         {traced * 1e6:5.2f} µs/条 (+{(traced - baseline) * 1e6:.2f} µs)")
+
+    # 写入线程持续记录时读取快照
+    writer = threading.Thread(target=_send_loop, args=(tracer.lane('busy'), sender, target))
+    writer.start()
+    start = time.perf_counter()
+    snapshots = 0
+    while writer.is_alive():
+        snapshot = tracer.snapshot()
+        snapshots += 1
+    elapsed = (time.perf_counter() - start) / snapshots
+    writer.join()
+    print(f"   写入时读取快照: {elapsed * 1e3:.1f}ms/次 ({snapshots} 次)")
+    stages = snapshot['lanes']['position']['stages']
+    for stage in ('encode', 'send'):
+        print(f"   {stage:6s} p50 {stages[stage]['p50'] * 1e6:6.1f}µs, p99 {stages[stage]['p99'] * 1e6:6.1f}µs")
+    sender.close()
+    sink.close()
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+日志时间范围查询测试
+生成一个约1小时、100帧/秒的抓包文件和对应的JSON消息日志，
+比较在文件末尾附近查询10秒窗口时，使用时间索引和从头顺序扫描的耗时。
+"""
+
+import sys
+import os
+import datetime
+import json
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_capture import CaptureWriter
+from gdl90_index import index_path
+from gdl90_logquery import query
+from gdl90_msglog import AsyncMessageLog, format_timestamp
+
+DURATION = 3600      # 秒
+RATE = 100           # 帧/秒
+WINDOW = 10.0        # 秒
+ADDR = ('192.168.1.20', 49002)
+
+def _frames():
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                                 'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+            for i in range(200)]
+
+def _log_record(record):
+    """与接收端消息日志相同的行格式 (data字段从简)"""
+    seq, received_at, icao = record
+    entry = {'seq': seq, 'timestamp': datetime.datetime.fromtimestamp(received_at).isoformat(),
+             'sender': f"{ADDR[0]}:{ADDR[1]}", 'message_type': 'Traffic Report',
+             'data': {'icao_address': f"0x{icao:06X}", 'latitude': 47.0, 'longitude': -122.0, 'altitude_ft': 3000}}
+    return f"{format_timestamp(received_at)} - {json.dumps(entry, ensure_ascii=False)}"
+
+def _timed_query(path, start, end):
+    began = time.perf_counter()
+    count = sum(1 for _ in query(path, start, end))
+    return time.perf_counter() - began, count
+
+def _compare(name, path, start, end):
+    indexed, count = _timed_query(path, start, end)
+    saved = path + '.saved'
+    os.rename(index_path(path), saved)
+    scanned, scanned_count = _timed_query(path, start, end)
+    os.rename(saved, index_path(path))
+    assert count == scanned_count == int(WINDOW * RATE)
+    print(f"   {name}: {os.path.getsize(path) / 1e6:.0f}MB, 索引 {os.path.getsize(index_path(path)) / 1e3:.0f}KB")
+    print(f"      使用索引 {indexed * 1000:7.1f}ms, 顺序扫描 {scanned * 1000:7.1f}ms ({scanned / indexed:.0f}x)")
+
+def run_benchmark():
+    frames = _frames()
+    total = DURATION * RATE
+    print(f"📊 时间范围查询 ({DURATION}s x {RATE}帧/秒, 查询末尾附近的 {WINDOW:.0f}s 窗口)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        writer = CaptureWriter(path)
+        base = writer.start_mono_ns
+        for i in range(total):
+            writer.write(frames[i % len(frames)], ADDR, base + i * (1_000_000_000 // RATE) + 500_000)
+        writer.close()
+        start = writer.start_wall_ns / 1e9 + DURATION - 60
+        _compare('抓包', path, start, start + WINDOW)
+
+        path = os.path.join(tmp, 'receiver_messages.log')
+        log = AsyncMessageLog(path, _log_record, max_queue=total, record_time=lambda record: record[1]).start()
+        base_time = int(time.time()) - DURATION
+        for i in range(total):
+            log.enqueue((i + 1, base_time + i / RATE + 0.005, 0xA00000 + i % len(frames)))
+        log.close()
+        start = base_time + DURATION - 60
+        _compare('JSON消息日志', path, start, start + WINDOW)
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+日志轮转开销测试
+比较不轮转和按大小轮转 + 后台gzip压缩时，接收线程每帧的耗时、全部落盘的吞吐量和压缩率。
+"""
+
+import sys
+import os
+import importlib.util
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_logrotate import LogRotation, SegmentCompressor, segment_paths
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+FRAMES = 100000
+ADDR = ('127.0.0.1', 4000)
+SEGMENT_MB = 5
+
+def _frames():
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                                 'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+            for i in range(500)]
+
+def _run(tmp, name, rotation):
+    receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, name), quiet=True, rotation=rotation)
+    receiver.show_traffic = False   # 只测日志路径
+    receiver.message_log.max_queue = FRAMES
+    frames = _frames()
+    start = time.perf_counter()
+    for i in range(FRAMES):
+        receiver._handle_frame(frames[i % len(frames)], ADDR, time.time())
+    queued = (time.perf_counter() - start) / FRAMES
+    receiver.message_log.close()
+    written = time.perf_counter() - start
+    if rotation is not None:
+        rotation.close()
+    total = time.perf_counter() - start
+    return queued, written, total, receiver.message_log.path
+
+def run_benchmark():
+    print(f"📊 日志轮转开销 ({FRAMES} 帧, 每 {SEGMENT_MB}MB 轮转并gzip压缩)")
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_queued, plain_written, _, _ = _run(tmp, 'plain.log', None)
+        rotation = LogRotation(max_bytes=SEGMENT_MB * 1_000_000, compressor=SegmentCompressor('gzip'))
+        queued, written, total, path = _run(tmp, 'rotated.log', rotation)
+        metrics = rotation.compressor.metrics()
+        segments = segment_paths(path)
+
+    print(f"   不轮转   接收线程: {plain_queued * 1e6:5.1f} µs/帧, 全部落盘 {FRAMES / plain_written:,.0f} 帧/秒")
+    print(f"   轮转压缩 接收线程: {queued * 1e6:5.1f} µs/帧, 全部落盘 {FRAMES / written:,.0f} 帧/秒")
+    print(f"   {rotation.rotations} 次轮转, {len(segments)} 个文件, 压缩完成 {total - written:.2f}s 后, "
+          f"{metrics['bytes_in'] / 1e6:.1f}MB -> {metrics['bytes_out'] / 1e6:.1f}MB "
+          f"({metrics['bytes_in'] / max(metrics['bytes_out'], 1):.1f}x)")
+
+if __name__ == "__main__":
+    run_benchmark()
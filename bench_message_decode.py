@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+位置报告解码吞吐量测试
+比较一次性解码全部字段 (原来的做法) 和按需解码视图在
+只按类型/地址过滤、只显示呼号时的每秒消息数，以及解码前过滤的端到端吞吐量。
+"""
+
+import sys
+import os
+import importlib.util
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_messages import TrafficReportView, TRAFFIC_FIELDS
+from gdl90_filter import FrameFilter
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+MESSAGES = 100000
+
+def _payloads(count=500):
+    """反转义并去掉CRC的交通报告消息体"""
+    encoder = InlineGDL90Encoder()
+    decoder = _receiver.GDL90Decoder()
+    payloads = []
+    for i in range(count):
+        frame = encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                               'lon': -122.0, 'alt': 3000.0, 'speed': 150.0,
+                                               'track': 45.0, 'vs': 500.0, 'callsign': f'T{i:04d}'})
+        payloads.append(bytes(decoder.unescape_message(bytearray(frame[1:-1]))[:-2]))
+    return payloads
+
+def _rate(workload, payloads):
+    best = 0.0
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(MESSAGES):
+            workload(payloads[i % len(payloads)])
+        best = max(best, MESSAGES / (time.perf_counter() - start))
+    return best
+
+WORKLOADS = [
+    ('一次性解码', lambda p: {'message_type': 'Traffic Report', **{k: f(p) for k, f in TRAFFIC_FIELDS.items()}}),
+    ('视图全部字段', lambda p: dict(TrafficReportView(p))),
+    ('按类型过滤', lambda p: TrafficReportView(p)['message_type'] == 'Traffic Report'),
+    ('按ICAO过滤', lambda p: TrafficReportView(p).icao == 0xA00010),
+    ('只显示呼号', lambda p: TrafficReportView(p)['callsign']),
+]
+
+def run_benchmark():
+    payloads = _payloads()
+    print(f"📊 交通报告解码吞吐量 ({MESSAGES} 条消息，取3次中最快)")
+    print(f"{'工作负载':>10} | {'消息/秒':>12} | {'相对一次性解码':>10}")
+    print("-" * 42)
+    baseline = None
+    for name, workload in WORKLOADS:
+        rate = _rate(workload, payloads)
+        baseline = baseline or rate
+        print(f"{name:>10} | {rate:>12,.0f} | {rate / baseline:>9.1f}x")
+
+    # 端到端 (含反转义和CRC校验)
+    decoder = _receiver.GDL90Decoder()
+    frames = [bytes(InlineGDL90Encoder().create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0,
+                                                                'lon': -122.0, 'callsign': f'T{i:04d}'}))
+              for i in range(500)]
+    start = time.perf_counter()
+    for i in range(MESSAGES // 10):
+        decoder.decode_message(frames[i % len(frames)])['message_type']
+    rate = MESSAGES // 10 / (time.perf_counter() - start)
+    print(f"decode_message 端到端 (类型过滤): {rate:,.0f} 消息/秒")
+
+    # 解码前按ICAO地址过滤 (只保留1个目标，其余帧不反转义、不校验CRC)
+    frame_filter = FrameFilter(icao={0xA00010})
+    start = time.perf_counter()
+    for i in range(MESSAGES):
+        frame = frames[i % len(frames)]
+        if frame_filter.accepts(frame):
+            decoder.decode_message(frame)
+        else:
+            decoder.count_filtered(frame)
+    rate = MESSAGES / (time.perf_counter() - start)
+    print(f"解码前ICAO过滤 端到端: {rate:,.0f} 消息/秒")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+消息日志开销测试
+比较接收线程中同步格式化并写入日志 (原来的做法) 和只把原始帧放入后台写入队列时，
+接收线程每帧的耗时，以及后台写入线程的吞吐量。
+"""
+
+import sys
+import os
+import importlib.util
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_msglog import format_log_record
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+FRAMES = 50000
+ADDR = ('127.0.0.1', 4000)
+
+def _frames():
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                                 'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+            for i in range(500)]
+
+def _receiver_with_log(tmp, name):
+    receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, name), quiet=True)
+    receiver.show_traffic = False   # 只测日志路径
+    receiver.message_log.max_queue = FRAMES
+    return receiver
+
+def run_benchmark():
+    frames = _frames()
+    print(f"📊 消息日志开销 ({FRAMES} 帧)")
+    with tempfile.TemporaryDirectory() as tmp:
+        # 同步: 接收线程中解码、JSON序列化并写文件
+        receiver = _receiver_with_log(tmp, 'sync.log')
+        receiver.message_log.close()
+        with open(os.path.join(tmp, 'sync_messages.log'), 'a', encoding='utf-8') as f:
+            start = time.perf_counter()
+            for i in range(FRAMES):
+                frame = frames[i % len(frames)]
+                receiver.decoder.decode_message(frame)
+                f.write(format_log_record(receiver._log_decoder, (i, time.time(), ADDR, frame)) + '\n')
+                f.flush()
+            sync = (time.perf_counter() - start) / FRAMES
+
+        # 异步: 接收线程只排队，后台线程批量写入
+        receiver = _receiver_with_log(tmp, 'async.log')
+        start = time.perf_counter()
+        for i in range(FRAMES):
+            receiver._handle_frame(frames[i % len(frames)], ADDR, time.time())
+        queued = (time.perf_counter() - start) / FRAMES
+        receiver.message_log.close()
+        total = time.perf_counter() - start
+        metrics = receiver.message_log.metrics()
+
+    print(f"   同步写入 接收线程: {sync * 1e6:6.1f} µs/帧")
+    print(f"   后台写入 接收线程: {queued * 1e6:6.1f} µs/帧 ({sync / queued:.1f}x)")
+    print(f"   后台写入 全部落盘: {FRAMES / total:,.0f} 帧/秒, {metrics['batches']} 批, "
+          f"最大队列 {metrics['max_depth']}, 丢弃 {metrics['dropped']}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+会话回放测试
+生成一段抓包和对应的JSON消息日志 (每10ms一个数据报，每秒第一个为心跳+自机报告，其余各带一个交通报告)，
+统计尽快发送时抓包原样回放和JSON日志重新编码回放的帧率，以及按倍速回放时的发送时刻误差。
+"""
+
+import sys
+import os
+import importlib.util
+import socket
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_capture import CaptureWriter
+from gdl90_replay import load_datagrams, replay
+
+SECONDS = 600
+TARGETS = 100            # 每秒每个目标一个交通报告
+ADDR = ('192.168.1.20', 49002)
+
+def _write_session(tmp):
+    """每10ms一个数据报: 每秒第一个数据报是心跳+自机报告，其余各带一个交通报告"""
+    spec = importlib.util.spec_from_file_location(
+        'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+    receiver_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(receiver_module)
+
+    encoder = InlineGDL90Encoder()
+    traffic = [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                                    'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+               for i in range(TARGETS)]
+    ownship = [bytes(encoder.create_heartbeat()), bytes(encoder.create_position_report({'lat': 47.0, 'lon': -122.0}))]
+
+    capture_path = os.path.join(tmp, 'session.gdl90cap')
+    writer = CaptureWriter(capture_path, index=False)
+    log_receiver = receiver_module.GDL90Receiver(port=0, log_file=os.path.join(tmp, 'receiver.log'), quiet=True)
+    log_receiver.message_log.max_queue = SECONDS * (TARGETS + 2)
+    for second in range(SECONDS):
+        for slot in range(TARGETS):
+            mono_ns = writer.start_mono_ns + second * 1_000_000_000 + slot * 10_000_000
+            frames = ownship if slot == 0 else [traffic[slot]]
+            for frame in frames:
+                writer.write(frame, ADDR, mono_ns)
+                log_receiver._log_message(frame, ADDR, writer.start_wall_ns / 1e9 + (mono_ns - writer.start_mono_ns) / 1e9)
+    writer.close()
+    log_receiver.message_log.close()
+    return capture_path, log_receiver.message_log.path
+
+def run_benchmark():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))   # 不读取，只作为发送目标
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    target = sink.getsockname()
+    with tempfile.TemporaryDirectory() as tmp:
+        capture_path, log_path = _write_session(tmp)
+        print(f"📊 会话回放 ({SECONDS}s 录制, {SECONDS * (TARGETS + 1)} 帧)")
+        for name, path in (('抓包', capture_path), ('JSON日志', log_path)):
+            stats = replay(load_datagrams(path), sender, target, speed=None).summary()
+            print(f"   尽快发送 {name:6s}: {stats['frames_per_second']:10,.0f} 帧/秒 ({stats['elapsed']:.2f}s)")
+        for speed in (100.0, 50.0):
+            stats = replay(load_datagrams(capture_path), sender, target, speed=speed).summary()
+            print(f"   {speed:5g}x 抓包: 耗时 {stats['elapsed']:.2f}s (计划 {stats['recorded'] / speed:.2f}s), "
+                  f"{stats['frames_per_second']:,.0f} 帧/秒, 误差 p50 {stats['lateness_p50'] * 1e6:.0f}µs "
+                  f"p99 {stats['lateness_p99'] * 1e6:.0f}µs 最大 {stats['lateness_max'] * 1e3:.2f}ms")
+    sender.close()
+    sink.close()
+
+if __name__ == "__main__":
+    run_benchmark()
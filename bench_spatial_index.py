@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+空间网格索引性能测试
+在查询点附近固定放置一批目标，其余目标分布在全球，
+比较网格索引半径查询与逐个扫描的耗时随总目标数的变化。
+"""
+
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from spatial_index import SpatialGrid, _distance_nm
+
+QUERY_LAT = 51.47
+QUERY_LON = -0.46
+QUERY_RADIUS_NM = 40.0
+LOCAL_TARGETS = 200      # 查询点附近的目标数 (保持不变)
+QUERIES = 200
+
+def build_targets(total, rng):
+    """生成total个目标: LOCAL_TARGETS个在查询点附近，其余全球随机分布"""
+    targets = {}
+    for i in range(total):
+        if i < LOCAL_TARGETS:
+            lat = QUERY_LAT + rng.uniform(-1.0, 1.0)
+            lon = QUERY_LON + rng.uniform(-1.5, 1.5)
+        else:
+            lat = rng.uniform(-80.0, 80.0)
+            lon = rng.uniform(-180.0, 180.0)
+        targets[0x100000 + i] = (lat, lon)
+    return targets
+
+def linear_scan(targets):
+    return [key for key, (lat, lon) in targets.items()
+            if _distance_nm(QUERY_LAT, QUERY_LON, lat, lon) <= QUERY_RADIUS_NM]
+
+def run_benchmark():
+    rng = random.Random(1)
+    print("📊 空间网格索引 vs 逐个扫描 (半径查询 40nm)")
+    print(f"{'目标总数':>10} | {'索引构建':>10} | {'索引查询':>12} | {'逐个扫描':>12} | {'结果数':>6}")
+    print("-" * 64)
+    for total in (1000, 10000, 100000):
+        targets = build_targets(total, rng)
+
+        start = time.perf_counter()
+        grid = SpatialGrid()
+        for key, (lat, lon) in targets.items():
+            grid.update(key, lat, lon)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            found = grid.query_radius(QUERY_LAT, QUERY_LON, QUERY_RADIUS_NM)
+        query_time = (time.perf_counter() - start) / QUERIES
+
+        scan_queries = max(1, QUERIES // (total // 1000))
+        start = time.perf_counter()
+        for _ in range(scan_queries):
+            scanned = linear_scan(targets)
+        scan_time = (time.perf_counter() - start) / scan_queries
+
+        assert sorted(key for key, _ in found) == sorted(scanned)
+        print(f"{total:>10} | {build_time * 1000:>8.1f}ms | {query_time * 1e6:>10.1f}us | "
+              f"{scan_time * 1e6:>10.1f}us | {len(found):>6}")
+
+if __name__ == "__main__":
+    run_benchmark()
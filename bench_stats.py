@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+接收端时间分布统计开销测试
+比较开启和关闭直方图统计时接收线程每帧的耗时 (不显示、不记录日志)，以及生成快照的耗时。
+"""
+
+import sys
+import os
+import importlib.util
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_stats import ArrivalStats
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+FRAMES = 200000
+TARGETS = 500
+ADDR = ('127.0.0.1', 4000)
+
+def _frames():
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0 + i * 0.001,
+                                                 'lon': -122.0, 'alt': 3000.0, 'callsign': f'T{i:04d}'}))
+            for i in range(TARGETS)]
+
+def _run(histograms):
+    receiver = _receiver.GDL90Receiver(port=0, quiet=True)
+    receiver.show_traffic = False
+    if histograms:
+        receiver.arrival_stats = ArrivalStats()
+    frames = _frames()
+    now = 1_700_000_000.0
+    start = time.perf_counter()
+    for i in range(FRAMES):
+        receiver._handle_frame(frames[i % TARGETS], ADDR, now + i * 0.002)
+    return (time.perf_counter() - start) / FRAMES, receiver
+
+def run_benchmark():
+    print(f"📊 时间分布统计开销 ({FRAMES} 帧, {TARGETS} 个目标)")
+    plain, _ = _run(False)
+    with_stats, receiver = _run(True)
+    print(f"   不统计:     {plain * 1e6:5.2f} µs/帧")
+    print(f"   统计直方图: {with_stats * 1e6:5.2f} µs/帧 (+{(with_stats - plain) * 1e6:.2f} µs)")
+    start = time.perf_counter()
+    receiver.arrival_stats.snapshot()
+    print(f"   快照 ({len(receiver.arrival_stats.targets)} 个目标): {(time.perf_counter() - start) * 1e3:.1f}ms")
+    for line in receiver.arrival_stats.report_lines(worst=2):
+        print(line)
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+轨迹回放数据源吞吐量测试
+生成一个较大的CSV/JSON Lines轨迹文件，以最大倍速流式读入共享目标表，
+统计每秒写入的目标更新数。
+"""
+
+import sys
+import os
+import csv
+import json
+import random
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from traffic_sources import TrafficTable, TrackFileSource, TRACK_FIELDS
+
+TARGETS = 500
+SECONDS = 400            # 录制时长 (秒)，每个目标每秒一条记录
+
+def write_track_file(path, rng):
+    """写入 TARGETS x SECONDS 条记录，按时间戳排序"""
+    rows = ({'timestamp': t, 'icao': f'{0xA00000 + i:06X}',
+             'lat': round(47.0 + rng.uniform(-1, 1), 6), 'lon': round(-122.0 + rng.uniform(-1, 1), 6),
+             'alt': round(rng.uniform(1000, 30000)), 'speed': round(rng.uniform(80, 450)),
+             'track': round(rng.uniform(0, 360), 1), 'vs': round(rng.uniform(-1500, 1500)),
+             'callsign': f'T{i:04d}'}
+            for t in range(SECONDS) for i in range(TARGETS))
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if path.endswith('.jsonl'):
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+        else:
+            writer = csv.DictWriter(f, fieldnames=TRACK_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+def replay_as_fast_as_possible(path):
+    """用虚拟时钟驱动回放: 每次poll推进10秒录制时间 (50x倍速下0.2秒墙钟)"""
+    table = TrafficTable(stale_after=1e9)
+    source = TrackFileSource(path, speed=TrackFileSource.MAX_SPEED)
+    clock = 0.0
+    start = time.perf_counter()
+    while not source.finished:
+        source.poll(table, clock)
+        clock += 10.0 / source.speed
+    elapsed = time.perf_counter() - start
+    return source.updates, elapsed, len(table)
+
+def run_benchmark():
+    rng = random.Random(3)
+    print(f"📊 轨迹回放吞吐量 ({TARGETS} 个目标 x {SECONDS} 秒)")
+    print(f"{'格式':>6} | {'文件大小':>10} | {'更新数':>10} | {'耗时':>8} | {'更新/秒':>12}")
+    print("-" * 60)
+    with tempfile.TemporaryDirectory() as tmp:
+        for suffix in ('.csv', '.jsonl'):
+            path = os.path.join(tmp, 'tracks' + suffix)
+            write_track_file(path, rng)
+            size_mb = os.path.getsize(path) / 1e6
+            updates, elapsed, targets = replay_as_fast_as_possible(path)
+            assert targets == TARGETS
+            print(f"{suffix[1:]:>6} | {size_mb:>8.1f}MB | {updates:>10} | {elapsed:>7.2f}s | "
+                  f"{updates / elapsed:>12,.0f}")
+
+if __name__ == "__main__":
+    run_benchmark()
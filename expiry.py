@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+交通目标过期: 哈希时间轮
+目标按过期时刻放入时间轮的桶中，刷新时只在桶之间移动，
+推进时间轮只检查到期的桶，过期N个目标的开销为O(过期数)。
+广播端 (main.py, traffic_sources.py) 和接收端 (xp/gdl90_receiver.py) 共用。
+"""
+
+import math
+
+DEFAULT_TICK = 1.0      # 时间轮精度 (秒)，过期最多延迟一个tick
+DEFAULT_SLOTS = 64      # 桶数，一圈 = tick * slots 秒
+
+class TimingWheel:
+    """
+    活跃集合 + 过期时间轮，key通常是ICAO地址或TCAS槽位号
+
+    version在活跃集合变化 (加入/过期/删除) 时递增，只刷新过期时间不改变version，
+    使用方可以比较version判断是否需要重建自己的目标列表。
+    """
+
+    def __init__(self, tick=DEFAULT_TICK, slots=DEFAULT_SLOTS):
+        self.tick = tick
+        self.slots = slots
+        self.buckets = [set() for _ in range(slots)]
+        self.deadlines = {}        # key -> 过期tick
+        self.version = 0
+        self._last_tick = None     # 最近一次推进到的tick
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def active(self):
+        """当前活跃的key (字典视图，调用方不要在迭代期间修改时间轮)"""
+        return self.deadlines.keys()
+
+    def touch(self, key, deadline):
+        """加入或刷新一个key，到deadline (秒) 时过期"""
+        deadline_tick = math.ceil(deadline / self.tick)
+        if self._last_tick is not None and deadline_tick <= self._last_tick:
+            deadline_tick = self._last_tick + 1  # 已经推进过的桶不会再检查
+        old_tick = self.deadlines.get(key)
+        if old_tick is None:
+            self.version += 1
+        elif old_tick == deadline_tick:
+            return
+        elif old_tick % self.slots != deadline_tick % self.slots:
+            self.buckets[old_tick % self.slots].discard(key)
+        self.deadlines[key] = deadline_tick
+        self.buckets[deadline_tick % self.slots].add(key)
+
+    def discard(self, key):
+        """删除一个key，不存在时忽略"""
+        deadline_tick = self.deadlines.pop(key, None)
+        if deadline_tick is not None:
+            self.buckets[deadline_tick % self.slots].discard(key)
+            self.version += 1
+
+    def clear(self):
+        if self.deadlines:
+            self.version += 1
+        for bucket in self.buckets:
+            bucket.clear()
+        self.deadlines.clear()
+
+    def advance(self, now):
+        """推进到now，返回到期的key列表"""
+        now_tick = math.floor(now / self.tick)
+        last_tick = self._last_tick
+        if last_tick is not None and now_tick <= last_tick:
+            return []
+        self._last_tick = now_tick
+
+        if last_tick is None or now_tick - last_tick >= self.slots:
+            ticks = range(self.slots)          # 首次推进或间隔超过一圈: 检查全部桶
+        else:
+            ticks = range(last_tick + 1, now_tick + 1)
+
+        expired = []
+        deadlines = self.deadlines
+        for tick in ticks:
+            bucket = self.buckets[tick % self.slots]
+            if not bucket:
+                continue
+            due = [key for key in bucket if deadlines[key] <= now_tick]  # 后几圈到期的留在桶中
+            for key in due:
+                bucket.discard(key)
+                del deadlines[key]
+            expired.extend(due)
+        if expired:
+            self.version += 1
+        return expired
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+GDL-90 二进制抓包格式
+接收端把收到的原始帧 (含首尾0x7E的转义帧) 按长度前缀追加写入，附带单调时钟纳秒时间戳和发送方编号。
+读取端用mmap映射文件，逐条生成帧的memoryview，不拷贝帧数据。
+
+文件格式 (小端序):
+  文件头 (32字节): 魔数 b'GDL90CAP' | 版本 u16 | 文件头长度 u16 | 保留 u32 |
+                  开始时的墙钟时间 ns u64 | 开始时的单调时钟 ns u64
+  记录 (10字节记录头 + 数据): 数据长度 u16 | 发送方编号 u16 | 时间偏移 ns (48位: 高16位 u16 + 低32位 u32)
+    时间偏移为记录的单调时钟时间减去文件头中的开始时间 (约78小时后通过重设基准记录继续)
+    发送方编号 0xFFFF: 发送方定义，数据为 新编号 u16 + "host:port"
+    发送方编号 0xFFFE: 重设基准，数据为 新基准 u64 (之后记录的时间偏移相对于该基准)
+
+一个约30字节的交通报告帧占42字节，JSON消息日志约440字节。
+写入时默认在 <文件名>.idx 中生成稀疏时间索引 (见gdl90_index)，附加值为该位置的时间基准。
+"""
+
+import mmap
+import os
+import struct
+import time
+
+from gdl90_index import IndexWriter, index_path
+
+MAGIC = b'GDL90CAP'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHHIQQ')
+RECORD_HEADER = struct.Struct('<HHHI')
+SENDER_DEFINITION = 0xFFFF
+REBASE = 0xFFFE
+MAX_OFFSET_NS = (1 << 48) - 1
+WRITE_BUFFER_SIZE = 1 << 16
+
+class CaptureFormatError(ValueError):
+    """不是抓包文件或版本不支持"""
+
+class CaptureWriter:
+    """按记录追加写入抓包文件 (单线程使用，通常是接收线程)"""
+
+    def __init__(self, path, buffer_size=WRITE_BUFFER_SIZE, index=True):
+        self.path = path
+        self._file = open(path, 'xb', buffering=buffer_size)  # 不覆盖已有的抓包
+        self.index = IndexWriter(index_path(path)) if index else None
+        self.start_wall_ns = time.time_ns()
+        self.start_mono_ns = time.monotonic_ns()
+        self._base_ns = self.start_mono_ns
+        self._senders = {}       # (host, port) -> 编号
+        self.records = 0
+        self.bytes_written = FILE_HEADER.size
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, FILE_HEADER.size, 0,
+                                          self.start_wall_ns, self.start_mono_ns))
+
+    def _write_record(self, sender_id, offset_ns, data):
+        self._file.write(RECORD_HEADER.pack(len(data), sender_id, offset_ns >> 32, offset_ns & 0xFFFFFFFF))
+        self._file.write(data)
+        self.bytes_written += RECORD_HEADER.size + len(data)
+
+    def _sender_id(self, sender_addr, mono_ns):
+        sender_id = len(self._senders)
+        if sender_id >= REBASE:
+            raise ValueError("发送方数量超过抓包格式上限")
+        self._senders[sender_addr] = sender_id
+        if self.index is not None:
+            self.index.add_sender(self._wall_time(mono_ns), self.bytes_written)
+        text = f"{sender_addr[0]}:{sender_addr[1]}".encode('utf-8')
+        self._write_record(SENDER_DEFINITION, 0, struct.pack('<H', sender_id) + text)
+        return sender_id
+
+    def write(self, frame, sender_addr, mono_ns=None):
+        """追加一帧; mono_ns为接收时的time.monotonic_ns()，同一数据报中的帧可以共用"""
+        if mono_ns is None:
+            mono_ns = time.monotonic_ns()
+        sender_id = self._senders.get(sender_addr)
+        if sender_id is None:
+            sender_id = self._sender_id(sender_addr, mono_ns)
+        offset_ns = mono_ns - self._base_ns
+        if offset_ns > MAX_OFFSET_NS:
+            self._base_ns = mono_ns
+            self._write_record(REBASE, 0, struct.pack('<Q', mono_ns - self.start_mono_ns))
+            offset_ns = 0
+        elif offset_ns < 0:
+            offset_ns = 0
+        if self.index is not None:
+            self.index.add(self._wall_time(mono_ns), self.bytes_written, self._base_ns - self.start_mono_ns)
+        self._write_record(sender_id, offset_ns, frame)
+        self.records += 1
+
+    def _wall_time(self, mono_ns):
+        return (self.start_wall_ns + mono_ns - self.start_mono_ns) / 1e9
+
+    def flush(self):
+        self._file.flush()
+        if self.index is not None:
+            self.index.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.index is not None:
+            self.index.close()
+
+class CaptureReader:
+    """
+    用mmap读取抓包文件
+
+    迭代生成 (时间 ns, 发送方 "host:port", 帧memoryview)，时间为相对于抓包开始的单调时钟纳秒数，
+    wall_time()换算为Unix时间。帧视图在close之前有效。末尾不完整的记录 (写入时中断) 被忽略。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < FILE_HEADER.size:
+            self._file.close()
+            raise CaptureFormatError(f"{path}: 文件太短，不是抓包文件")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        magic, version, header_size, _, self.start_wall_ns, self.start_mono_ns = FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version > VERSION:
+            self.close()
+            raise CaptureFormatError(f"{path}: 不是抓包文件或版本不支持 ({magic!r}, v{version})")
+        self.header_size = header_size
+        self.size = size
+        self.senders = {}    # 编号 -> "host:port"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def wall_time(self, offset_ns):
+        """相对时间 (ns) -> Unix时间 (秒)"""
+        return (self.start_wall_ns + offset_ns) / 1e9
+
+    def load_sender(self, offset):
+        """解析offset处的发送方定义记录 (按索引定位时不经过文件开头的定义)"""
+        length, sender_id, _, _ = RECORD_HEADER.unpack_from(self._view, offset)
+        data_pos = offset + RECORD_HEADER.size
+        if sender_id == SENDER_DEFINITION and data_pos + length <= self.size:
+            new_id, = struct.unpack_from('<H', self._view, data_pos)
+            self.senders[new_id] = bytes(self._view[data_pos + 2:data_pos + length]).decode('utf-8', errors='replace')
+
+    def records(self, offset=None, base_ns=0):
+        """从文件偏移offset (默认第一条记录) 开始逐条生成 (时间ns, 发送方, 帧视图, 记录偏移)"""
+        view = self._view
+        unpack = RECORD_HEADER.unpack_from
+        record_size = RECORD_HEADER.size
+        senders = self.senders
+        pos = self.header_size if offset is None else offset
+        end = self.size
+        while pos + record_size <= end:
+            length, sender_id, high, low = unpack(view, pos)
+            data_pos = pos + record_size
+            next_pos = data_pos + length
+            if next_pos > end:
+                return
+            if sender_id >= REBASE:
+                if sender_id == SENDER_DEFINITION:
+                    new_id, = struct.unpack_from('<H', view, data_pos)
+                    senders[new_id] = bytes(view[data_pos + 2:next_pos]).decode('utf-8', errors='replace')
+                else:
+                    base_ns, = struct.unpack_from('<Q', view, data_pos)
+            else:
+                yield base_ns + ((high << 32) | low), senders.get(sender_id), view[data_pos:next_pos], pos
+            pos = next_pos
+
+    def chunk_offsets(self, records_per_chunk):
+        """
+        只读记录头把文件切成每块约records_per_chunk条记录的块，返回 [(起始偏移, 结束偏移, 时间基准)]
+        块可以分别用records(起始偏移, 时间基准)读取 (例如在多个进程中)
+        """
+        view = self._view
+        unpack = RECORD_HEADER.unpack_from
+        record_size = RECORD_HEADER.size
+        chunks = []
+        pos = chunk_start = self.header_size
+        base_ns = chunk_base = 0
+        count = 0
+        end = self.size
+        while pos + record_size <= end:
+            length, sender_id, _, _ = unpack(view, pos)
+            next_pos = pos + record_size + length
+            if next_pos > end:
+                break
+            if count >= records_per_chunk and sender_id != SENDER_DEFINITION:
+                chunks.append((chunk_start, pos, chunk_base))
+                chunk_start, chunk_base, count = pos, base_ns, 0
+            if sender_id == REBASE:
+                base_ns, = struct.unpack_from('<Q', view, pos + record_size)
+            count += 1
+            pos = next_pos
+        if pos > chunk_start:
+            chunks.append((chunk_start, pos, chunk_base))
+        return chunks
+
+    def __iter__(self):
+        for offset_ns, sender, frame, _ in self.records():
+            yield offset_ns, sender, frame
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass   # 调用方仍持有帧视图，mmap在视图释放后由垃圾回收关闭
+        self._file.close()
+        self._mmap = None
+
+def summarize(path):
+    """扫描抓包文件，按消息ID统计帧数"""
+    counts = {}
+    first = last = None
+    frames = 0
+    with CaptureReader(path) as reader:
+        for offset_ns, _, frame in reader:
+            msg_id = frame[1]   # 抓包中的帧都来自帧切分器，至少3字节
+            counts[msg_id] = counts.get(msg_id, 0) + 1
+            if first is None:
+                first = offset_ns
+            last = offset_ns
+            frames += 1
+        return {
+            'frames': frames,
+            'bytes': reader.size,
+            'start': reader.wall_time(first or 0),
+            'duration': ((last or 0) - (first or 0)) / 1e9,
+            'senders': sorted(reader.senders.values()),
+            'by_message_id': counts,
+        }
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="GDL-90抓包文件概要")
+    parser.add_argument('capture', help='抓包文件路径')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        summary = summarize(args.capture)
+    except (OSError, CaptureFormatError) as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+    print(f"📦 {args.capture}: {summary['frames']} 帧, {summary['bytes'] / 1e6:.1f}MB")
+    print(f"⏰ 开始: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(summary['start']))}, "
+          f"时长 {summary['duration']:.1f}s")
+    print(f"📡 发送方: {', '.join(summary['senders']) or '无'}")
+    for msg_id, count in sorted(summary['by_message_id'].items()):
+        print(f"   0x{msg_id:02X}: {count}")
+    print(f"⚡ 扫描耗时 {elapsed:.2f}s ({summary['bytes'] / 1e6 / max(elapsed, 1e-9):.0f}MB/s)")
+
+if __name__ == "__main__":
+    main()
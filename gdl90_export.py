@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+GDL-90 日志列式导出
+把抓包文件 (gdl90_capture) 或JSON消息日志 (含轮转段) 转换为按消息类型分开的列式数组，
+每种类型一个 .npz 文件 (traffic.npz / ownship.npz / heartbeat.npz / geo_altitude.npz / ahrs.npz)，
+每列一个定长类型的数组 (ts, icao, lat, lon, alt, gs, vs, track ...)，无数据的值为NaN。
+
+.npz由标准库写出 (zip + .npy格式)，安装了NumPy时可以直接 numpy.load('traffic.npz')['lat']；
+没有NumPy时用load_columns()读为array.array。
+输入按块流式处理 (每块默认65536条记录)，内存占用与文件大小无关; workers>1时各块在进程池中并行解析。
+
+示例:
+  python gdl90_export.py receiver_messages.log -o export/ --workers 4
+  python gdl90_export.py session.gdl90cap -o export/ --analyze
+"""
+
+import array
+import ast
+import collections
+import datetime
+import itertools
+import json
+import math
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+
+from main import gdl90_crc_compute
+from gdl90_capture import CaptureReader
+from gdl90_logquery import is_capture
+from gdl90_logrotate import OPENERS, open_log, segment_paths
+
+DEFAULT_CHUNK_RECORDS = 65536
+PENDING_PER_WORKER = 2            # 并行时每个进程最多排队的块数
+_END = object()
+JSON_CHUNK_BYTES = 32 << 20       # 未压缩的JSON日志按字节切块 (约7万行)
+NAN = float('nan')
+
+# array类型码 -> .npy dtype
+NPY_DTYPES = {'d': '<f8', 'f': '<f4', 'I': '<u4', 'i': '<i4', 'H': '<u2', 'B': '|u1'}
+CALLSIGN_DTYPE = '|S8'
+
+POSITION_COLUMNS = (
+    ('ts', 'd'), ('icao', 'I'), ('lat', 'd'), ('lon', 'd'), ('alt', 'i'),
+    ('gs', 'f'), ('vs', 'f'), ('track', 'f'), ('nic', 'B'), ('nacp', 'B'), ('callsign', 'S8'),
+)
+# 消息类型 -> 列定义
+SCHEMAS = {
+    'traffic': POSITION_COLUMNS,
+    'ownship': POSITION_COLUMNS,
+    'heartbeat': (('ts', 'd'), ('utc_seconds', 'I'), ('status1', 'B'), ('status2', 'B'),
+                  ('uplink', 'H'), ('reports', 'H')),
+    'geo_altitude': (('ts', 'd'), ('geo_alt', 'i'), ('vfom', 'f'), ('warning', 'B')),
+    'ahrs': (('ts', 'd'), ('roll', 'f'), ('pitch', 'f'), ('heading', 'f'), ('ias', 'f'), ('tas', 'f')),
+}
+# JSON消息日志的message_type -> 导出类型
+LOG_TYPES = {
+    'Traffic Report': 'traffic',
+    'Ownship Report': 'ownship',
+    'Heartbeat': 'heartbeat',
+    'Ownship Geometric Altitude': 'geo_altitude',
+    'AHRS': 'ahrs',
+}
+
+def _angle24(p, i):
+    value = (p[i] << 16) | (p[i + 1] << 8) | p[i + 2]
+    if value & 0x800000:
+        value -= 0x1000000
+    return value * (180.0 / 0x800000)
+
+def _none_to_nan(value):
+    return NAN if value is None else value
+
+class ColumnChunk:
+    """一块记录的列式缓冲: 类型 -> 列名 -> array (呼号列为bytearray，每条8字节)"""
+
+    def __init__(self):
+        self.columns = {}
+        self.skipped = 0   # CRC错误、格式错误或不导出的消息
+
+    def _table(self, kind):
+        table = self.columns.get(kind)
+        if table is None:
+            table = self.columns[kind] = {
+                name: bytearray() if code == 'S8' else array.array(code) for name, code in SCHEMAS[kind]}
+        return table
+
+    def add_frame(self, ts, frame):
+        """抓包中的原始帧 (含首尾0x7E): 反转义、校验CRC后直接从消息体读取字段"""
+        data = bytes(frame[1:-1])
+        if 0x7d in data:
+            data = data.replace(b'\x7d\x5e', b'\x7e').replace(b'\x7d\x5d', b'\x7d')
+        if len(data) < 3 or gdl90_crc_compute(data[:-2]) != data[-2:]:
+            self.skipped += 1
+            return
+        p = data[:-2]
+        msg_id = p[0]
+        if msg_id in (0x0A, 0x14) and len(p) >= 28:
+            h_velocity = (p[14] << 4) | (p[15] >> 4)
+            v_velocity = ((p[15] & 0x0f) << 8) | p[16]
+            if v_velocity == 0x800:
+                vs = NAN
+            else:
+                vs = (v_velocity - 0x1000 if v_velocity & 0x800 else v_velocity) * 64.0
+            self._add_position('traffic' if msg_id == 0x14 else 'ownship', ts,
+                               (p[2] << 16) | (p[3] << 8) | p[4], _angle24(p, 5), _angle24(p, 8),
+                               ((p[11] << 4) | (p[12] >> 4)) * 25 - 1000,
+                               NAN if h_velocity == 0xfff else float(h_velocity), vs,
+                               p[17] * (360.0 / 256), p[13] >> 4, p[13] & 0x0f, p[19:27].rstrip(b' \x00'))
+        elif msg_id == 0x00 and len(p) >= 7:
+            counts = (p[5] << 8) | p[6]
+            self._add_heartbeat(ts, p[3] | (p[4] << 8) | ((p[2] & 0x80) << 9), p[1], p[2],
+                                counts >> 11, counts & 0x3ff)
+        elif msg_id == 0x0B and len(p) >= 5:
+            altitude, metrics = struct.unpack_from('>hH', p, 1)
+            vfom = metrics & 0x7fff
+            self._add_geo_altitude(ts, altitude * 5, NAN if vfom == 0x7fff else float(vfom), metrics >> 15)
+        elif msg_id == 0x65 and len(p) >= 12 and p[1] == 0x01:
+            roll, pitch, heading, ias, tas = struct.unpack_from('>hhHHH', p, 2)
+            heading_value = heading & 0x7fff
+            if heading_value & 0x4000:
+                heading_value -= 0x8000
+            self._add_ahrs(ts, NAN if roll == 0x7fff else roll / 10.0, NAN if pitch == 0x7fff else pitch / 10.0,
+                           NAN if heading == 0xffff else heading_value / 10.0,
+                           NAN if ias == 0xffff else float(ias), NAN if tas == 0xffff else float(tas))
+        else:
+            self.skipped += 1
+
+    def add_entry(self, ts, entry):
+        """JSON消息日志条目"""
+        kind = LOG_TYPES.get(entry.get('message_type'))
+        data = entry.get('data')
+        if kind is None or not data:
+            self.skipped += 1
+            return
+        if kind in ('traffic', 'ownship'):
+            self._add_position(kind, ts, int(data['icao_address'], 16), data['latitude'], data['longitude'],
+                               data['altitude_ft'], _none_to_nan(data.get('ground_speed_kts')),
+                               _none_to_nan(data.get('vertical_speed_fpm')), data['track_deg'],
+                               data.get('nav_integrity', 0), data.get('nav_accuracy', 0),
+                               (data.get('callsign') or '').encode('ascii', errors='replace'))
+        elif kind == 'heartbeat':
+            count = data.get('message_count', 0)
+            self._add_heartbeat(ts, data['timestamp_raw'], int(data['status1'], 16), int(data['status2'], 16),
+                                data.get('uplink_count', count >> 11), data.get('report_count', count & 0x3ff))
+        elif kind == 'geo_altitude':
+            self._add_geo_altitude(ts, data['geo_altitude_ft'], _none_to_nan(data.get('vfom_m')),
+                                   int(bool(data.get('vertical_warning'))))
+        else:
+            self._add_ahrs(ts, _none_to_nan(data.get('roll_deg')), _none_to_nan(data.get('pitch_deg')),
+                           _none_to_nan(data.get('heading_deg')), _none_to_nan(data.get('ias_kts')),
+                           _none_to_nan(data.get('tas_kts')))
+
+    def _add_position(self, kind, ts, icao, lat, lon, alt, gs, vs, track, nic, nacp, callsign):
+        t = self._table(kind)
+        t['ts'].append(ts)
+        t['icao'].append(icao)
+        t['lat'].append(lat)
+        t['lon'].append(lon)
+        t['alt'].append(alt)
+        t['gs'].append(gs)
+        t['vs'].append(vs)
+        t['track'].append(track)
+        t['nic'].append(nic)
+        t['nacp'].append(nacp)
+        t['callsign'] += bytes(callsign[:8]).ljust(8, b'\x00')
+
+    def _add_heartbeat(self, ts, utc_seconds, status1, status2, uplink, reports):
+        t = self._table('heartbeat')
+        t['ts'].append(ts)
+        t['utc_seconds'].append(utc_seconds)
+        t['status1'].append(status1)
+        t['status2'].append(status2)
+        t['uplink'].append(uplink)
+        t['reports'].append(reports)
+
+    def _add_geo_altitude(self, ts, geo_alt, vfom, warning):
+        t = self._table('geo_altitude')
+        t['ts'].append(ts)
+        t['geo_alt'].append(geo_alt)
+        t['vfom'].append(vfom)
+        t['warning'].append(warning)
+
+    def _add_ahrs(self, ts, roll, pitch, heading, ias, tas):
+        t = self._table('ahrs')
+        t['ts'].append(ts)
+        t['roll'].append(roll)
+        t['pitch'].append(pitch)
+        t['heading'].append(heading)
+        t['ias'].append(ias)
+        t['tas'].append(tas)
+
+    def to_bytes(self):
+        """{类型: {列名: 原始字节}}，用于从工作进程返回 (比pickle array更省)"""
+        return {kind: {name: bytes(column) if isinstance(column, bytearray) else column.tobytes()
+                       for name, column in table.items()}
+                for kind, table in self.columns.items()}, self.skipped
+
+def plan_chunks(path, chunk_records=DEFAULT_CHUNK_RECORDS):
+    """
+    把输入切成可以独立解析的块: ('capture', 路径, 起始偏移, 结束偏移, 时间基准) 或
+    ('log', 路径, 起始字节, 结束字节)。压缩的日志段不能按字节切分，整个段作为一块 (结束字节为None)。
+    """
+    if is_capture(path):
+        with CaptureReader(path) as reader:
+            return [('capture', path, start, end, base_ns)
+                    for start, end, base_ns in reader.chunk_offsets(chunk_records)]
+    chunks = []
+    for segment in segment_paths(path) or [path]:
+        if os.path.splitext(segment)[1] in OPENERS:
+            chunks.append(('log', segment, 0, None))
+            continue
+        size = os.path.getsize(segment)
+        with open(segment, 'rb') as f:
+            start = 0
+            while start < size:
+                f.seek(min(start + JSON_CHUNK_BYTES, size))
+                f.readline()   # 块边界对齐到行尾
+                end = min(f.tell(), size)
+                chunks.append(('log', segment, start, end))
+                start = end
+    return chunks
+
+def export_chunk(chunk):
+    """解析一块 (可在工作进程中调用)，返回 ({类型: {列名: 字节}}, 跳过数)"""
+    columns = ColumnChunk()
+    if chunk[0] == 'capture':
+        _, path, start, end, base_ns = chunk
+        with CaptureReader(path) as reader:
+            start_wall = reader.start_wall_ns
+            for offset_ns, _, frame, pos in reader.records(start, base_ns):
+                if pos >= end:
+                    break
+                columns.add_frame((start_wall + offset_ns) / 1e9, frame)
+                del frame
+        return columns.to_bytes()
+
+    _, path, start, end = chunk
+    fromisoformat = datetime.datetime.fromisoformat
+    with open_log(path, 'rb') as f:
+        if start:
+            f.seek(start)
+        position = start
+        for raw in f:
+            if end is not None and position >= end:
+                break
+            position += len(raw)
+            split = raw.find(b' - {')
+            if split < 0:
+                columns.skipped += 1
+                continue
+            try:
+                entry = json.loads(raw[split + 3:])
+                ts = fromisoformat(entry['timestamp']).timestamp()
+                columns.add_entry(ts, entry)
+            except (ValueError, KeyError, TypeError):
+                columns.skipped += 1
+    return columns.to_bytes()
+
+def _npy_header(descr, count):
+    """.npy 1.0 文件头 (长度补齐到64字节的倍数)"""
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({count},), }}"
+    padding = 64 - (10 + len(header) + 1) % 64
+    header = header + ' ' * (padding % 64) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+def bounded_imap(pool, func, items, window):
+    """
+    按顺序生成func(item)的结果，同时最多向进程池提交window个未取走的任务
+
+    Pool.imap会立即把全部任务发给进程池，消费方落后时结果在内存中无限堆积;
+    这里每取走一个结果才提交下一个任务。
+    """
+    items = iter(items)
+    pending = collections.deque(pool.apply_async(func, (item,)) for item in itertools.islice(items, window))
+    while pending:
+        result = pending.popleft().get()
+        item = next(items, _END)
+        if item is not _END:
+            pending.append(pool.apply_async(func, (item,)))
+        yield result
+
+def export(path, out_dir, chunk_records=DEFAULT_CHUNK_RECORDS, workers=0, compress=False):
+    """
+    导出到out_dir下的 <类型>.npz，返回 {'rows': {类型: 行数}, 'skipped', 'chunks', 'elapsed'}
+
+    各块的列先按顺序追加到out_dir下的临时文件，最后一次性写入npz;
+    并行时最多有 workers*PENDING_PER_WORKER 个块在处理或等待写入，内存占用与文件大小无关。
+    """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = plan_chunks(path, chunk_records)
+    rows = {}
+    skipped = 0
+    with tempfile.TemporaryDirectory(dir=out_dir) as spool:
+        files = {}
+        pool = None
+        if workers and workers > 1 and len(chunks) > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(workers)
+            results = bounded_imap(pool, export_chunk, chunks, workers * PENDING_PER_WORKER)
+        else:
+            results = map(export_chunk, chunks)
+        try:
+            for tables, chunk_skipped in results:
+                skipped += chunk_skipped
+                for kind, table in tables.items():
+                    for name, data in table.items():
+                        f = files.get((kind, name))
+                        if f is None:
+                            f = files[kind, name] = open(os.path.join(spool, f"{kind}.{name}"), 'wb')
+                        f.write(data)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            for f in files.values():
+                f.close()
+
+        method = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        for kind, schema in SCHEMAS.items():
+            if (kind, 'ts') not in files:
+                continue
+            count = os.path.getsize(os.path.join(spool, f"{kind}.ts")) // 8
+            rows[kind] = count
+            with zipfile.ZipFile(os.path.join(out_dir, f"{kind}.npz"), 'w', method) as archive:
+                for name, code in schema:
+                    descr = CALLSIGN_DTYPE if code == 'S8' else NPY_DTYPES[code]
+                    with archive.open(f"{name}.npy", 'w', force_zip64=True) as member, \
+                            open(os.path.join(spool, f"{kind}.{name}"), 'rb') as column:
+                        member.write(_npy_header(descr, count))
+                        shutil.copyfileobj(column, member, 1 << 20)
+    return {'rows': rows, 'skipped': skipped, 'chunks': len(chunks), 'elapsed': time.perf_counter() - started}
+
+def load_columns(path):
+    """不依赖NumPy读取导出的npz: 列名 -> array.array (呼号列为bytes列表)"""
+    typecodes = {descr: code for code, descr in NPY_DTYPES.items()}
+    columns = {}
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.namelist():
+            data = archive.read(member)
+            if data[:6] != b'\x93NUMPY':
+                raise ValueError(f"{path}:{member} 不是.npy数据")
+            header_length, = struct.unpack_from('<H', data, 8)
+            header = ast.literal_eval(data[10:10 + header_length].decode('latin1'))
+            body = data[10 + header_length:]
+            name = member[:-4] if member.endswith('.npy') else member
+            if header['descr'] == CALLSIGN_DTYPE:
+                columns[name] = [body[i:i + 8].rstrip(b'\x00') for i in range(0, len(body), 8)]
+            else:
+                column = array.array(typecodes[header['descr']])
+                column.frombytes(body)
+                columns[name] = column
+    return columns
+
+def _group_by_icao(columns):
+    """按ICAO分组的行号列表 (组内按时间排序)"""
+    groups = {}
+    for row, icao in enumerate(columns['icao']):
+        groups.setdefault(icao, []).append(row)
+    ts = columns['ts']
+    for rows in groups.values():
+        rows.sort(key=ts.__getitem__)
+    return groups
+
+def update_rates(columns):
+    """每架飞机的报告数、平均更新率 (Hz) 和最长间隔 (秒)"""
+    ts = columns['ts']
+    result = {}
+    for icao, rows in _group_by_icao(columns).items():
+        times = [ts[row] for row in rows]
+        duration = times[-1] - times[0]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        result[icao] = {
+            'reports': len(rows),
+            'rate_hz': (len(rows) - 1) / duration if duration > 0 else 0.0,
+            'max_gap': max(gaps) if gaps else 0.0,
+        }
+    return result
+
+def position_jitter(columns):
+    """
+    每架飞机的位置抖动 (米): 按前两个报告匀速外推到当前报告时刻，与实际位置之差的均方根
+    报告不足3个的飞机不计算
+    """
+    ts, lat, lon = columns['ts'], columns['lat'], columns['lon']
+    meters_per_degree = 111320.0
+    result = {}
+    for icao, rows in _group_by_icao(columns).items():
+        total = 0.0
+        samples = 0
+        for a, b, c in zip(rows, rows[1:], rows[2:]):
+            dt_ab, dt_bc = ts[b] - ts[a], ts[c] - ts[b]
+            if dt_ab <= 0:
+                continue
+            scale = dt_bc / dt_ab
+            north = (lat[c] - (lat[b] + (lat[b] - lat[a]) * scale)) * meters_per_degree
+            east = ((lon[c] - (lon[b] + (lon[b] - lon[a]) * scale)) * meters_per_degree
+                    * math.cos(math.radians(lat[c])))
+            total += north * north + east * east
+            samples += 1
+        if samples:
+            result[icao] = math.sqrt(total / samples)
+    return result
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="把GDL-90抓包或消息日志导出为按消息类型的列式npz文件")
+    parser.add_argument('path', help='抓包文件或 *_messages.log (包括它的轮转段)')
+    parser.add_argument('-o', '--output', default='export', help='输出目录 (默认: export)')
+    parser.add_argument('--workers', type=int, default=0, help='并行解析的进程数 (默认不并行)')
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK_RECORDS, help='抓包每块的记录数')
+    parser.add_argument('--compress', action='store_true', help='npz内部使用deflate压缩 (更小，读取更慢)')
+    parser.add_argument('--analyze', action='store_true', help='导出后打印每架飞机的更新率和位置抖动')
+    args = parser.parse_args()
+
+    try:
+        result = export(args.path, args.output, args.chunk, args.workers, args.compress)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    print(f"📦 {args.path} -> {args.output}/ ({result['chunks']} 块, {result['elapsed']:.2f}s)")
+    for kind, count in result['rows'].items():
+        print(f"   {kind}.npz: {count} 行")
+    if result['skipped']:
+        print(f"   跳过 {result['skipped']} 条 (CRC错误、格式错误或不导出的消息)")
+
+    traffic_path = os.path.join(args.output, 'traffic.npz')
+    if args.analyze and os.path.exists(traffic_path):
+        columns = load_columns(traffic_path)
+        rates = update_rates(columns)
+        jitter = position_jitter(columns)
+        print(f"\n{'ICAO':>8} {'报告数':>8} {'更新率Hz':>9} {'最长间隔s':>10} {'位置抖动m':>10}")
+        for icao, info in sorted(rates.items(), key=lambda item: -item[1]['reports']):
+            print(f"  {icao:06X} {info['reports']:8d} {info['rate_hz']:9.2f} {info['max_gap']:10.2f} "
+                  f"{jitter.get(icao, NAN):10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+GDL-90 原始帧过滤
+在反转义、CRC校验和解码之前，直接从转义后的原始帧读取消息ID、ICAO地址和位置，
+丢弃不需要的帧。检查按开销从低到高: 消息类型 (查表) -> ICAO地址 (3字节) -> 经纬度范围。
+"""
+
+from gdl90_framing import FLAG_BYTE, ESCAPE_BYTE
+
+POSITION_IDS = (0x0A, 0x14)   # 自机报告 / 交通报告
+POSITION_HEADER = 11          # 消息ID(1) + 状态(1) + 地址(3) + 纬度(3) + 经度(3)
+
+# 命令行中可用的消息类型名称
+MESSAGE_TYPE_NAMES = {
+    'heartbeat': 0x00,
+    'ownship': 0x0A,
+    'geo-altitude': 0x0B,
+    'traffic': 0x14,
+    'foreflight': 0x65,   # 设备标识 / AHRS
+}
+
+def parse_types(text):
+    """'traffic,ownship' 或 '0x14,0x0A' -> 消息ID集合"""
+    types = set()
+    for item in text.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item in MESSAGE_TYPE_NAMES:
+            types.add(MESSAGE_TYPE_NAMES[item])
+        else:
+            try:
+                types.add(int(item, 16 if item.startswith('0x') else 10) & 0xFF)
+            except ValueError:
+                raise ValueError(f"未知的消息类型: {item} (可用: {', '.join(MESSAGE_TYPE_NAMES)} 或消息ID)")
+    return types
+
+def parse_icao_list(text):
+    """'ABCDEF,0xA1B2C3' -> ICAO地址集合"""
+    addresses = set()
+    for item in text.split(','):
+        item = item.strip()
+        if item:
+            addresses.add(int(item[2:] if item.lower().startswith('0x') else item, 16) & 0xFFFFFF)
+    return addresses
+
+def parse_bbox(text):
+    """'lat_min,lon_min,lat_max,lon_max' -> 元组 (lon_min > lon_max表示跨越日期变更线)"""
+    values = [float(v) for v in text.split(',')]
+    if len(values) != 4 or values[0] > values[2]:
+        raise ValueError("范围格式: lat_min,lon_min,lat_max,lon_max")
+    return tuple(values)
+
+def _angle24(p, i):
+    value = (p[i] << 16) | (p[i + 1] << 8) | p[i + 2]
+    if value & 0x800000:
+        value -= 0x1000000
+    return value * (180.0 / 0x800000)
+
+class FrameFilter:
+    """
+    原始帧过滤器
+
+    types: 允许的消息ID集合 (None表示全部)
+    icao: 允许的ICAO地址集合，只作用于位置报告 (None表示全部)
+    bbox: (lat_min, lon_min, lat_max, lon_max)，只作用于位置报告
+    """
+
+    def __init__(self, types=None, icao=None, bbox=None):
+        allowed = bytearray(b'\x01' * 256)
+        if types is not None:
+            allowed = bytearray(256)
+            for msg_id in types:
+                allowed[msg_id] = 1
+        self.allowed = allowed       # 按消息ID查表
+        self.icao = frozenset(icao) if icao else None
+        self.bbox = bbox
+        self._check_position = self.icao is not None or bbox is not None
+
+    def restrict_types(self, types):
+        """进一步限制允许的消息ID (与已有的类型取交集)"""
+        for msg_id in range(256):
+            if msg_id not in types:
+                self.allowed[msg_id] = 0
+
+    @property
+    def active(self):
+        return self._check_position or not all(self.allowed)
+
+    def accepts(self, frame):
+        """frame为含首尾标记的转义帧; 无法判断的帧 (格式错误、过短) 一律放行，交给解码器报告"""
+        if len(frame) < 4 or frame[0] != FLAG_BYTE:
+            return True
+        msg_id = frame[1]
+        if msg_id == ESCAPE_BYTE:
+            msg_id = frame[2] ^ 0x20
+        if not self.allowed[msg_id]:
+            return False
+        if not self._check_position or msg_id not in POSITION_IDS:
+            return True
+
+        header = frame[1:POSITION_HEADER + 1]
+        if ESCAPE_BYTE in header:   # 头部有转义字节时 (少见) 才反转义前几个字节
+            header = bytes(frame[1:2 * POSITION_HEADER + 1]).replace(b'\x7d\x5e', b'\x7e').replace(b'\x7d\x5d', b'\x7d')
+        if len(header) < POSITION_HEADER:
+            return True
+
+        if self.icao is not None and ((header[2] << 16) | (header[3] << 8) | header[4]) not in self.icao:
+            return False
+        if self.bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = self.bbox
+            lat = _angle24(header, 5)
+            if lat < lat_min or lat > lat_max:
+                return False
+            lon = _angle24(header, 8)
+            if lon_min <= lon_max:
+                return lon_min <= lon <= lon_max
+            return lon >= lon_min or lon <= lon_max
+        return True
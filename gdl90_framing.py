@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+GDL-90 帧切分
+以0x7E为分隔符单次扫描数据报 (或TCP字节流)，生成完整帧的memoryview，不拷贝帧数据。
+一个数据报可以携带多帧，相邻帧可以各自带标记 (…7E 7E…) 或共用一个标记 (…7E…)。
+接收端 (gdl90_receiver.py, xp/gdl90_receiver.py) 共用。
+"""
+
+FLAG_BYTE = 0x7E
+ESCAPE_BYTE = 0x7D
+DEFAULT_MAX_FRAME = 1024   # 未完成帧的最大缓存字节数 (GDL-90最长消息转义后也远小于此)
+
+def iter_frames(data, start=0):
+    """
+    单次扫描data (bytes/bytearray)，生成其中每个完整帧的memoryview (含首尾0x7E)
+
+    第一个标记之前和最后一个标记之后的字节被忽略，空帧 (7E 7E) 被跳过。
+    生成的视图引用data本身，data不变时一直有效。
+    """
+    view = memoryview(data)
+    find = data.find
+    begin = find(FLAG_BYTE, start)
+    while begin != -1:
+        end = find(FLAG_BYTE, begin + 1)
+        if end == -1:
+            return
+        if end > begin + 1:
+            yield view[begin:end + 1]
+        begin = end
+
+class FrameSplitter:
+    """
+    跨多次读取切分帧的流式切分器
+
+    完整帧直接以输入数据的视图生成，只有跨越两次读取的未完成帧被拷贝进固定大小的缓冲区;
+    未完成帧超过max_frame字节时被丢弃 (计入dropped)，在下一个标记处重新同步。
+    缓冲区中帧的视图只在下一次feed之前有效，需要保留的调用方自行bytes()拷贝。
+    """
+
+    def __init__(self, max_frame=DEFAULT_MAX_FRAME):
+        self.buffer = bytearray(max_frame)
+        self.buffer[0] = FLAG_BYTE  # 未完成帧总是从起始标记开始
+        self.pending = 0      # 缓冲区中未完成帧的字节数 (含起始标记)
+        self.frames = 0       # 已生成的帧数
+        self.dropped = 0      # 因超长被丢弃的未完成帧数
+
+    def reset(self):
+        self.pending = 0
+
+    def _keep(self, view):
+        """把未完成帧的一段追加到缓冲区，超长时丢弃整个未完成帧"""
+        total = self.pending + len(view)
+        if total > len(self.buffer):
+            self.dropped += 1
+            self.pending = 0
+            return
+        self.buffer[self.pending:total] = view
+        self.pending = total
+
+    def feed(self, data):
+        """输入一次读取的数据 (bytes/bytearray)，生成其中完成的帧"""
+        view = memoryview(data)
+        find = data.find
+        if self.pending:
+            end = find(FLAG_BYTE)
+            if end == -1:
+                self._keep(view)
+                return
+            if end or self.pending > 1:       # 否则是空帧 7E 7E
+                self._keep(view[:end + 1])
+                if self.pending:
+                    self.frames += 1
+                    yield memoryview(self.buffer)[:self.pending]
+            self.pending = 0
+            begin = end       # 结束标记同时可能是下一帧的起始标记
+        else:
+            begin = find(FLAG_BYTE)
+            if begin == -1:
+                return        # 不在帧内，丢弃标记之前的字节
+
+        while True:
+            end = find(FLAG_BYTE, begin + 1)
+            if end == -1:
+                break
+            if end > begin + 1:
+                self.frames += 1
+                yield view[begin:end + 1]
+            begin = end
+        if begin == len(data) - 1:
+            self.pending = 1  # 只剩一个标记 (数据报的常见结尾)，缓冲区首字节就是它，不用拷贝
+        else:
+            self._keep(view[begin:])
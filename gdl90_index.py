@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+日志/抓包的稀疏时间索引
+写入端每隔一段时间 (默认1秒) 或每N条记录在旁边的 .idx 文件中追加一条 (时间, 字节偏移, 附加值)，
+查询时二分查找索引定位到时间窗口起点附近，再从数据文件的该偏移开始顺序读取。
+
+索引文件格式 (小端序): 文件头 b'GDL90IDX' | 版本 u16 | 保留 6字节; 之后为24字节的条目:
+  Unix时间 (秒) f64 | 数据文件字节偏移 u64 | 附加值 u64
+附加值: 抓包文件中为该位置的时间基准 (见gdl90_capture)，最高位置1表示该偏移处是发送方定义记录。
+"""
+
+import bisect
+import os
+import struct
+
+INDEX_MAGIC = b'GDL90IDX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sH6x')
+INDEX_ENTRY = struct.Struct('<dQQ')
+SENDER_ENTRY = 1 << 63
+DEFAULT_INDEX_INTERVAL = 1.0     # 秒
+DEFAULT_INDEX_EVERY = 4096       # 记录
+
+def index_path(path):
+    return path + '.idx'
+
+class IndexWriter:
+    """按时间间隔或记录数追加索引条目 (与数据文件的写入在同一线程)"""
+
+    def __init__(self, path, append=False, interval=DEFAULT_INDEX_INTERVAL, every=DEFAULT_INDEX_EVERY):
+        """append: 数据文件是追加写入的已有文件时继续使用已有索引，否则重建"""
+        self.path = path
+        self.interval = interval
+        self.every = every
+        exists = os.path.exists(path) and os.path.getsize(path) >= INDEX_HEADER.size
+        self._file = open(path, 'ab')
+        if not (append and exists):
+            self._file.truncate(0)
+            self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        self._last_time = float('-inf')
+        self._since = 0
+        self.entries = 0
+
+    def add(self, timestamp, offset, aux=0):
+        """记录即将写入的位置; 距上一条索引超过interval秒或every条记录时追加索引条目"""
+        if self._since >= self.every or timestamp - self._last_time >= self.interval:
+            self._file.write(INDEX_ENTRY.pack(timestamp, offset, aux))
+            self._last_time = timestamp
+            self._since = 0
+            self.entries += 1
+        self._since += 1
+
+    def add_sender(self, timestamp, offset):
+        """抓包文件中的发送方定义记录总是进入索引，查询时不用扫描数据文件就能解析发送方"""
+        self._file.write(INDEX_ENTRY.pack(timestamp, offset, SENDER_ENTRY))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class TimeIndex:
+    """读取索引文件; 索引不完整 (写入中断) 时只使用完整的条目"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < INDEX_HEADER.size or INDEX_HEADER.unpack_from(data)[0] != INDEX_MAGIC:
+            raise ValueError(f"{path}: 不是索引文件")
+        usable = INDEX_HEADER.size + (len(data) - INDEX_HEADER.size) // INDEX_ENTRY.size * INDEX_ENTRY.size
+        self.times = []
+        self.offsets = []
+        self.aux = []
+        self.senders = []    # 发送方定义记录的偏移
+        for timestamp, offset, aux in INDEX_ENTRY.iter_unpack(memoryview(data)[INDEX_HEADER.size:usable]):
+            if aux & SENDER_ENTRY:
+                self.senders.append(offset)
+                continue
+            self.times.append(timestamp)
+            self.offsets.append(offset)
+            self.aux.append(aux)
+
+    def __len__(self):
+        return len(self.times)
+
+    def seek(self, timestamp):
+        """返回不晚于timestamp的最后一个索引位置 (偏移, 附加值)，没有时返回None (从文件开头读)"""
+        i = bisect.bisect_right(self.times, timestamp) - 1
+        if i < 0:
+            return None
+        return self.offsets[i], self.aux[i]
+
+def open_index(path):
+    """打开数据文件对应的索引，不存在或损坏时返回None"""
+    try:
+        return TimeIndex(index_path(path))
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+GDL-90 日志时间范围查询
+支持二进制抓包 (gdl90_capture) 和JSON消息日志 (*_messages.log)。
+有 .idx 时间索引时二分定位到时间窗口起点附近再顺序读取，没有索引的旧日志从文件开头扫描。
+消息日志按时间顺序依次查询全部轮转段 (见gdl90_logrotate)，压缩的段边解压边读取。
+
+示例:
+  python gdl90_logquery.py receiver_messages.log --around 14:32:05 --window 10
+  python gdl90_logquery.py session.gdl90cap --start "2025-08-12 22:33:00" --end "2025-08-12 22:34:00" --icao ABCDEF
+"""
+
+import datetime
+import json
+import os
+import time
+
+from gdl90_capture import MAGIC, CaptureReader
+from gdl90_filter import FrameFilter, parse_icao_list, parse_types
+from gdl90_index import open_index
+from gdl90_logrotate import open_log, segment_paths
+from gdl90_msglog import format_log_record
+
+# 消息ID -> JSON消息日志中的message_type
+LOG_MESSAGE_TYPES = {
+    0x00: ('Heartbeat',),
+    0x0A: ('Ownship Report',),
+    0x0B: ('Ownship Geometric Altitude',),
+    0x14: ('Traffic Report',),
+    0x65: ('Device ID', 'AHRS'),
+}
+POSITION_TYPES = ('Ownship Report', 'Traffic Report')
+READ_BUFFER_SIZE = 1 << 20
+LATEST_TIME = 253402300799.0   # 9999-12-31, 未指定结束时间时使用
+
+def is_capture(path):
+    if not os.path.exists(path):
+        return False   # 日志已全部轮转，只剩轮转段
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def query_capture(path, start, end, icao=None, types=None):
+    """生成抓包中时间在[start, end]内的 (Unix时间, 发送方, 帧视图)，帧视图只在迭代期间有效"""
+    frame_filter = FrameFilter(types, icao)
+    check = frame_filter.accepts if frame_filter.active else None
+    index = open_index(path)
+    with CaptureReader(path) as reader:
+        offset, base_ns = None, 0
+        position = index.seek(start) if index is not None else None
+        if position is not None:
+            offset, base_ns = position
+            for sender_offset in index.senders:   # 定位点之前定义的发送方
+                if sender_offset < offset:
+                    reader.load_sender(sender_offset)
+        start_ns = int(start * 1e9) - reader.start_wall_ns
+        end_ns = int(end * 1e9) - reader.start_wall_ns
+        for offset_ns, sender, frame, _ in reader.records(offset, base_ns):
+            if offset_ns < start_ns:
+                continue
+            if offset_ns > end_ns:
+                break
+            if check is None or check(frame):
+                yield reader.wall_time(offset_ns), sender, frame
+
+def _log_prefix(timestamp):
+    """与消息日志行首时间相同格式的秒级字符串，可直接按字典序比较"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+def query_message_log(path, start, end, icao=None, types=None):
+    """
+    生成JSON消息日志中时间在[start, end]内的 (Unix时间, 日志条目)
+
+    path为正在写入的日志时依次查询它的全部轮转段; 有索引的段按下一段的起始时间跳过。
+    先按行首的秒级时间字符串粗筛，只对窗口内的行做JSON解析，
+    精确时间取自条目中的timestamp字段 (兼容行首毫秒格式有误的旧日志)。
+    """
+    names = None
+    if types is not None:
+        names = {name for msg_id in types for name in LOG_MESSAGE_TYPES.get(msg_id, ())}
+    icao_names = {f"0x{address:06X}" for address in icao} if icao else None
+
+    segments = segment_paths(path) or [path]
+    indexes = [open_index(segment) for segment in segments]
+    for i, segment in enumerate(segments):
+        following = indexes[i + 1] if i + 1 < len(segments) else None
+        if following is not None and len(following) and following.times[0] <= start:
+            continue   # 下一段开始时还没到查询窗口
+        index = indexes[i]
+        if index is not None and len(index) and index.times[0] > end:
+            break
+        yield from _query_log_segment(segment, index, start, end, names, icao_names)
+
+def _query_log_segment(path, index, start, end, names, icao_names):
+    first, last = _log_prefix(start), _log_prefix(end)
+    position = index.seek(start) if index is not None else None
+    with open_log(path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+        if position is not None:
+            f.seek(position[0])
+        for raw in f:
+            prefix = raw[:19].decode('ascii', errors='replace')
+            if prefix < first:
+                continue
+            if prefix > last:
+                break
+            try:
+                entry = json.loads(raw[raw.index(b' - {') + 3:])
+                timestamp = datetime.datetime.fromisoformat(entry['timestamp']).timestamp()
+            except (ValueError, KeyError):
+                continue   # 不完整的行 (写入中断) 或其他格式
+            if timestamp < start or timestamp > end:
+                continue
+            if names is not None and entry.get('message_type') not in names:
+                continue
+            if (icao_names is not None and entry.get('message_type') in POSITION_TYPES
+                    and (entry.get('data') or {}).get('icao_address') not in icao_names):
+                continue   # 与FrameFilter一致: ICAO过滤只作用于位置报告
+            yield timestamp, entry
+
+def query(path, start, end, icao=None, types=None):
+    """按文件类型选择查询方式"""
+    if is_capture(path):
+        return query_capture(path, start, end, icao, types)
+    return query_message_log(path, start, end, icao, types)
+
+def first_timestamp(path):
+    """文件中第一条记录的Unix时间 (用于补全只给出时分秒的查询时间)"""
+    if is_capture(path):
+        with CaptureReader(path) as reader:
+            for offset_ns, _, _ in reader:
+                return reader.wall_time(offset_ns)
+            return reader.wall_time(0)
+    with open_log((segment_paths(path) or [path])[0], 'rb') as f:
+        for raw in f:
+            try:
+                return datetime.datetime.strptime(raw[:19].decode('ascii'), '%Y-%m-%d %H:%M:%S').timestamp()
+            except ValueError:
+                continue
+    return time.time()
+
+def parse_time(text, reference):
+    """
+    查询时间 -> Unix时间
+    支持Unix秒数、'YYYY-MM-DD HH:MM:SS[.fff]' 和 'HH:MM:SS[.fff]' (日期取reference所在的本地日期)
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        pass
+    try:
+        clock = datetime.time.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"无法解析时间: {text} (可用: Unix秒数, 'YYYY-MM-DD HH:MM:SS', 'HH:MM:SS')")
+    return datetime.datetime.combine(datetime.datetime.fromtimestamp(reference).date(), clock).timestamp()
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="按时间范围查询GDL-90抓包或消息日志")
+    parser.add_argument('path', help='抓包文件或 *_messages.log')
+    parser.add_argument('--start', help='开始时间')
+    parser.add_argument('--end', help='结束时间')
+    parser.add_argument('--around', help='查询该时间前后 --window 秒')
+    parser.add_argument('--window', type=float, default=5.0, help='--around 的前后范围 (秒，默认5)')
+    parser.add_argument('--icao', help='只输出这些ICAO地址的位置报告')
+    parser.add_argument('--types', help='只输出这些消息类型 (traffic,ownship,heartbeat,... 或消息ID)')
+    args = parser.parse_args()
+
+    try:
+        reference = first_timestamp(args.path)
+        if args.around:
+            center = parse_time(args.around, reference)
+            start, end = center - args.window, center + args.window
+        else:
+            start = parse_time(args.start, reference) if args.start else 0.0
+            end = parse_time(args.end, reference) if args.end else LATEST_TIME
+        icao = parse_icao_list(args.icao) if args.icao else None
+        types = parse_types(args.types) if args.types else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    began = time.perf_counter()
+    count = 0
+    if is_capture(args.path):
+        # 抓包记录用接收端的消息日志格式输出，便于与JSON日志对照
+        from gdl90_receiver import GDL90Decoder
+        decoder = GDL90Decoder()
+        for timestamp, sender, frame in query_capture(args.path, start, end, icao, types):
+            count += 1
+            host, _, port = (sender or '?:0').rpartition(':')
+            print(format_log_record(decoder, (count, timestamp, (host, port), bytes(frame))))
+    else:
+        for timestamp, entry in query_message_log(args.path, start, end, icao, types):
+            count += 1
+            print(json.dumps(entry, ensure_ascii=False))
+    elapsed = time.perf_counter() - began
+    indexed = '使用索引' if open_index((segment_paths(args.path) or [args.path])[-1]) is not None else '无索引，顺序扫描'
+    print(f"🔎 {count} 条记录, {elapsed * 1000:.1f}ms ({indexed})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+日志轮转与后台压缩
+日志文件达到大小上限或时间间隔后改名为 <日志文件>.<开始时间 YYYYmmdd-HHMMSS>，
+然后由后台线程流式压缩为 .gz (或 .bz2 / .xz)，压缩完成后删除未压缩的文件。
+改名只需要一次rename，压缩不占用写日志的线程，更不会阻塞UDP接收。
+日志旁边的时间索引 (.idx, 见gdl90_index) 随日志一起改名，偏移按未压缩的内容计算。
+
+读取端用open_log()透明打开压缩或未压缩的文件，segment_paths()按时间顺序列出全部轮转段。
+"""
+
+import bz2
+import glob
+import gzip
+import logging.handlers
+import lzma
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+from gdl90_index import index_path
+
+# 压缩格式: 名称 -> (扩展名, 打开函数)。标准库没有zstd，这里只提供标准库支持的格式
+COMPRESSIONS = {
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'xz': ('.xz', lzma.open),
+}
+OPENERS = {suffix: opener for suffix, opener in COMPRESSIONS.values()}
+SEGMENT_PATTERN = re.compile(r'\.(\d{8}-\d{6})(?:-(\d+))?(\.gz|\.bz2|\.xz)?$')
+COPY_CHUNK_SIZE = 1 << 20
+
+def open_log(path, mode='rb', encoding='utf-8', newline=None, buffering=-1):
+    """按扩展名透明打开压缩或未压缩的日志 (mode为 'rb' 或 'rt')"""
+    opener = OPENERS.get(os.path.splitext(path)[1])
+    if 't' not in mode:
+        encoding = newline = None
+    if opener is None:
+        return open(path, mode.replace('t', ''), buffering=buffering, encoding=encoding, newline=newline)
+    return opener(path, mode, encoding=encoding, newline=newline)
+
+def strip_compression(path):
+    """去掉压缩扩展名 (用于按原始扩展名判断文件格式)"""
+    root, suffix = os.path.splitext(path)
+    return root if suffix in OPENERS else path
+
+def segment_paths(path):
+    """
+    按时间顺序列出日志的全部轮转段 (已压缩和尚未压缩的)，最后是正在写入的日志本身 (若存在)
+    path本身就是一个轮转段或压缩文件时只返回它
+    """
+    if SEGMENT_PATTERN.search(path) or os.path.splitext(path)[1] in OPENERS:
+        return [path]
+    segments = []
+    prefix = len(path)
+    for candidate in glob.glob(glob.escape(path) + '.*'):
+        match = SEGMENT_PATTERN.fullmatch(candidate[prefix:])
+        if match:
+            segments.append(((match.group(1), int(match.group(2) or 0)), candidate))
+    paths = [candidate for _, candidate in sorted(segments)]
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+def parse_interval(text):
+    """'3600' / '30m' / '6h' / '1d' -> 秒"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    text = text.strip().lower()
+    scale = units.get(text[-1:], None)
+    try:
+        value = float(text[:-1] if scale else text) * (scale or 1)
+    except ValueError:
+        raise ValueError(f"无法解析时间间隔: {text} (例如 3600, 30m, 6h, 1d)")
+    if value <= 0:
+        raise ValueError("轮转时间间隔必须大于0")
+    return value
+
+class SegmentCompressor:
+    """
+    后台压缩线程
+
+    submit()只把文件放入队列; 线程把它流式压缩到临时文件，完成后改名为最终文件名并删除原文件，
+    中途退出时不会留下不完整的压缩文件。
+    """
+
+    def __init__(self, compression='gzip', level=6):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩格式: {compression} (可用: {', '.join(COMPRESSIONS)})")
+        self.suffix, self._opener = COMPRESSIONS[compression]
+        self.level = level
+        self.queue = queue.Queue()
+        self.compressed = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='gdl90-log-compress', daemon=True)
+                self._thread.start()
+        self.queue.put(path)
+
+    def recover(self, path):
+        """提交上次运行中已轮转但未压缩完的段"""
+        for segment in segment_paths(path):
+            if segment != path and os.path.splitext(segment)[1] not in OPENERS:
+                self.submit(segment)
+
+    def _compress(self, path):
+        target = path + self.suffix
+        temporary = target + '.tmp'
+        kwargs = {'preset': self.level} if self.suffix == '.xz' else {'compresslevel': self.level}
+        with open(path, 'rb') as source, self._opener(temporary, 'wb', **kwargs) as sink:
+            shutil.copyfileobj(source, sink, COPY_CHUNK_SIZE)
+        os.replace(temporary, target)
+        if os.path.exists(index_path(path)):
+            os.replace(index_path(path), index_path(target))
+        self.bytes_in += os.path.getsize(path)
+        self.bytes_out += os.path.getsize(target)
+        os.remove(path)
+
+    def _run(self):
+        while True:
+            path = self.queue.get()
+            try:
+                if path is None:
+                    return
+                self._compress(path)
+                self.compressed += 1
+            except OSError:
+                self.errors += 1    # 保留未压缩的段，下次启动时recover()重试
+            finally:
+                self.queue.task_done()
+
+    @property
+    def pending(self):
+        return self.queue.qsize()
+
+    def close(self):
+        """压缩完队列中剩余的段后停止线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+    def metrics(self):
+        return {
+            'pending': self.pending,
+            'compressed': self.compressed,
+            'errors': self.errors,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+class LogRotation:
+    """
+    轮转策略: 文件超过max_bytes或距打开超过interval秒时轮转 (两者为None时不检查)
+    compressor为None时只改名不压缩。多个日志可以共用一个LogRotation。
+    """
+
+    def __init__(self, max_bytes=None, interval=None, compressor=None):
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compressor = compressor
+        self.rotations = 0
+
+    def due(self, size, opened_at, now):
+        if size <= 0:
+            return False
+        if self.max_bytes is not None and size >= self.max_bytes:
+            return True
+        return self.interval is not None and now - opened_at >= self.interval
+
+    def rotate(self, path, opened_at):
+        """把path (已关闭) 及其索引改名为轮转段并提交压缩，返回轮转段路径"""
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(opened_at))
+        segment = f"{path}.{stamp}"
+        n = 0
+        while any(os.path.exists(segment + suffix) for suffix in ('', '.gz', '.bz2', '.xz')):
+            n += 1
+            segment = f"{path}.{stamp}-{n}"
+        os.replace(path, segment)
+        if os.path.exists(index_path(path)):
+            os.replace(index_path(path), index_path(segment))
+        self.rotations += 1
+        if self.compressor is not None:
+            self.compressor.submit(segment)
+        return segment
+
+    def close(self):
+        if self.compressor is not None:
+            self.compressor.close()
+
+class RotatingLogHandler(logging.handlers.BaseRotatingHandler):
+    """主日志用的logging处理器，按LogRotation轮转"""
+
+    def __init__(self, filename, rotation, encoding='utf-8'):
+        super().__init__(filename, 'a', encoding=encoding)
+        self.rotation = rotation
+        self.opened_at = time.time()
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        return self.rotation.due(self.stream.tell(), self.opened_at, time.time())
+
+    def doRollover(self):
+        self.stream.close()
+        self.stream = None
+        self.rotation.rotate(self.baseFilename, self.opened_at)
+        self.opened_at = time.time()
+        self.stream = self._open()
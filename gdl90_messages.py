@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+GDL-90 解码消息视图
+位置报告 (自机 0x0A / 交通 0x14) 不再在解码时一次性生成全部字段，
+视图只保存反转义后的消息体，字段在第一次访问时计算并缓存。
+视图实现Mapping接口，decoded['latitude'] / decoded.get(...) / 'error' in decoded 等用法不变。
+"""
+
+from collections.abc import Mapping
+
+POSITION_REPORT_LENGTH = 28   # 消息ID(1) + 状态(1) + 地址(3) + 纬度(3) + 经度(3) + ... + 代码(1)
+
+def _u24(p, i):
+    return (p[i] << 16) | (p[i + 1] << 8) | p[i + 2]
+
+def _angle24(value):
+    """24位2的补码角度 (纬度/经度)，分辨率 180/2^23 度"""
+    if value & 0x800000:
+        value -= 0x1000000
+    return value * (180.0 / 0x800000)
+
+def _ground_speed(p):
+    h_velocity = (p[14] << 4) | (p[15] >> 4)
+    return h_velocity if h_velocity != 0xfff else None
+
+def _vertical_speed(p):
+    v_velocity = ((p[15] & 0x0f) << 8) | p[16]
+    if v_velocity == 0x800:   # 无数据
+        return None
+    if v_velocity & 0x800:
+        v_velocity -= 0x1000
+    return v_velocity * 64     # 64fpm增量
+
+# 字段名 -> 从消息体计算字段值的函数
+POSITION_FIELDS = {
+    'icao_address': lambda p: f"0x{_u24(p, 2):06X}",
+    'latitude': lambda p: _angle24(_u24(p, 5)),
+    'longitude': lambda p: _angle24(_u24(p, 8)),
+    'altitude_ft': lambda p: ((((p[11] << 8) | p[12]) & 0xfff0) >> 4) * 25 - 1000,  # 25英尺增量，偏移-1000英尺
+    'misc': lambda p: p[12] & 0x0f,
+    'nav_integrity': lambda p: (p[13] & 0xf0) >> 4,
+    'nav_accuracy': lambda p: p[13] & 0x0f,
+    'ground_speed_kts': _ground_speed,
+    'vertical_speed_fpm': _vertical_speed,
+    'track_deg': lambda p: p[17] * (360.0 / 256),  # 1.4度分辨率
+    'emitter_category': lambda p: p[18],
+    'callsign': lambda p: bytes(p[19:27]).decode('ascii', errors='replace').rstrip('\x00').strip(),
+    'emergency_code': lambda p: (p[27] & 0xf0) >> 4,
+}
+
+OWNSHIP_FIELDS = dict(POSITION_FIELDS,
+                      status=lambda p: (p[1] & 0xf0) >> 4,
+                      addr_type=lambda p: p[1] & 0x0f)
+
+# Traffic Report格式: s(1位 交通警报) + t(3位 地址类型) + 4位填充
+TRAFFIC_FIELDS = dict(POSITION_FIELDS,
+                      status=lambda p: (p[1] & 0x80) >> 7,
+                      addr_type=lambda p: (p[1] & 0x70) >> 4)
+
+class MessageView(Mapping):
+    """
+    按需解码的消息视图
+
+    payload为反转义并去掉CRC的消息体 (第一个字节是消息ID)。
+    子类提供message_type和FIELDS (字段名 -> 计算函数)。
+    """
+
+    __slots__ = ('payload', '_cache')
+
+    message_type = 'Unknown'
+    FIELDS = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+        self._cache = None
+
+    @property
+    def message_id(self):
+        return self.payload[0]
+
+    @property
+    def icao(self):
+        """ICAO地址 (整数)，没有地址的消息为None"""
+        return None
+
+    def __getitem__(self, key):
+        if key == 'message_type':
+            return self.message_type
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = {}
+        elif key in cache:
+            return cache[key]
+        decode = self.FIELDS.get(key)
+        if decode is None:
+            raise KeyError(key)
+        value = cache[key] = decode(self.payload)
+        return value
+
+    def __contains__(self, key):
+        return key == 'message_type' or key in self.FIELDS
+
+    def __iter__(self):
+        yield 'message_type'
+        yield from self.FIELDS
+
+    def __len__(self):
+        return len(self.FIELDS) + 1
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+class PositionReportView(MessageView):
+    """位置报告视图 (自机报告和交通报告的公共部分)"""
+
+    __slots__ = ()
+
+    def __init__(self, payload):
+        if len(payload) < POSITION_REPORT_LENGTH:
+            raise ValueError(f"{self.message_type}消息长度不足")
+        self.payload = payload
+        self._cache = None
+
+    @property
+    def icao(self):
+        p = self.payload
+        return (p[2] << 16) | (p[3] << 8) | p[4]
+
+class OwnshipReportView(PositionReportView):
+    __slots__ = ()
+    message_type = 'Ownship Report'
+    FIELDS = OWNSHIP_FIELDS
+
+class TrafficReportView(PositionReportView):
+    __slots__ = ()
+    message_type = 'Traffic Report'
+    FIELDS = TRAFFIC_FIELDS
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+GDL-90 消息日志后台写入
+接收线程只把 (序号, 接收时间, 发送方, 原始帧) 放入有界队列，
+后台线程批量格式化 (解码、JSON序列化) 并通过一个带缓冲的文件句柄写入。
+队列满时丢弃新记录并计数，磁盘变慢不会阻塞UDP接收。
+提供record_time时同时在 <日志文件>.idx 中维护稀疏时间索引 (见gdl90_index)。
+提供rotation (见gdl90_logrotate) 时由写入线程在批次之间轮转日志，压缩在另一个后台线程中进行。
+"""
+
+import collections
+import datetime
+import json
+import threading
+import time
+
+from gdl90_index import IndexWriter, index_path
+
+DEFAULT_MAX_QUEUE = 20000      # 队列最多缓存的记录数
+DEFAULT_BATCH_SIZE = 512       # 队列达到该长度时立即唤醒写入线程
+DEFAULT_FLUSH_INTERVAL = 0.5   # 写入线程最长等待时间 (秒)，也是日志落盘的最大延迟
+WRITE_BUFFER_SIZE = 1 << 16
+ROTATE_CHUNK = 4096            # 启用轮转时每次最多写入的记录数，积压时也能按时轮转
+
+class AsyncMessageLog:
+    """
+    有界队列 + 后台批量写入的消息日志
+
+    format_record(record) 在写入线程中调用，把一条记录转换为一行文本 (不含换行)，
+    返回None表示跳过。record为enqueue时传入的元组。
+    record_time(record) 返回记录的Unix时间，用于写时间索引; 为None时不建索引。
+    """
+
+    def __init__(self, path, format_record, max_queue=DEFAULT_MAX_QUEUE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, record_time=None,
+                 rotation=None):
+        self.path = path
+        self.format_record = format_record
+        self.record_time = record_time
+        self.rotation = rotation
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = collections.deque()   # append/popleft在GIL下是原子的，接收线程不用加锁
+        self.enqueued = 0
+        self.dropped = 0           # 队列满时丢弃的记录数
+        self.written = 0
+        self.format_errors = 0
+        self.rotate_errors = 0
+        self.batches = 0
+        self.max_depth = 0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self._file = None
+        self._index = None
+        self._offset = 0
+        self._opened_at = 0.0
+
+    @property
+    def depth(self):
+        """当前队列中等待写入的记录数"""
+        return len(self.queue)
+
+    def _open(self):
+        self._file = open(self.path, 'ab', buffering=WRITE_BUFFER_SIZE)
+        self._offset = self._file.tell()
+        self._opened_at = time.time()
+        if self.record_time is not None:
+            # 追加到已有日志时沿用已有索引 (日志为空时重建)
+            self._index = IndexWriter(index_path(self.path), append=self._offset > 0)
+
+    def _close_file(self):
+        self._file.close()
+        self._file = None
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+    def _maybe_rotate(self):
+        rotation = self.rotation
+        if rotation is not None and rotation.due(self._offset, self._opened_at, time.time()):
+            self._close_file()
+            try:
+                rotation.rotate(self.path, self._opened_at)
+            except OSError:
+                self.rotate_errors += 1   # 改名失败时继续写原文件，下一批再试
+            self._open()
+
+    def start(self):
+        self._open()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='gdl90-message-log', daemon=True)
+        self._thread.start()
+        return self
+
+    def enqueue(self, record):
+        """接收线程调用: 只做一次长度检查和一次append，不做格式化"""
+        queue = self.queue
+        depth = len(queue)
+        if depth >= self.max_queue:
+            self.dropped += 1
+            return False
+        queue.append(record)
+        self.enqueued += 1
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+        if depth + 1 >= self.batch_size and not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def _drain(self, limit=None):
+        """取出当前队列中的记录 (最多limit条)，格式化后一次写入; 返回取出的记录数"""
+        queue = self.queue
+        count = len(queue) if limit is None else min(len(queue), limit)
+        if not count:
+            return 0
+        format_record = self.format_record
+        record_time = self.record_time
+        index = self._index
+        offset = self._offset
+        lines = []
+        for _ in range(count):
+            record = queue.popleft()
+            try:
+                line = format_record(record)
+                if line is None:
+                    continue
+                line = (line + '\n').encode('utf-8')
+                if index is not None:
+                    index.add(record_time(record), offset)
+            except Exception:
+                self.format_errors += 1
+                continue
+            lines.append(line)
+            offset += len(line)
+        if lines:
+            self._file.write(b''.join(lines))
+            self._file.flush()
+            if index is not None:
+                index.flush()
+            self.written += len(lines)
+            self._offset = offset
+        self.batches += 1
+        return count
+
+    def _write_pending(self):
+        if self.rotation is None:
+            self._drain()
+            return
+        while self._drain(ROTATE_CHUNK):
+            self._maybe_rotate()
+        self._maybe_rotate()   # 空闲时也按时间间隔轮转
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_pending()
+        self._write_pending()
+
+    def close(self):
+        """停止写入线程，写完队列中剩余的记录"""
+        if self._thread is None:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self._close_file()
+
+    def metrics(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'format_errors': self.format_errors,
+            'rotate_errors': self.rotate_errors,
+            'batches': self.batches,
+        }
+
+def format_timestamp(timestamp):
+    """日志行前缀时间: 本地时间，毫秒精度"""
+    seconds = int(timestamp)
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(seconds)) + f".{int((timestamp - seconds) * 1000):03d}"
+
+def format_log_record(decoder, record):
+    """
+    解码原始帧并生成一行JSON格式的消息日志
+
+    record为 (序号, 接收时间, 发送方地址, 原始帧)，decoder为gdl90_receiver.GDL90Decoder
+    (解码统计计入该解码器)。接收端的写入线程和gdl90_logquery都用它格式化。
+    """
+    seq, received_at, sender_addr, frame = record
+    decoded = decoder.decode_message(frame)
+
+    # 基本信息
+    log_entry = {
+        'seq': seq,
+        'timestamp': datetime.datetime.fromtimestamp(received_at).isoformat(),
+        'sender': f"{sender_addr[0]}:{sender_addr[1]}",
+        'message_type': decoded.get('message_type', 'Unknown')
+    }
+
+    # 根据消息类型添加详细信息
+    if 'error' in decoded:
+        log_entry['error'] = decoded['error']
+        log_entry['raw_hex'] = decoded.get('raw_hex', '')
+        log_entry['length'] = decoded.get('length', 0)
+    else:
+        msg_type = decoded.get('message_type')
+
+        if msg_type == 'Heartbeat':
+            log_entry['data'] = {
+                'timestamp': decoded['timestamp'],
+                'timestamp_raw': decoded['timestamp_raw'],
+                'status1': decoded['status1'],
+                'status2': decoded['status2'],
+                'message_count': decoded['message_count'],
+                'uplink_count': decoded['uplink_count'],
+                'report_count': decoded['report_count']
+            }
+
+        elif msg_type in ['Ownship Report', 'Traffic Report']:
+            log_entry['data'] = {
+                'icao_address': decoded['icao_address'],
+                'latitude': decoded['latitude'],
+                'longitude': decoded['longitude'],
+                'altitude_ft': decoded['altitude_ft'],
+                'ground_speed_kts': decoded.get('ground_speed_kts'),
+                'vertical_speed_fpm': decoded.get('vertical_speed_fpm'),
+                'track_deg': decoded['track_deg'],
+                'callsign': decoded['callsign'],
+                'emitter_category': decoded['emitter_category'],
+                'nav_integrity': decoded['nav_integrity'],
+                'nav_accuracy': decoded['nav_accuracy']
+            }
+
+            if msg_type == 'Traffic Report':
+                log_entry['data']['emergency_code'] = decoded.get('emergency_code', 0)
+
+        elif msg_type in ['Ownship Geometric Altitude', 'Device ID', 'AHRS']:
+            log_entry['data'] = {key: value for key, value in decoded.items() if key != 'message_type'}
+
+        else:  # Unknown message
+            log_entry['data'] = {
+                'message_id': decoded.get('message_id', 'N/A'),
+                'raw_hex': decoded.get('raw_hex', ''),
+                'length': decoded.get('length', 0)
+            }
+
+    return f"{format_timestamp(received_at)} - {json.dumps(log_entry, ensure_ascii=False)}"
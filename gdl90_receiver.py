@@ -6,7 +6,9 @@ GDL-90 消息接收器和解码器
 支持的消息类型:
 - 0x00: Heartbeat (心跳)
 - 0x0A: Ownship Report (自机位置报告)  
+- 0x0B: Ownship Geometric Altitude (自机几何高度)
 - 0x14: Traffic Report (交通目标报告)
+- 0x65: ForeFlight扩展 (子ID 0x00 设备标识, 0x01 AHRS)
 """
 
 import socket
@@ -15,14 +17,23 @@ import time
 import binascii
 import threading
 import datetime
+import functools
 import argparse
 import logging
-import json
 import os
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Mapping
+
+from gdl90_framing import iter_frames
+from gdl90_messages import MessageView, OwnshipReportView, TrafficReportView
+from gdl90_filter import FrameFilter, parse_types, parse_icao_list, parse_bbox
+from gdl90_msglog import AsyncMessageLog, format_timestamp, format_log_record
+from gdl90_capture import CaptureWriter
+from gdl90_stats import ArrivalStats
+from gdl90_logrotate import LogRotation, RotatingLogHandler, SegmentCompressor, COMPRESSIONS, parse_interval
 
 # 配置
 DEFAULT_LISTEN_PORT = 4000  # 默认监听端口 (FDPRO端口)
+RECV_BUFFER_SIZE = 65535    # 一个数据报可能携带多帧
 
 # GDL-90 CRC-16-CCITT 查找表 (与main.py相同)
 GDL90_CRC16_TABLE = (
@@ -97,19 +108,29 @@ class GDL90Decoder:
             'heartbeat_count': 0,
             'ownship_count': 0,
             'traffic_count': 0,
+            'geo_altitude_count': 0,
+            'device_id_count': 0,
+            'ahrs_count': 0,
             'unknown_count': 0,
-            'crc_errors': 0
+            'crc_errors': 0,
+            'filtered_count': 0,    # 被帧过滤器丢弃的消息 (未做CRC校验，按消息ID计入各类型)
+            'reports_announced': 0  # 心跳中声明的报告数之和 (第一个心跳之后)
         }
+        self._heartbeat_seen = False
         
         # 消息类型映射
         self.message_types = {
             0x00: "Heartbeat",
             0x0A: "Ownship Report", 
-            0x14: "Traffic Report"
+            0x0B: "Ownship Geometric Altitude",
+            0x14: "Traffic Report",
+            0x65: "ForeFlight"
         }
     
     def unescape_message(self, escaped_data: bytearray) -> bytearray:
         """反转义GDL-90消息"""
+        if 0x7d not in escaped_data:
+            return bytearray(escaped_data)  # 大多数帧没有转义字节
         unescaped = bytearray()
         i = 0
         
@@ -175,117 +196,88 @@ class GDL90Decoder:
             'status2': f"0x{status2:02X}",
             'timestamp': f"{hours:02d}:{minutes:02d}:{seconds:02d}",
             'timestamp_raw': full_timestamp,
-            'message_count': msg_count
+            'message_count': msg_count,
+            'uplink_count': (msg_count & 0xf800) >> 11,  # 上一秒的上行消息数 (5位)
+            'report_count': msg_count & 0x03ff           # 上一秒的基本/长报告数 (10位)
         }
     
-    def decode_position_report(self, data: bytearray, is_ownship: bool = True) -> Dict[str, Any]:
-        """解码位置报告消息 (Ownship Report 0x0A 或 Traffic Report 0x14)"""
-        msg_type = "Ownship Report" if is_ownship else "Traffic Report"
+    def decode_position_report(self, data: bytearray, is_ownship: bool = True) -> MessageView:
+        """
+        解码位置报告消息 (Ownship Report 0x0A 或 Traffic Report 0x14)
         
-        if len(data) < 28:
-            raise ValueError(f"{msg_type}消息长度不足")
+        返回按需解码的视图: 字段在第一次访问时才计算，只按类型/地址过滤或统计时不做字段转换
+        """
+        if is_ownship:
+            return OwnshipReportView(data)
+        return TrafficReportView(data)
+    
+    def decode_geo_altitude(self, data: bytearray) -> Dict[str, Any]:
+        """解码自机几何高度消息 (0x0B)"""
+        if len(data) < 5:  # 消息ID(1) + 高度(2) + 垂直指标(2)
+            raise ValueError("几何高度消息长度不足")
         
-        offset = 1  # 跳过消息ID
+        altitude_raw, vertical_metrics = struct.unpack('>hH', data[1:5])
+        vfom = vertical_metrics & 0x7fff
         
-        # 状态和地址类型
-        status_addr = data[offset]
-        if is_ownship:
-            status = (status_addr & 0xf0) >> 4
-            addr_type = status_addr & 0x0f
-        else:
-            # Traffic Report格式: s(1位) + t(3位) + 4位填充
-            traffic_alert = (status_addr & 0x80) >> 7
-            addr_type = (status_addr & 0x70) >> 4
-            status = traffic_alert  # 简化显示
-        
-        offset += 1
-        
-        # ICAO地址(24位)
-        icao_address = self.unpack_24bit(data, offset)
-        offset += 3
-        
-        # 纬度(24位)
-        lat_24bit = self.unpack_24bit(data, offset)
-        latitude = self.decode_latitude(lat_24bit)
-        offset += 3
-        
-        # 经度(24位) 
-        lon_24bit = self.unpack_24bit(data, offset)
-        longitude = self.decode_longitude(lon_24bit)
-        offset += 3
-        
-        # 高度(12位) + 杂项(4位) = 2字节
-        alt_misc = struct.unpack('>H', data[offset:offset+2])[0]
-        altitude_raw = (alt_misc & 0xfff0) >> 4
-        misc = alt_misc & 0x0f
-        # 高度转换: 25英尺增量，偏移-1000英尺
-        altitude_ft = (altitude_raw * 25) - 1000
-        offset += 2
-        
-        # 导航完整性类别 + 导航精度类别
-        nav_cat = data[offset]
-        nav_integrity = (nav_cat & 0xf0) >> 4
-        nav_accuracy = nav_cat & 0x0f
-        offset += 1
-        
-        # 速度信息(3字节): 水平速度(12位) + 垂直速度(12位)
-        speed_data = data[offset:offset+3]
-        h_vel_vs = (speed_data[0] << 16) | (speed_data[1] << 8) | speed_data[2]
-        
-        h_velocity = (h_vel_vs & 0xfff000) >> 12  # 水平速度(节)
-        v_velocity = h_vel_vs & 0xfff  # 垂直速度
-        
-        # 垂直速度转换(12位2的补码, 64fpm增量)
-        if v_velocity & 0x800:
-            v_velocity = v_velocity - 0x1000
-        vs_fpm = v_velocity * 64
-        offset += 3
-        
-        # 航向/航道
-        track_raw = data[offset]
-        track_deg = track_raw * (360.0 / 256)  # 1.4度分辨率
-        offset += 1
-        
-        # 发射器类别
-        emitter_cat = data[offset]
-        offset += 1
-        
-        # 呼号(8字节ASCII)
-        callsign_bytes = data[offset:offset+8]
-        # 解码ASCII并去除null字符和空白字符
-        callsign = callsign_bytes.decode('ascii', errors='replace').rstrip('\x00').strip()
-        offset += 8
-        
-        # 代码字段
-        if offset < len(data):
-            code_field = data[offset]
-            emergency_code = (code_field & 0xf0) >> 4
-            spare = code_field & 0x0f
-        else:
-            emergency_code = 0
-            spare = 0
+        return {
+            'message_type': 'Ownship Geometric Altitude',
+            'geo_altitude_ft': altitude_raw * 5,  # 5英尺分辨率
+            'vertical_warning': bool(vertical_metrics & 0x8000),
+            'vfom_m': vfom if vfom != 0x7fff else None  # 0x7FFF = 无数据
+        }
+    
+    def decode_foreflight(self, data: bytearray) -> Dict[str, Any]:
+        """解码ForeFlight扩展消息 (0x65)，按子ID区分设备标识和AHRS"""
+        if len(data) < 2:
+            raise ValueError("ForeFlight消息长度不足")
+        
+        sub_id = data[1]
+        if sub_id == 0x00:
+            return self.decode_device_id(data)
+        if sub_id == 0x01:
+            return self.decode_ahrs(data)
+        raise ValueError(f"未知的ForeFlight子消息: 0x{sub_id:02X}")
+    
+    def decode_device_id(self, data: bytearray) -> Dict[str, Any]:
+        """解码设备标识消息 (0x65 子ID 0x00)"""
+        if len(data) < 39:  # ID(1) + 子ID(1) + 版本(1) + 序列号(8) + 名称(8) + 长名称(16) + 能力(4)
+            raise ValueError("设备标识消息长度不足")
+        
+        serial = struct.unpack('>Q', data[3:11])[0]
+        capabilities = struct.unpack('>I', data[35:39])[0]
         
         return {
-            'message_type': msg_type,
-            'status': status,
-            'addr_type': addr_type,
-            'icao_address': f"0x{icao_address:06X}",
-            'latitude': latitude,
-            'longitude': longitude,
-            'altitude_ft': altitude_ft,
-            'misc': misc,
-            'nav_integrity': nav_integrity,
-            'nav_accuracy': nav_accuracy,
-            'ground_speed_kts': h_velocity if h_velocity != 0xfff else None,
-            'vertical_speed_fpm': vs_fpm if v_velocity != 0x800 else None,
-            'track_deg': track_deg,
-            'emitter_category': emitter_cat,
-            'callsign': callsign,
-            'emergency_code': emergency_code
+            'message_type': 'Device ID',
+            'version': data[2],
+            'serial': f"0x{serial:016X}" if serial != 0xFFFFFFFFFFFFFFFF else None,
+            'device_name': data[11:19].decode('utf-8', errors='replace').rstrip('\x00'),
+            'device_long_name': data[19:35].decode('utf-8', errors='replace').rstrip('\x00'),
+            'capabilities': f"0x{capabilities:08X}",
+            'geo_altitude_datum': 'MSL' if capabilities & 0x01 else 'WGS-84'
         }
     
-    def decode_message(self, raw_data: bytearray) -> Optional[Dict[str, Any]]:
-        """解码GDL-90消息"""
+    def decode_ahrs(self, data: bytearray) -> Dict[str, Any]:
+        """解码AHRS消息 (0x65 子ID 0x01)"""
+        if len(data) < 12:  # ID(1) + 子ID(1) + 横滚/俯仰/航向/IAS/TAS(各2)
+            raise ValueError("AHRS消息长度不足")
+        
+        roll, pitch, heading, ias, tas = struct.unpack('>hhHHH', data[2:12])
+        heading_value = heading & 0x7fff
+        if heading_value & 0x4000:  # 15位有符号数
+            heading_value -= 0x8000
+        
+        return {
+            'message_type': 'AHRS',
+            'roll_deg': roll / 10.0 if roll != 0x7fff else None,
+            'pitch_deg': pitch / 10.0 if pitch != 0x7fff else None,
+            'heading_deg': heading_value / 10.0 if heading != 0xffff else None,
+            'heading_type': 'magnetic' if heading != 0xffff and heading & 0x8000 else 'true',
+            'ias_kts': ias if ias != 0xffff else None,
+            'tas_kts': tas if tas != 0xffff else None
+        }
+    
+    def decode_message(self, raw_data: bytearray) -> Optional[Mapping[str, Any]]:
+        """解码GDL-90消息 (位置报告返回按需解码的MessageView，其余消息返回字典)"""
         try:
             self.message_stats['total_messages'] += 1
             
@@ -293,8 +285,8 @@ class GDL90Decoder:
             if len(raw_data) < 4 or raw_data[0] != 0x7e or raw_data[-1] != 0x7e:
                 raise ValueError("无效的GDL-90消息格式")
             
-            # 移除开始和结束标记
-            escaped_data = raw_data[1:-1]
+            # 移除开始和结束标记 (raw_data可能是帧切分器生成的memoryview)
+            escaped_data = bytes(raw_data[1:-1])
             
             # 反转义
             unescaped_data = self.unescape_message(escaped_data)
@@ -320,7 +312,14 @@ class GDL90Decoder:
             # 根据消息类型解码
             if msg_id == 0x00:  # Heartbeat
                 self.message_stats['heartbeat_count'] += 1
-                return self.decode_heartbeat(msg_data)
+                decoded = self.decode_heartbeat(msg_data)
+                # 第一个心跳声明的是接收器启动之前那一秒的报告，不计入
+                if self._heartbeat_seen:
+                    self.message_stats['reports_announced'] += decoded['report_count']
+                else:
+                    self.message_stats['traffic_count_at_first_heartbeat'] = self.message_stats['traffic_count']
+                    self._heartbeat_seen = True
+                return decoded
             
             elif msg_id == 0x0A:  # Ownship Report
                 self.message_stats['ownship_count'] += 1
@@ -330,6 +329,18 @@ class GDL90Decoder:
                 self.message_stats['traffic_count'] += 1
                 return self.decode_position_report(msg_data, is_ownship=False)
             
+            elif msg_id == 0x0B:  # Ownship Geometric Altitude
+                self.message_stats['geo_altitude_count'] += 1
+                return self.decode_geo_altitude(msg_data)
+            
+            elif msg_id == 0x65:  # ForeFlight扩展 (设备标识 / AHRS)
+                decoded = self.decode_foreflight(msg_data)
+                if decoded['message_type'] == 'Device ID':
+                    self.message_stats['device_id_count'] += 1
+                else:
+                    self.message_stats['ahrs_count'] += 1
+                return decoded
+            
             else:
                 self.message_stats['unknown_count'] += 1
                 return {
@@ -346,15 +357,43 @@ class GDL90Decoder:
                 'length': len(raw_data)
             }
     
+    def count_filtered(self, frame) -> None:
+        """被帧过滤器丢弃的帧只按消息ID计数，不反转义、不校验CRC"""
+        stats = self.message_stats
+        stats['total_messages'] += 1
+        stats['filtered_count'] += 1
+        msg_id = frame[1] if frame[1] != 0x7d else frame[2] ^ 0x20
+        if msg_id == 0x00:
+            stats['heartbeat_count'] += 1
+        elif msg_id == 0x0A:
+            stats['ownship_count'] += 1
+        elif msg_id == 0x14:
+            stats['traffic_count'] += 1
+        elif msg_id == 0x0B:
+            stats['geo_altitude_count'] += 1
+        elif msg_id == 0x65:
+            stats['device_id_count' if frame[2] == 0x00 else 'ahrs_count'] += 1
+        else:
+            stats['unknown_count'] += 1
+    
     def get_stats(self) -> Dict[str, int]:
         """获取消息统计信息"""
         return self.message_stats.copy()
+    
+    def estimated_lost_reports(self) -> int:
+        """根据心跳声明的报告数估算丢失的交通报告数 (长时间统计时准确，单个心跳周期可能有±1秒的偏差)"""
+        stats = self.message_stats
+        if 'traffic_count_at_first_heartbeat' not in stats:
+            return 0
+        received = stats['traffic_count'] - stats['traffic_count_at_first_heartbeat']
+        return max(0, stats['reports_announced'] - received)
 
 class GDL90Receiver:
     """GDL-90消息接收器"""
     
     def __init__(self, port: int = DEFAULT_LISTEN_PORT, log_file: Optional[str] = None, 
-                 log_level: str = 'INFO', quiet: bool = False):
+                 log_level: str = 'INFO', quiet: bool = False, capture_file: Optional[str] = None,
+                 rotation: Optional[LogRotation] = None):
         self.port = port
         self.running = False
         self.decoder = GDL90Decoder()
@@ -368,16 +407,27 @@ class GDL90Receiver:
         self.show_unknown = True
         self.show_errors = True
         
+        # 帧过滤器: 在反转义/CRC/解码之前丢弃不需要的帧 (None表示不过滤)
+        self.frame_filter: Optional[FrameFilter] = None
+        
         # 统计信息
         self.last_stats_time = time.time()
         self.stats_interval = 30.0  # 每30秒显示统计
+        # 到达间隔/延迟直方图，默认不统计 (每个位置报告都要解码经纬度，接收线程每帧开销约增加一半)
+        self.arrival_stats: Optional[ArrivalStats] = None
+        self.stats_json: Optional[str] = None  # 每次显示统计时把直方图快照写入该JSON文件
         
         # 日志配置
         self.log_file = log_file
+        self.rotation = rotation  # 主日志和消息日志的轮转策略 (None表示不轮转)
         self.logger = None
-        self.message_logger = None  # 专门用于记录消息的logger
+        self.message_log: Optional[AsyncMessageLog] = None  # 消息日志 (后台线程批量写入)
+        self._log_decoder = GDL90Decoder()  # 写入线程专用的解码器，不影响接收统计
         self._setup_logging(log_level)
         
+        # 二进制抓包 (记录收到的全部原始帧，不受帧过滤器影响)
+        self.capture: Optional[CaptureWriter] = CaptureWriter(capture_file) if capture_file else None
+        
         # 消息计数器（用于日志）
         self.message_count = 0
     
@@ -390,18 +440,22 @@ class GDL90Receiver:
         # 清除现有的handlers
         self.logger.handlers.clear()
         
-        # 消息日志器（专门用于记录GDL-90消息）
-        self.message_logger = logging.getLogger('GDL90Messages')
-        self.message_logger.setLevel(logging.INFO)
-        self.message_logger.handlers.clear()
-        
         if self.log_file:
             # 确保日志目录存在
             log_dir = os.path.dirname(self.log_file) or '.'
             os.makedirs(log_dir, exist_ok=True)
             
+            message_log_file = self.log_file.replace('.log', '_messages.log')
+            if self.rotation is not None and self.rotation.compressor is not None:
+                # 上次运行中已轮转但未压缩完的段
+                self.rotation.compressor.recover(self.log_file)
+                self.rotation.compressor.recover(message_log_file)
+            
             # 主日志文件处理器
-            main_handler = logging.FileHandler(self.log_file, encoding='utf-8')
+            if self.rotation is not None:
+                main_handler = RotatingLogHandler(self.log_file, self.rotation)
+            else:
+                main_handler = logging.FileHandler(self.log_file, encoding='utf-8')
             main_formatter = logging.Formatter(
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                 datefmt='%Y-%m-%d %H:%M:%S'
@@ -409,15 +463,11 @@ class GDL90Receiver:
             main_handler.setFormatter(main_formatter)
             self.logger.addHandler(main_handler)
             
-            # 消息日志文件处理器（单独的文件）
-            message_log_file = self.log_file.replace('.log', '_messages.log')
-            message_handler = logging.FileHandler(message_log_file, encoding='utf-8')
-            message_formatter = logging.Formatter(
-                '%(asctime)s - %(message)s',
-                datefmt='%Y-%m-%d %H:%M:%S.%f'
-            )
-            message_handler.setFormatter(message_formatter)
-            self.message_logger.addHandler(message_handler)
+            # 消息日志（单独的文件）: 接收线程只排队原始帧，解码和JSON序列化在写入线程中完成
+            self.message_log = AsyncMessageLog(message_log_file,
+                                              functools.partial(format_log_record, self._log_decoder),
+                                              record_time=lambda record: record[1],
+                                              rotation=self.rotation).start()
         
         # 如果不是安静模式，也添加控制台处理器
         if not self.quiet:
@@ -429,65 +479,12 @@ class GDL90Receiver:
             console_handler.setFormatter(console_formatter)
             self.logger.addHandler(console_handler)
     
-    def _log_message(self, decoded: Dict[str, Any], sender_addr: Tuple[str, int]):
-        """记录消息到日志文件"""
-        if not self.message_logger:
+    def _log_message(self, frame, sender_addr: Tuple[str, int], received_at: float):
+        """把原始帧放入消息日志队列 (接收线程中不做解码和JSON序列化)"""
+        if self.message_log is None:
             return
-            
         self.message_count += 1
-        
-        # 基本信息
-        log_entry = {
-            'seq': self.message_count,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'sender': f"{sender_addr[0]}:{sender_addr[1]}",
-            'message_type': decoded.get('message_type', 'Unknown')
-        }
-        
-        # 根据消息类型添加详细信息
-        if 'error' in decoded:
-            log_entry['error'] = decoded['error']
-            log_entry['raw_hex'] = decoded.get('raw_hex', '')
-            log_entry['length'] = decoded.get('length', 0)
-        else:
-            msg_type = decoded.get('message_type')
-            
-            if msg_type == 'Heartbeat':
-                log_entry['data'] = {
-                    'timestamp': decoded['timestamp'],
-                    'timestamp_raw': decoded['timestamp_raw'],
-                    'status1': decoded['status1'],
-                    'status2': decoded['status2'],
-                    'message_count': decoded['message_count']
-                }
-            
-            elif msg_type in ['Ownship Report', 'Traffic Report']:
-                log_entry['data'] = {
-                    'icao_address': decoded['icao_address'],
-                    'latitude': decoded['latitude'],
-                    'longitude': decoded['longitude'],
-                    'altitude_ft': decoded['altitude_ft'],
-                    'ground_speed_kts': decoded.get('ground_speed_kts'),
-                    'vertical_speed_fpm': decoded.get('vertical_speed_fpm'),
-                    'track_deg': decoded['track_deg'],
-                    'callsign': decoded['callsign'],
-                    'emitter_category': decoded['emitter_category'],
-                    'nav_integrity': decoded['nav_integrity'],
-                    'nav_accuracy': decoded['nav_accuracy']
-                }
-                
-                if msg_type == 'Traffic Report':
-                    log_entry['data']['emergency_code'] = decoded.get('emergency_code', 0)
-            
-            else:  # Unknown message
-                log_entry['data'] = {
-                    'message_id': decoded.get('message_id', 'N/A'),
-                    'raw_hex': decoded.get('raw_hex', ''),
-                    'length': decoded.get('length', 0)
-                }
-        
-        # 记录JSON格式的消息
-        self.message_logger.info(json.dumps(log_entry, ensure_ascii=False))
+        self.message_log.enqueue((self.message_count, received_at, sender_addr, bytes(frame)))
     
     def _print_or_log(self, message: str, level: str = 'INFO'):
         """打印消息到终端或记录到日志"""
@@ -519,6 +516,7 @@ class GDL90Receiver:
             self._print_or_log("=" * 60)
             
             self.running = True
+            self._push_down_display_filter()
             
             # 记录启动信息到日志
             if self.logger:
@@ -532,6 +530,27 @@ class GDL90Receiver:
             self._print_or_log(error_msg, 'ERROR')
             return False
     
+    def _push_down_display_filter(self):
+        """没有消息日志时，不显示的消息类型不需要解码，把显示选项下推到帧过滤器"""
+        if self.log_file:
+            return
+        shown = set()
+        if self.show_heartbeat:
+            shown.add(0x00)
+        if self.show_ownship:
+            shown.update((0x0A, 0x0B))
+        if self.show_traffic:
+            shown.add(0x14)
+        if self.show_ownship or self.show_heartbeat:
+            shown.add(0x65)  # AHRS跟随自机报告，设备标识跟随心跳
+        if self.show_unknown:
+            shown.update(msg_id for msg_id in range(256) if msg_id not in self.decoder.message_types)
+        if len(shown) == 256:
+            return
+        if self.frame_filter is None:
+            self.frame_filter = FrameFilter()
+        self.frame_filter.restrict_types(shown)
+    
     def stop(self):
         """停止接收器"""
         self._print_or_log("\n🛑 正在停止接收器...")
@@ -547,19 +566,22 @@ class GDL90Receiver:
             while self.running:
                 try:
                     # 接收数据
-                    data, addr = self.socket.recvfrom(1024)
+                    data, addr = self.socket.recvfrom(RECV_BUFFER_SIZE)
                     
                     if data:
-                        # 解码消息
-                        decoded = self.decoder.decode_message(bytearray(data))
-                        
-                        if decoded:
-                            self._display_message(decoded, addr)
-                            # 记录消息到日志
-                            self._log_message(decoded, addr)
+                        current_time = time.time()
+                        mono_ns = time.monotonic_ns() if self.capture is not None else 0
+                        # 逐帧解码 (一个数据报可能携带多帧); 找不到完整帧时整体解码以报告格式错误
+                        frames = 0
+                        for frame in iter_frames(data):
+                            frames += 1
+                            if self.capture is not None:
+                                self.capture.write(frame, addr, mono_ns)
+                            self._handle_frame(frame, addr, current_time)
+                        if not frames:
+                            self._handle_frame(data, addr, current_time)
                         
                         # 定期显示统计信息
-                        current_time = time.time()
                         if current_time - self.last_stats_time >= self.stats_interval:
                             self._show_stats()
                             self.last_stats_time = current_time
@@ -578,8 +600,30 @@ class GDL90Receiver:
         finally:
             if self.socket:
                 self.socket.close()
+            if self.message_log is not None:
+                self.message_log.close()  # 写完队列中剩余的消息
+            if self.capture is not None:
+                self.capture.close()
             self._print_or_log("\n📊 最终统计信息:")
             self._show_stats()
+            if self.rotation is not None:
+                self.rotation.close()  # 压缩完已轮转的段
+    
+    def _handle_frame(self, frame, addr: Tuple[str, int], received_at: Optional[float] = None):
+        """解码一帧并显示、记录"""
+        if self.frame_filter is not None and not self.frame_filter.accepts(frame):
+            self.decoder.count_filtered(frame)
+            return
+        decoded = self.decoder.decode_message(frame)
+        if decoded:
+            if received_at is None:
+                received_at = time.time()
+            if self.arrival_stats is not None:
+                self.arrival_stats.record(decoded, received_at)
+            self._display_message(decoded, addr)
+            # 记录消息到日志
+            if self.message_log is not None:
+                self._log_message(frame, addr, received_at)
     
     def _display_message(self, decoded: Dict[str, Any], sender_addr: Tuple[str, int]):
         """显示解码后的消息"""
@@ -589,7 +633,9 @@ class GDL90Receiver:
         # 根据设置过滤显示
         if msg_type == 'Heartbeat' and not self.show_heartbeat:
             return
-        elif msg_type == 'Ownship Report' and not self.show_ownship:
+        elif msg_type in ('Ownship Report', 'Ownship Geometric Altitude', 'AHRS') and not self.show_ownship:
+            return
+        elif msg_type == 'Device ID' and not self.show_heartbeat:
             return
         elif msg_type == 'Traffic Report' and not self.show_traffic:
             return
@@ -616,7 +662,7 @@ class GDL90Receiver:
                 print(f"⏰ 时间戳: {decoded['timestamp']} ({decoded['timestamp_raw']}s)")
                 print(f"📊 状态1: {decoded['status1']}")
                 print(f"📊 状态2: {decoded['status2']}")
-                print(f"🔢 消息计数: {decoded['message_count']}")
+                print(f"🔢 消息计数: 上行 {decoded['uplink_count']}, 报告 {decoded['report_count']} (上一秒)")
             
             elif msg_type in ['Ownship Report', 'Traffic Report']:
                 print(f"🏷️  ICAO地址: {decoded['icao_address']}")
@@ -645,6 +691,22 @@ class GDL90Receiver:
                 # 导航质量信息
                 print(f"📡 导航完整性: {decoded['nav_integrity']}, 精度: {decoded['nav_accuracy']}")
             
+            elif msg_type == 'Ownship Geometric Altitude':
+                print(f"📏 几何高度: {decoded['geo_altitude_ft']}ft")
+                vfom = f"{decoded['vfom_m']}m" if decoded['vfom_m'] is not None else "无数据"
+                print(f"🎯 垂直精度: {vfom}" + (" ⚠️ 垂直警告" if decoded['vertical_warning'] else ""))
+            
+            elif msg_type == 'Device ID':
+                print(f"🏷️  设备: {decoded['device_name']} ({decoded['device_long_name']})")
+                print(f"🔢 序列号: {decoded['serial'] or '无'}, 几何高度基准: {decoded['geo_altitude_datum']}")
+            
+            elif msg_type == 'AHRS':
+                def fmt(value, unit):
+                    return f"{value:.1f}{unit}" if value is not None else "无数据"
+                print(f"🛩️  横滚: {fmt(decoded['roll_deg'], '°')}, 俯仰: {fmt(decoded['pitch_deg'], '°')}")
+                print(f"🧭 航向: {fmt(decoded['heading_deg'], '°')} ({decoded['heading_type']})")
+                print(f"🚀 IAS: {fmt(decoded['ias_kts'], 'kts')}, TAS: {fmt(decoded['tas_kts'], 'kts')}")
+            
             print("-" * 40)
     
     def _show_stats(self):
@@ -655,17 +717,50 @@ class GDL90Receiver:
         stats_msg += f"   心跳: {stats['heartbeat_count']}\n"
         stats_msg += f"   自机报告: {stats['ownship_count']}\n"
         stats_msg += f"   交通报告: {stats['traffic_count']}\n"
+        if stats['geo_altitude_count'] > 0:
+            stats_msg += f"   几何高度: {stats['geo_altitude_count']}\n"
+        if stats['device_id_count'] > 0:
+            stats_msg += f"   设备标识: {stats['device_id_count']}\n"
+        if stats['ahrs_count'] > 0:
+            stats_msg += f"   AHRS: {stats['ahrs_count']}\n"
         if stats['unknown_count'] > 0:
             stats_msg += f"   未知消息: {stats['unknown_count']}\n"
         if stats['crc_errors'] > 0:
             stats_msg += f"   CRC错误: {stats['crc_errors']}\n"
+        if stats['filtered_count'] > 0:
+            stats_msg += f"   已过滤 (未解码): {stats['filtered_count']}\n"
+        lost = self.decoder.estimated_lost_reports()
+        if lost > 0:
+            stats_msg += f"   估计丢失交通报告: {lost} (心跳声明 {stats['reports_announced']})\n"
+        log_stats = ""
+        if self.message_log is not None:
+            log_metrics = self.message_log.metrics()
+            stats_msg += (f"   消息日志: 已写入 {log_metrics['written']}, 队列 {log_metrics['depth']} "
+                          f"(最大 {log_metrics['max_depth']}), 丢弃 {log_metrics['dropped']}\n")
+            log_stats = f", 日志队列: {log_metrics['depth']}, 日志丢弃: {log_metrics['dropped']}"
+        if self.capture is not None:
+            stats_msg += f"   抓包: {self.capture.records} 帧, {self.capture.bytes_written / 1e6:.1f}MB\n"
+        if self.rotation is not None:
+            stats_msg += f"   日志轮转: {self.rotation.rotations} 次"
+            if self.rotation.compressor is not None:
+                compress = self.rotation.compressor.metrics()
+                stats_msg += (f", 已压缩 {compress['compressed']} 段 ({compress['bytes_in'] / 1e6:.1f}MB -> "
+                              f"{compress['bytes_out'] / 1e6:.1f}MB), 待压缩 {compress['pending']}")
+            stats_msg += "\n"
+        if self.arrival_stats is not None:
+            stats_msg += "\n".join(self.arrival_stats.report_lines()) + "\n"
+            if self.stats_json:
+                try:
+                    self.arrival_stats.write_json(self.stats_json)
+                except OSError as e:
+                    stats_msg += f"   ⚠️  写入直方图快照失败: {e}\n"
         stats_msg += "-" * 40
         
         self._print_or_log(stats_msg)
         
         # 记录统计信息到主日志
         if self.logger:
-            self.logger.info(f"统计信息 - 总计: {stats['total_messages']}, 心跳: {stats['heartbeat_count']}, 自机: {stats['ownship_count']}, 交通: {stats['traffic_count']}, CRC错误: {stats['crc_errors']}")
+            self.logger.info(f"统计信息 - 总计: {stats['total_messages']}, 心跳: {stats['heartbeat_count']}, 自机: {stats['ownship_count']}, 交通: {stats['traffic_count']}, CRC错误: {stats['crc_errors']}{log_stats}")
 
 def main():
     """主程序"""
@@ -678,9 +773,14 @@ def main():
   python gdl90_receiver.py -p 5000                     # 指定端口5000
   python gdl90_receiver.py --no-heartbeat              # 不显示心跳消息
   python gdl90_receiver.py --traffic-only              # 只显示交通报告
+  python gdl90_receiver.py --types traffic --icao ABCDEF,A1B2C3     # 只处理指定目标的交通报告
+  python gdl90_receiver.py --bbox 47.0,-123.0,48.0,-122.0           # 只处理范围内的位置报告
   python gdl90_receiver.py -l receiver.log             # 记录日志到文件
   python gdl90_receiver.py -l receiver.log --quiet     # 安静模式，只记录日志
   python gdl90_receiver.py -l receiver.log --log-level DEBUG  # 调试级别日志
+  python gdl90_receiver.py --capture session.gdl90cap  # 二进制抓包 (python gdl90_capture.py 查看概要)
+  python gdl90_receiver.py -l receiver.log --rotate-size 100 --rotate-interval 6h  # 日志轮转并后台压缩
+  python gdl90_receiver.py --stats-interval 10 --stats-json stats.json   # 每10秒输出并导出时间分布直方图
         """
     )
     
@@ -715,6 +815,25 @@ def main():
         help='不显示错误消息'
     )
     
+    # 帧过滤参数 (在解码之前丢弃，也作用于消息日志)
+    parser.add_argument(
+        '--types',
+        type=str,
+        help='只处理指定类型的消息，逗号分隔 (heartbeat, ownship, geo-altitude, traffic, foreflight 或消息ID)'
+    )
+    
+    parser.add_argument(
+        '--icao',
+        type=str,
+        help='只处理指定ICAO地址的位置报告，逗号分隔的十六进制地址'
+    )
+    
+    parser.add_argument(
+        '--bbox',
+        type=str,
+        help='只处理范围内的位置报告: lat_min,lon_min,lat_max,lon_max'
+    )
+    
     # 日志相关参数
     parser.add_argument(
         '-l', '--log-file',
@@ -729,6 +848,50 @@ def main():
         help='日志级别 (默认: INFO)'
     )
     
+    parser.add_argument(
+        '--rotate-size',
+        type=float,
+        help='日志超过该大小 (MB) 时轮转，主日志和消息日志分别计算'
+    )
+    
+    parser.add_argument(
+        '--rotate-interval',
+        type=str,
+        help='日志按时间间隔轮转 (秒，或 30m / 6h / 1d)'
+    )
+    
+    parser.add_argument(
+        '--compress',
+        choices=list(COMPRESSIONS) + ['none'],
+        default='gzip',
+        help='轮转后的日志段在后台压缩的格式 (默认: gzip)'
+    )
+    
+    parser.add_argument(
+        '--capture',
+        type=str,
+        help='把收到的全部原始帧写入二进制抓包文件 (文件不能已存在)'
+    )
+    
+    parser.add_argument(
+        '--stats-interval',
+        type=float,
+        default=30.0,
+        help='显示统计信息的间隔 (秒，默认: 30)'
+    )
+    
+    parser.add_argument(
+        '--histograms',
+        action='store_true',
+        help='统计到达间隔、位置变化和心跳延迟的分布 (增加接收线程每帧的开销)'
+    )
+    
+    parser.add_argument(
+        '--stats-json',
+        type=str,
+        help='每次显示统计时把到达间隔/延迟直方图快照写入该JSON文件 (同时启用 --histograms)'
+    )
+    
     parser.add_argument(
         '-q', '--quiet',
         action='store_true',
@@ -737,13 +900,43 @@ def main():
     
     args = parser.parse_args()
     
+    try:
+        frame_filter = FrameFilter(
+            types=parse_types(args.types) if args.types else None,
+            icao=parse_icao_list(args.icao) if args.icao else None,
+            bbox=parse_bbox(args.bbox) if args.bbox else None
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.stats_interval <= 0:
+        parser.error("--stats-interval 必须大于0")
+    
+    rotation = None
+    if args.rotate_size or args.rotate_interval:
+        if not args.log_file:
+            parser.error("--rotate-size / --rotate-interval 需要同时指定 -l/--log-file")
+        try:
+            rotation = LogRotation(
+                max_bytes=int(args.rotate_size * 1e6) if args.rotate_size else None,
+                interval=parse_interval(args.rotate_interval) if args.rotate_interval else None,
+                compressor=SegmentCompressor(args.compress) if args.compress != 'none' else None
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    
     # 创建接收器
-    receiver = GDL90Receiver(
-        port=args.port,
-        log_file=args.log_file,
-        log_level=args.log_level,
-        quiet=args.quiet
-    )
+    try:
+        receiver = GDL90Receiver(
+            port=args.port,
+            log_file=args.log_file,
+            log_level=args.log_level,
+            quiet=args.quiet,
+            capture_file=args.capture,
+            rotation=rotation
+        )
+    except FileExistsError:
+        parser.error(f"抓包文件已存在: {args.capture}")
     
     # 设置显示选项
     if args.no_heartbeat:
@@ -756,6 +949,12 @@ def main():
         receiver.show_unknown = False
     if args.no_errors:
         receiver.show_errors = False
+    receiver.stats_interval = args.stats_interval
+    if args.histograms or args.stats_json:
+        receiver.arrival_stats = ArrivalStats()
+    receiver.stats_json = args.stats_json
+    if frame_filter.active:
+        receiver.frame_filter = frame_filter
     
     # 显示启动信息（除非是安静模式）
     if not args.quiet:
@@ -767,6 +966,15 @@ def main():
         if args.log_file:
             print(f"📝 日志文件: {args.log_file}")
             print(f"📝 消息日志: {args.log_file.replace('.log', '_messages.log')}")
+        if rotation is not None:
+            policy = []
+            if args.rotate_size:
+                policy.append(f"{args.rotate_size:g}MB")
+            if args.rotate_interval:
+                policy.append(args.rotate_interval)
+            print(f"🔄 日志轮转: {' / '.join(policy)}, 压缩: {args.compress}")
+        if args.capture:
+            print(f"📦 抓包文件: {args.capture}")
         
         # 显示过滤设置
         filters = []
@@ -783,6 +991,15 @@ def main():
         
         if filters:
             print(f"🔇 过滤消息: {', '.join(filters)}")
+        pushdown = []
+        if args.types:
+            pushdown.append(f"类型 {args.types}")
+        if args.icao:
+            pushdown.append(f"ICAO {args.icao}")
+        if args.bbox:
+            pushdown.append(f"范围 {args.bbox}")
+        if pushdown:
+            print(f"🧹 解码前过滤: {', '.join(pushdown)}")
         
         print("\n💡 使用 Ctrl+C 停止接收器")
         print("=" * 60)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+GDL-90 会话回放
+把抓包文件 (gdl90_capture) 或JSON消息日志 (*_messages.log) 中的消息按原始时间间隔重新发送到指定地址，
+用于不运行X-Plane时复现EFB问题和对接收端做压力测试。
+
+- 抓包: 原样发送记录的原始帧，同一数据报中收到的帧 (时间和发送方相同) 仍合并为一个数据报
+- JSON日志: 用InlineGDL90Encoder按日志中的字段重新编码; 错误帧和未知消息按raw_hex原样发送
+- 倍速0.1x-100x，或尽快发送 (--fast); 结束时报告实际帧率和发送时刻的误差
+
+示例:
+  python gdl90_replay.py session.gdl90cap --host 192.168.1.50 --speed 2
+  python gdl90_replay.py receiver_messages.log --around 14:32:05 --window 30 --fast
+"""
+
+import socket
+import time
+
+from main import InlineGDL90Encoder
+from gdl90_framing import iter_frames
+from gdl90_stats import time_histogram
+from gdl90_logquery import LATEST_TIME, is_capture, query
+
+MIN_SPEED = 0.1
+MAX_SPEED = 100.0
+SPIN_THRESHOLD = 0.002   # 距发送时刻不足该时间 (秒) 时忙等，避免sleep的调度误差
+
+def _icao(text):
+    return int(text, 16) if isinstance(text, str) else int(text or 0)
+
+def encode_entry(encoder, entry):
+    """JSON消息日志条目 -> GDL-90帧 (bytes)，无法还原时返回None"""
+    data = entry.get('data') or {}
+    if 'raw_hex' in entry or 'raw_hex' in data:
+        # 错误帧 (CRC错误、格式错误) 和未知消息按原始字节发送，复现接收时的情况
+        return bytes.fromhex(entry.get('raw_hex') or data.get('raw_hex'))
+    msg_type = entry.get('message_type')
+    if msg_type == 'Heartbeat':
+        count = data.get('message_count', 0)
+        return bytes(encoder.create_heartbeat(
+            int(data.get('status1', '0x81'), 16), int(data.get('status2', '0x01'), 16),
+            data.get('uplink_count', (count & 0xf800) >> 11), data.get('report_count', count & 0x03ff),
+            timestamp=data.get('timestamp_raw', 0)))
+    if msg_type in ('Ownship Report', 'Traffic Report'):
+        fields = {
+            'lat': data.get('latitude', 0.0),
+            'lon': data.get('longitude', 0.0),
+            'alt': data.get('altitude_ft', 0.0),
+            'speed': data.get('ground_speed_kts'),
+            'track': data.get('track_deg', 0.0),
+            'vs': data.get('vertical_speed_fpm'),
+        }
+        if msg_type == 'Traffic Report':
+            fields['icao_address'] = _icao(data.get('icao_address'))
+            fields['callsign'] = data.get('callsign') or ''
+            return bytes(encoder.create_traffic_report(fields))
+        encoder.icao_address = _icao(data.get('icao_address'))
+        encoder.aircraft_id = (data.get('callsign') or '')[:8].ljust(8)
+        return bytes(encoder.create_position_report(fields))
+    if msg_type == 'Ownship Geometric Altitude':
+        return bytes(encoder.create_geo_altitude(data.get('geo_altitude_ft', 0), data.get('vfom_m'),
+                                                 data.get('vertical_warning', False)))
+    if msg_type == 'AHRS':
+        return bytes(encoder.create_ahrs_report({
+            'roll': data.get('roll_deg'), 'pitch': data.get('pitch_deg'), 'heading': data.get('heading_deg'),
+            'ias': data.get('ias_kts'), 'tas': data.get('tas_kts')}))
+    if msg_type == 'Device ID':
+        serial = data.get('serial')
+        return bytes(encoder.create_device_id(data.get('device_name', ''), data.get('device_long_name', ''),
+                                              int(serial, 16) if serial else None,
+                                              data.get('geo_altitude_datum', 'MSL') == 'MSL'))
+    return None
+
+def load_datagrams(path, start=0.0, end=LATEST_TIME, icao=None, types=None):
+    """
+    生成 (Unix时间, 发送方, 数据报) ，时间和发送方相同的连续帧合并为一个数据报
+
+    抓包中的帧原样使用; JSON日志条目重新编码，无法还原的条目跳过。
+    """
+    pending_key = None
+    pending = []
+    if is_capture(path):
+        records = ((t, sender, bytes(frame)) for t, sender, frame in query(path, start, end, icao, types))
+    else:
+        encoder = InlineGDL90Encoder()
+        records = ((t, entry.get('sender'), encode_entry(encoder, entry))
+                   for t, entry in query(path, start, end, icao, types))
+    for timestamp, sender, frame in records:
+        if frame is None:
+            continue
+        key = (timestamp, sender)
+        if key != pending_key and pending:
+            yield pending_key[0], pending_key[1], b''.join(pending)
+            pending = []
+        pending_key = key
+        pending.append(frame)
+    if pending:
+        yield pending_key[0], pending_key[1], b''.join(pending)
+
+class ReplayStats:
+    """
+    回放统计: 发送时刻误差为实际发送时间减去按倍速换算的计划时间 (秒)
+
+    误差记入固定分桶的对数直方图，长时间回放或循环压力测试的内存和汇总耗时不随数据报数增长。
+    """
+
+    def __init__(self):
+        self.datagrams = 0
+        self.frames = 0
+        self.bytes = 0
+        self.send_errors = 0
+        self.elapsed = 0.0
+        self.recorded = 0.0          # 回放的录制时长 (秒)
+        self.lateness = time_histogram()
+
+    def summary(self):
+        lateness = self.lateness
+        return {
+            'datagrams': self.datagrams,
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'send_errors': self.send_errors,
+            'elapsed': self.elapsed,
+            'recorded': self.recorded,
+            'frames_per_second': self.frames / self.elapsed if self.elapsed > 0 else 0.0,
+            'lateness_p50': lateness.percentile(0.50),
+            'lateness_p99': lateness.percentile(0.99),
+            'lateness_max': lateness.max if lateness.count else 0.0,
+        }
+
+def replay(datagrams, sock, target, speed=1.0, clock=time.perf_counter, sleep=time.sleep):
+    """
+    按原始时间间隔发送数据报
+
+    datagrams: (Unix时间, 发送方, 数据报) 的可迭代对象 (load_datagrams)
+    speed: 倍速 (MIN_SPEED-MAX_SPEED)，None表示尽快发送
+    """
+    if speed is not None and not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"回放倍速必须在 {MIN_SPEED}-{MAX_SPEED} 之间")
+    stats = ReplayStats()
+    record_lateness = stats.lateness.add
+    sendto = sock.sendto
+    origin = None
+    started = clock()
+    for timestamp, _, datagram in datagrams:
+        if origin is None:
+            origin = timestamp
+            started = clock()
+        if speed is not None:
+            due = started + (timestamp - origin) / speed
+            remaining = due - clock()
+            if remaining > SPIN_THRESHOLD:
+                sleep(remaining - SPIN_THRESHOLD)
+            while clock() < due:
+                pass
+        try:
+            sendto(datagram, target)
+        except OSError:
+            stats.send_errors += 1
+            continue
+        if speed is not None:
+            record_lateness(clock() - due)
+        stats.datagrams += 1
+        # 相邻帧可以共用标记; 没有完整帧的数据报 (截断的错误帧) 按一条消息计
+        stats.frames += sum(1 for _ in iter_frames(datagram)) or 1
+        stats.bytes += len(datagram)
+        stats.recorded = timestamp - origin
+    stats.elapsed = clock() - started
+    return stats
+
+def main():
+    import argparse
+    from gdl90_filter import parse_icao_list, parse_types
+    from gdl90_logquery import first_timestamp, parse_time
+
+    parser = argparse.ArgumentParser(description="按原始时间间隔回放GDL-90抓包或消息日志")
+    parser.add_argument('path', help='抓包文件或 *_messages.log')
+    parser.add_argument('--host', default='127.0.0.1', help='目标地址 (默认: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=4000, help='目标端口 (默认: 4000)')
+    parser.add_argument('--broadcast', action='store_true', help='允许发送到广播地址')
+    parser.add_argument('--speed', type=float, default=1.0, help=f'回放倍速 ({MIN_SPEED:g}-{MAX_SPEED:g}，默认1)')
+    parser.add_argument('--fast', action='store_true', help='忽略时间间隔，尽快发送 (压力测试)')
+    parser.add_argument('--start', help='开始时间 (Unix秒数、"YYYY-MM-DD HH:MM:SS" 或 "HH:MM:SS")')
+    parser.add_argument('--end', help='结束时间')
+    parser.add_argument('--around', help='回放该时间前后 --window 秒')
+    parser.add_argument('--window', type=float, default=30.0, help='--around 的前后范围 (秒，默认30)')
+    parser.add_argument('--icao', help='只回放这些ICAO地址的位置报告 (其他类型不受影响)')
+    parser.add_argument('--types', help='只回放这些消息类型')
+    args = parser.parse_args()
+
+    if not args.fast and not MIN_SPEED <= args.speed <= MAX_SPEED:
+        parser.error(f"回放倍速必须在 {MIN_SPEED:g}-{MAX_SPEED:g} 之间")
+    try:
+        reference = first_timestamp(args.path)
+        if args.around:
+            center = parse_time(args.around, reference)
+            start, end = center - args.window, center + args.window
+        else:
+            start = parse_time(args.start, reference) if args.start else 0.0
+            end = parse_time(args.end, reference) if args.end else LATEST_TIME
+        icao = parse_icao_list(args.icao) if args.icao else None
+        types = parse_types(args.types) if args.types else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if args.broadcast:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    speed_text = '尽快发送' if args.fast else f"{args.speed:g}x"
+    print(f"▶️  回放 {args.path} -> {args.host}:{args.port} ({speed_text})")
+    try:
+        stats = replay(load_datagrams(args.path, start, end, icao, types), sock, (args.host, args.port),
+                       speed=None if args.fast else args.speed)
+    except KeyboardInterrupt:
+        print("\n🛑 回放中断")
+        return
+    finally:
+        sock.close()
+
+    summary = stats.summary()
+    print(f"📊 {summary['frames']} 帧 / {summary['datagrams']} 个数据报, {summary['bytes'] / 1e6:.2f}MB, "
+          f"发送错误 {summary['send_errors']}")
+    print(f"⏱️  录制时长 {summary['recorded']:.1f}s, 回放耗时 {summary['elapsed']:.1f}s, "
+          f"{summary['frames_per_second']:,.0f} 帧/秒")
+    if not args.fast:
+        print(f"🎯 发送时刻误差: p50 {summary['lateness_p50'] * 1000:.2f}ms, "
+              f"p99 {summary['lateness_p99'] * 1000:.2f}ms, 最大 {summary['lateness_max'] * 1000:.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+GDL-90 接收端时间分布统计
+按固定的对数刻度分桶统计 (每10倍20个桶，相对误差约6%)，内存和每次记录的开销与样本数无关:
+  - 每种消息类型的到达间隔
+  - 每个ICAO地址 (自机和交通目标) 的更新间隔和相邻两次报告之间的位置变化
+  - 发送端到接收端的延迟: GDL-90心跳在每个UTC整秒发送，时间戳为UTC零点以来的秒数，
+    延迟 = 接收时间 - 时间戳对应的整秒 (需要两端时钟同步，同一台机器上最准确)
+
+快照 (snapshot) 给出样本数、p50/p95/p99/最大值和非空的桶，可以写成JSON文件供对比。
+"""
+
+import json
+import math
+import os
+import time
+import unicodedata
+
+BUCKETS_PER_DECADE = 20
+TIME_RANGE = (1e-6, 1e3)          # 秒
+DISTANCE_RANGE = (0.1, 1e6)       # 米
+MAX_TARGETS = 4096                # 单独统计的ICAO地址数上限
+SECONDS_PER_DAY = 86400
+EARTH_RADIUS_M = 6371008.8
+
+class LogHistogram:
+    """
+    固定对数刻度的直方图
+
+    桶0记录小于lowest的值 (包括0和负数)，最后一个桶记录大于highest的值;
+    分位数返回所在桶的上界 (不超过记录到的最大值)。
+    """
+
+    __slots__ = ('lowest', 'highest', 'per_decade', '_log_lowest', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, lowest, highest, per_decade=BUCKETS_PER_DECADE):
+        if not 0 < lowest < highest:
+            raise ValueError("直方图范围必须满足 0 < lowest < highest")
+        self.lowest = lowest
+        self.highest = highest
+        self.per_decade = per_decade
+        self._log_lowest = math.log10(lowest)
+        buckets = math.ceil((math.log10(highest) - self._log_lowest) * per_decade - 1e-9)
+        self.counts = [0] * (buckets + 2)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value < self.lowest:
+            index = 0
+        else:
+            index = int((math.log10(value) - self._log_lowest) * self.per_decade) + 1
+            if index >= len(self.counts):
+                index = len(self.counts) - 1
+        self.counts[index] += 1
+
+    def upper_bound(self, index):
+        """桶的上界 (溢出桶为无穷大)"""
+        if index >= len(self.counts) - 1:
+            return math.inf
+        return 10 ** (self._log_lowest + index / self.per_decade)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other):
+        if (other.lowest, other.highest, other.per_decade) != (self.lowest, self.highest, self.per_decade):
+            raise ValueError("只能合并分桶相同的直方图")
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def snapshot(self):
+        empty = not self.count
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': 0.0 if empty else self.min,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': 0.0 if empty else self.max,
+            # [上界, 样本数]，溢出桶的上界记为null
+            'buckets': [[None if math.isinf(self.upper_bound(i)) else self.upper_bound(i), count]
+                        for i, count in enumerate(self.counts) if count],
+        }
+
+def time_histogram():
+    return LogHistogram(*TIME_RANGE)
+
+def distance_histogram():
+    return LogHistogram(*DISTANCE_RANGE)
+
+def _pad(text, width):
+    """按终端显示宽度补齐 (中文字符占两列)"""
+    shown = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in text)
+    return text + ' ' * max(0, width - shown)
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    """等距圆柱近似 (相邻两次报告之间的距离很短)"""
+    dlon = (lon2 - lon1 + 180.0) % 360.0 - 180.0
+    x = math.radians(dlon) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+class _Target:
+    __slots__ = ('last_time', 'lat', 'lon', 'interarrival', 'position_delta')
+
+    def __init__(self):
+        self.last_time = None
+        self.lat = None
+        self.lon = None
+        self.interarrival = time_histogram()
+        self.position_delta = distance_histogram()
+
+class ArrivalStats:
+    """接收端的到达间隔、位置变化和延迟统计 (只在接收线程中调用，不加锁)"""
+
+    def __init__(self, max_targets=MAX_TARGETS):
+        self.max_targets = max_targets
+        self.interarrival = {}                 # 消息类型 -> 到达间隔直方图
+        self._last_arrival = {}                # 消息类型 -> 上一次到达的时间
+        self.targets = {}                      # ICAO地址 (整数) -> _Target
+        self.untracked = 0                     # 超出max_targets的地址的报告数
+        self.latency = time_histogram()        # 心跳延迟
+        self.sender_ahead = 0                  # 时间戳晚于接收时间的心跳 (时钟不同步)
+        self.started = time.time()
+
+    def record(self, decoded, received_at):
+        """记录一条解码后的消息 (错误帧不统计)"""
+        msg_type = decoded.get('message_type')
+        if msg_type is None:
+            return
+        last = self._last_arrival.get(msg_type)
+        if last is None:
+            self.interarrival[msg_type] = time_histogram()
+        else:
+            self.interarrival[msg_type].add(received_at - last)
+        self._last_arrival[msg_type] = received_at
+
+        if msg_type == 'Heartbeat':
+            self._record_latency(decoded['timestamp_raw'], received_at)
+            return
+        icao = getattr(decoded, 'icao', None)
+        if icao is not None:
+            self._record_target(icao, decoded, received_at)
+
+    def _record_latency(self, timestamp, received_at):
+        latency = (received_at % SECONDS_PER_DAY - timestamp) % SECONDS_PER_DAY
+        if latency > SECONDS_PER_DAY / 2:
+            self.sender_ahead += 1
+            return
+        self.latency.add(latency)
+
+    def _record_target(self, icao, decoded, received_at):
+        target = self.targets.get(icao)
+        if target is None:
+            if len(self.targets) >= self.max_targets:
+                self.untracked += 1
+                return
+            target = self.targets[icao] = _Target()
+        lat, lon = decoded['latitude'], decoded['longitude']
+        if target.last_time is not None:
+            target.interarrival.add(received_at - target.last_time)
+            target.position_delta.add(_distance_m(target.lat, target.lon, lat, lon))
+        target.last_time = received_at
+        target.lat = lat
+        target.lon = lon
+
+    def target_totals(self):
+        """全部地址合并后的 (更新间隔, 位置变化) 直方图"""
+        interarrival, position_delta = time_histogram(), distance_histogram()
+        for target in self.targets.values():
+            interarrival.merge(target.interarrival)
+            position_delta.merge(target.position_delta)
+        return interarrival, position_delta
+
+    def snapshot(self):
+        interarrival, position_delta = self.target_totals()
+        return {
+            'generated': time.time(),
+            'started': self.started,
+            'units': {'interarrival': 's', 'latency': 's', 'position_delta': 'm'},
+            'interarrival': {msg_type: hist.snapshot() for msg_type, hist in sorted(self.interarrival.items())},
+            'latency': self.latency.snapshot(),
+            'sender_ahead': self.sender_ahead,
+            'target_interarrival': interarrival.snapshot(),
+            'target_position_delta': position_delta.snapshot(),
+            'untracked_reports': self.untracked,
+            'targets': {f"0x{icao:06X}": {'interarrival': target.interarrival.snapshot(),
+                                          'position_delta': target.position_delta.snapshot()}
+                        for icao, target in sorted(self.targets.items())},
+        }
+
+    def write_json(self, path):
+        """写入快照 (先写临时文件再替换，读取方不会看到写了一半的文件)"""
+        temp = path + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False)
+        os.replace(temp, path)
+
+    def report_lines(self, worst=5):
+        """统计输出的文本行: 各消息类型、全部目标合并、更新间隔p99最大的几个目标"""
+        def row(name, hist, scale, unit):
+            return (f"   {_pad(name, 28)} {hist.count:8d} {hist.percentile(0.50) * scale:9.1f} "
+                    f"{hist.percentile(0.95) * scale:9.1f} {hist.percentile(0.99) * scale:9.1f} "
+                    f"{(hist.max if hist.count else 0.0) * scale:9.1f} {unit}")
+
+        lines = [f"   {_pad('时间分布', 28)} {'样本':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'最大':>7s}"]
+        for msg_type, hist in sorted(self.interarrival.items()):
+            if hist.count:
+                lines.append(row(f"{msg_type} 间隔", hist, 1000, 'ms'))
+        if self.latency.count:
+            lines.append(row("心跳延迟", self.latency, 1000, 'ms'))
+        interarrival, position_delta = self.target_totals()
+        if interarrival.count:
+            lines.append(row(f"目标更新间隔 ({len(self.targets)}个)", interarrival, 1000, 'ms'))
+            lines.append(row("目标位置变化", position_delta, 1, 'm'))
+            ranked = sorted(self.targets.items(), key=lambda item: item[1].interarrival.percentile(0.99),
+                            reverse=True)
+            for icao, target in ranked[:worst]:
+                if target.interarrival.count:
+                    lines.append(row(f"  0x{icao:06X} 更新间隔", target.interarrival, 1000, 'ms'))
+        return lines
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+广播端延迟追踪
+记录每条输出消息经过各阶段的单调时钟时间戳 (纳秒):
+  RREF数据报到达 -> 状态更新完成 -> 处理开始 (推算/筛选/编码) -> 编码完成 -> sendto返回
+每个输出通道 (自机位置 / 交通 / AHRS) 一个环形缓冲，只有该通道的发送线程写入，不加锁;
+读取时复制缓冲区 (复制在GIL下一次完成)，按最近的记录计算各阶段的延迟直方图:
+  update  RREF到达 -> 状态更新
+  wait    状态更新 -> 处理开始 (等待发送周期)
+  encode  处理开始 -> 编码完成
+  send    编码完成 -> sendto返回
+  total   RREF到达 -> sendto返回 (消息离开广播端时数据的年龄)
+
+可以收到SIGUSR1时打印，或通过本机HTTP端口读取JSON (GET /latency)。
+未启用时发送路径上只有一次 is None 判断。
+"""
+
+import array
+import json
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gdl90_stats import time_histogram
+
+RING_SIZE = 4096
+FIELDS = 5   # receive, update, encode_start, encode_end, send
+STAGES = (
+    ('update', 0, 1),
+    ('wait', 1, 2),
+    ('encode', 2, 3),
+    ('send', 3, 4),
+    ('total', 0, 4),
+)
+STAGE_NAMES = {'update': 'RREF->状态更新', 'wait': '等待发送周期', 'encode': '推算/编码',
+               'send': 'sendto', 'total': 'RREF->发送'}
+
+class TraceLane:
+    """单写入方的环形缓冲，每条记录FIELDS个时间戳"""
+
+    def __init__(self, name, size=RING_SIZE):
+        if size < 2:
+            raise ValueError("环形缓冲至少需要2条记录")
+        self.name = name
+        self.size = size
+        self.buffer = array.array('q', bytes(8 * FIELDS * size))
+        self.head = 0   # 已发布的记录数; 先写记录再递增，读取方只使用已发布的记录
+
+    def record(self, receive_ns, update_ns, encode_start_ns, encode_end_ns, send_ns):
+        i = (self.head % self.size) * FIELDS
+        buffer = self.buffer
+        buffer[i] = receive_ns
+        buffer[i + 1] = update_ns
+        buffer[i + 2] = encode_start_ns
+        buffer[i + 3] = encode_end_ns
+        buffer[i + 4] = send_ns
+        self.head += 1
+
+    def samples(self):
+        """最近的完整记录 (每条为FIELDS个时间戳的元组)"""
+        published = self.head
+        data = self.buffer[:]
+        current = self.head
+        # 复制之前开始写入的记录会覆盖更早的槽位，只保留不可能被覆盖的部分
+        first = max(0, current - self.size + 1)
+        size = self.size
+        return [tuple(data[(n % size) * FIELDS:(n % size) * FIELDS + FIELDS]) for n in range(first, published)]
+
+    def histograms(self):
+        """各阶段的延迟直方图 (秒)，没有上游时间戳 (为0) 的记录不计入update/wait/total"""
+        histograms = {stage: time_histogram() for stage, _, _ in STAGES}
+        for sample in self.samples():
+            for stage, start, end in STAGES:
+                if sample[start]:
+                    histograms[stage].add((sample[end] - sample[start]) / 1e9)
+        return histograms
+
+class LatencyTracer:
+    """全部输出通道的延迟追踪"""
+
+    def __init__(self, size=RING_SIZE):
+        self.size = size
+        self.lanes = {}
+        self.started = time.time()
+        self.server = None
+
+    def lane(self, name):
+        """获取 (或创建) 通道，在发送线程启动前调用"""
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = self.lanes[name] = TraceLane(name, self.size)
+        return lane
+
+    def snapshot(self):
+        result = {'generated': time.time(), 'started': self.started, 'unit': 's', 'lanes': {}}
+        for name, lane in self.lanes.items():
+            histograms = lane.histograms()
+            result['lanes'][name] = {
+                'records': lane.head,
+                'window': histograms['encode'].count,
+                'stages': {stage: hist.snapshot() for stage, hist in histograms.items()},
+            }
+        return result
+
+    def report_lines(self):
+        lines = [f"⏱️  延迟追踪 (最近 {self.size} 条, ms)     p50      p95      p99     最大"]
+        for name, lane in self.lanes.items():
+            histograms = lane.histograms()
+            lines.append(f"   {name} ({lane.head} 条)")
+            for stage, _, _ in STAGES:
+                hist = histograms[stage]
+                if hist.count:
+                    lines.append(f"     {stage:7s} {hist.percentile(0.50) * 1e3:9.3f} "
+                                 f"{hist.percentile(0.95) * 1e3:8.3f} {hist.percentile(0.99) * 1e3:8.3f} "
+                                 f"{hist.max * 1e3:8.3f}  {STAGE_NAMES[stage]}")
+        return lines
+
+    def install_signal(self, output=print):
+        """收到SIGUSR1时打印各阶段延迟; 平台不支持或不在主线程时返回False"""
+        if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+            return False
+
+        def dump(signum, frame):
+            output("\n".join(self.report_lines()))
+
+        signal.signal(signal.SIGUSR1, dump)
+        return True
+
+    def serve(self, port, host='127.0.0.1'):
+        """在后台线程中提供 GET /latency (JSON快照)，返回实际监听的 (地址, 端口)"""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/', '/latency'):
+                    self.send_error(404)
+                    return
+                body = json.dumps(tracer.snapshot(), ensure_ascii=False).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass   # 不在终端输出访问日志
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -15,9 +15,13 @@ import re
 import urllib.request
 import json
 import platform
-import datetime
+import os
 import argparse
 
+from traffic_sources import TrafficTable, TrafficSource, TrackFileSource
+from expiry import TimingWheel
+from latency_trace import LatencyTracer
+
 # X-Plane 配置
 XPLANE_IP = "192.168.0.1"  # X-Plane 12 运行在本机
 XPLANE_PORT = 49000      # X-Plane默认UDP命令端口 - 官方文档确认
@@ -30,6 +34,45 @@ FDPRO_PORT = 4000        # FDPRO 默认监听端口
 
 # Traffic Report 配置
 MAX_TRAFFIC_TARGETS = 63    # X-Plane最多支持63个交通目标 (ID: 1-63, 0是自己飞机)
+TRAFFIC_STALE_AFTER = 30.0  # 交通目标超过该时间 (秒) 没有有效数据则视为非活跃
+TRAFFIC_IDENTITY_CACHE_SIZE = 4096  # 编码器按ICAO缓存的静态字节条目上限
+SYNTHETIC_ICAO_BASE = 0x100000      # 没有mode-S id时按槽位生成的ICAO地址: 0x100000 + 槽位号
+MODES_ID_FREQ = 1                   # TCAS mode-S id 订阅频率 (Hz)，只在槽位重新分配时变化
+
+# 设备标识 (ForeFlight ID消息 0x65/0x00)
+DEVICE_NAME = "XP2FDPRO"                 # 短名称 (最多8字符)
+DEVICE_LONG_NAME = "X-Plane to FDPRO"   # 长名称 (最多16字符)
+DEVICE_SERIAL = None                     # 序列号，None表示无效 (0xFFFFFFFFFFFFFFFF)
+OWNSHIP_VFOM_M = 15                      # 几何高度的垂直精度 (米)，与位置报告的NACp=10一致
+
+# AHRS 姿态输出配置 (ForeFlight扩展消息 0x65/0x01)
+AHRS_RATE = 10.0               # 默认姿态输出频率 (Hz)
+AHRS_MIN_RATE = 5.0
+AHRS_MAX_RATE = 20.0
+TRAFFIC_UPDATE_INTERVAL = 0.1  # 接收线程处理TCAS槽位的最小间隔 (秒)，自机数据每个数据包都处理
+
+# X-Plane 断线恢复配置
+XPLANE_RECOVERY_RETRY = 1.0  # 重新发现X-Plane失败后的重试间隔 (秒)
+
+# 航位推算配置
+MAX_EXTRAPOLATION = 2.0            # 默认最大推算时长 (秒)，超过后保持最后推算位置
+MIN_SPEED_SAMPLE_INTERVAL = 0.1    # 交通目标估算地速的最小样本间隔 (秒)
+MAX_SPEED_SAMPLE_INTERVAL = 5.0    # 样本间隔过长时不估算地速 (可能是槽位重新分配)
+
+# 交通目标筛选配置
+THREAT_ALT_WEIGHT_FT = 1000.0  # 计算威胁优先级时，1000英尺高度差视同1海里水平距离
+DISTANT_SLOT_RATIO = 0.25      # 超出发送预算时，留给远处目标轮流发送的预算比例
+INDEX_MARGIN_NM = 5.0          # 空间索引预筛选时额外放宽的距离 (索引保存的是未推算的样本位置)
+
+# 交通警报 (最近会遇点CPA) 配置
+ALERT_TIME_S = 60.0         # 预计在该时间内到达最近会遇点才报警 (秒)
+ALERT_RANGE_NM = 1.0        # 最近会遇点水平距离阈值 (海里)
+ALERT_ALT_FT = 1000.0       # 最近会遇点垂直间隔阈值 (英尺)
+ALERT_CLEAR_FACTOR = 1.5    # 解除警报时阈值放大倍数 (滞回，防止警报闪烁)
+
+# RREF请求限速 (令牌桶)：批量订阅/退订时避免瞬间塞满X-Plane的接收缓冲
+RREF_SEND_RATE = 10000   # 每秒最多发送的RREF请求数
+RREF_SEND_BURST = 256    # 允许的突发请求数
 
 # 广播地址选择 (基于iPad IP地址)：
 BROADCAST_IP = "127.0.0.1"     # iPad的具体IP地址 (直接发送)
@@ -79,13 +122,12 @@ GDL90_CRC16_TABLE = (
 
 def gdl90_crc_compute(data):
     """计算GDL90 CRC-16-CCITT校验码"""
-    mask16bit = 0xffff
+    table = GDL90_CRC16_TABLE
     crc_array = bytearray()
     
     crc = 0
     for c in data:
-        m = (crc << 8) & mask16bit
-        crc = GDL90_CRC16_TABLE[(crc >> 8)] ^ m ^ c
+        crc = table[crc >> 8] ^ ((crc << 8) & 0xffff) ^ c
     
     crc_array.append(crc & 0x00ff)
     crc_array.append((crc & 0xff00) >> 8)
@@ -97,6 +139,8 @@ class InlineGDL90Encoder:
     def __init__(self, aircraft_id="PYTHON"):
         self.aircraft_id = aircraft_id[:8].ljust(8)  # 8字符呼号
         self.icao_address = 0xABCDEF  # 24位ICAO地址
+        self._traffic_identity = {}   # ICAO地址 -> (呼号, 地址字节, 呼号等静态尾部字节)
+        self._heartbeat_template = None  # ((时间戳, st1, st2, 计数), 已编码的心跳帧)
     
     def _add_crc(self, msg):
         """计算CRC并添加到消息"""
@@ -104,19 +148,8 @@ class InlineGDL90Encoder:
         msg.extend(crc_bytes)
     
     def _escape(self, msg):
-        """转义0x7d和0x7e字符"""
-        msg_new = bytearray()
-        escape_char = 0x7d
-        chars_to_escape = [0x7d, 0x7e]
-        
-        for c in msg:
-            if c in chars_to_escape:
-                msg_new.append(escape_char)  # 插入转义字符
-                msg_new.append(c ^ 0x20)     # 修改原字节
-            else:
-                msg_new.append(c)
-        
-        return msg_new
+        """转义0x7d和0x7e字符 (0x7d必须先替换，避免重复转义)"""
+        return bytearray(bytes(msg).replace(b'\x7d', b'\x7d\x5d').replace(b'\x7e', b'\x7d\x5e'))
     
     def _prepared_message(self, msg):
         """准备消息：添加CRC，转义，添加开始/结束标记"""
@@ -154,11 +187,23 @@ class InlineGDL90Encoder:
             longitude = (0x1000000 + longitude) & 0xffffff  # 2的补码
         return longitude
     
-    def create_heartbeat(self, st1=0x81, st2=0x01):
-        """创建心跳消息(ID 0x00)"""
-        # 自动填充时间戳
-        dt = datetime.datetime.now(datetime.timezone.utc)
-        ts = (dt.hour * 3600) + (dt.minute * 60) + dt.second
+    def create_heartbeat(self, st1=0x81, st2=0x01, uplink_count=0, report_count=0, timestamp=None):
+        """
+        创建心跳消息(ID 0x00)
+        
+        uplink_count / report_count: 上一秒的上行消息数 (5位) 和基本/长报告数 (10位)
+        timestamp: Unix时间 (秒)，默认当前时间; 心跳中为UTC零点以来的秒数
+        
+        同一UTC秒内状态和计数相同的心跳直接复用已编码的帧 (模板每秒最多更新一次)。
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        ts = int(timestamp) % 86400  # UTC零点以来的秒数
+        counts = (min(uplink_count, 0x1F) << 11) | min(report_count, 0x3FF)
+        
+        key = (ts, st1, st2, counts)
+        if self._heartbeat_template is not None and self._heartbeat_template[0] == key:
+            return self._heartbeat_template[1]
         
         # 将时间戳的第16位移动到状态字节2的第7位
         ts_bit16 = (ts & 0x10000) >> 16
@@ -167,9 +212,11 @@ class InlineGDL90Encoder:
         msg = bytearray([0x00])
         msg.extend(struct.pack('>BB', st1, st2))        # 状态字节
         msg.extend(struct.pack('<H', ts & 0xFFFF))       # 时间戳(小端序)
-        msg.extend(struct.pack('>H', 0x0000))           # 消息计数
+        msg.extend(struct.pack('>H', counts))           # 消息计数: uuuuu0bb bbbbbbbb
         
-        return self._prepared_message(msg)
+        frame = bytes(self._prepared_message(msg))
+        self._heartbeat_template = (key, frame)
+        return frame
     
     def create_position_report(self, data):
         """
@@ -272,6 +319,70 @@ class InlineGDL90Encoder:
         
         return self._prepared_message(msg)
     
+    def create_geo_altitude(self, alt_ft, vfom_m=OWNSHIP_VFOM_M, vertical_warning=False):
+        """
+        创建Ownship Geometric Altitude消息 (ID 0x0B)
+        
+        alt_ft: 几何高度 (英尺)，5英尺分辨率
+        vfom_m: 垂直精度 (米)，None表示无数据 (0x7FFF)
+        """
+        altitude = int(round(alt_ft / 5.0))
+        altitude = max(-32768, min(32767, altitude))
+        
+        if vfom_m is None:
+            vfom = 0x7FFF  # 无数据
+        else:
+            vfom = min(max(int(vfom_m), 0), 0x7FFE)  # 0x7FFE = 超过32766米
+        vertical_metrics = (0x8000 if vertical_warning else 0) | vfom
+        
+        msg = bytearray([0x0B])
+        msg.extend(struct.pack('>hH', altitude, vertical_metrics))
+        return self._prepared_message(msg)
+    
+    def create_device_id(self, device_name=DEVICE_NAME, long_name=DEVICE_LONG_NAME,
+                         serial=DEVICE_SERIAL, msl_altitude=True):
+        """
+        创建设备标识消息 (ForeFlight扩展 ID 0x65, 子ID 0x00)
+        
+        msl_altitude: 能力位0，几何高度基准 (True = MSL, False = WGS-84椭球面)
+        """
+        msg = bytearray([0x65, 0x00, 0x01])  # 子ID + 版本号
+        msg.extend(struct.pack('>Q', 0xFFFFFFFFFFFFFFFF if serial is None else serial))
+        msg.extend(device_name.encode('utf-8')[:8].ljust(8, b'\x00'))
+        msg.extend(long_name.encode('utf-8')[:16].ljust(16, b'\x00'))
+        msg.extend(struct.pack('>I', 0x00000001 if msl_altitude else 0x00000000))
+        return self._prepared_message(msg)
+    
+    def create_ahrs_report(self, data):
+        """
+        创建AHRS消息 (ForeFlight扩展 ID 0x65, 子ID 0x01)
+        
+        data: 包含以下键的字典 (缺少或为None的字段按规范发送无效值)
+          - roll / pitch: 横滚/俯仰 (度，右滚/抬头为正)
+          - heading: 真航向 (度)
+          - ias / tas: 指示/真空速 (节)
+        """
+        def angle(value):
+            if value is None:
+                return 0x7FFF  # 无效
+            return int(round(max(-180.0, min(180.0, value)) * 10))
+        
+        def airspeed(value):
+            if value is None:
+                return 0xFFFF  # 无效
+            return min(max(int(round(value)), 0), 0xFFFE)
+        
+        heading = data.get('heading')
+        if heading is None:
+            heading = 0xFFFF  # 无效
+        else:
+            heading = int(round((heading % 360.0) * 10)) % 3600  # 最高位0 = 真航向
+        
+        msg = bytearray([0x65, 0x01])
+        msg.extend(struct.pack('>hhHHH', angle(data.get('roll')), angle(data.get('pitch')),
+                               heading, airspeed(data.get('ias')), airspeed(data.get('tas'))))
+        return self._prepared_message(msg)
+    
     def create_traffic_report(self, data):
         """
         创建Traffic Report消息 (ID 0x14)
@@ -296,6 +407,7 @@ class InlineGDL90Encoder:
             vs_fpm = data.get('vs', 0.0)
             callsign = data.get('callsign', 'TRAFFIC')[:8].ljust(8)
             icao_address = data.get('icao_address', 0x123456)  # 默认ICAO地址
+            traffic_alert = data.get('traffic_alert', False)
         else:  # TrafficTarget对象格式
             try:
                 # 尝试访问TrafficTarget的属性
@@ -309,12 +421,38 @@ class InlineGDL90Encoder:
                 callsign = (target_data.get('callsign', 'TRAFFIC') if hasattr(target_data, 'get') else getattr(target_data, 'callsign', 'TRAFFIC'))[:8].ljust(8)
                 # ICAO地址优先从对象属性获取
                 icao_address = getattr(data, 'icao_address', 0x123456)
+                traffic_alert = getattr(data, 'traffic_alert', False)
             except AttributeError:
                 # 如果都访问失败，使用默认值
                 lat_deg = lon_deg = alt_ft = speed_kts = track_deg = vs_fpm = 0.0
                 callsign = 'TRAFFIC'.ljust(8)
                 icao_address = 0x123456
+                traffic_alert = False
         
+        return self._prepared_message(self._traffic_payload(
+            lat_deg, lon_deg, alt_ft, speed_kts, track_deg, vs_fpm,
+            callsign, icao_address, traffic_alert))
+    
+    def create_traffic_reports(self, datas):
+        """
+        批量创建Traffic Report消息 (批量编码路径)
+        
+        datas: 字典列表，键同create_traffic_report，返回与之对应的帧列表
+        """
+        frames = []
+        payload = self._traffic_payload
+        prepare = self._prepared_message
+        for d in datas:
+            frames.append(prepare(payload(
+                d.get('lat', 0.0), d.get('lon', 0.0), d.get('alt', 0.0),
+                d.get('speed', 0.0), d.get('track', 0.0), d.get('vs', 0.0),
+                d.get('callsign', 'TRAFFIC')[:8].ljust(8), d.get('icao_address', 0x123456),
+                d.get('traffic_alert', False))))
+        return frames
+    
+    def _traffic_payload(self, lat_deg, lon_deg, alt_ft, speed_kts, track_deg, vs_fpm,
+                         callsign, icao_address, traffic_alert):
+        """构建Traffic Report消息体 (未加CRC和转义)"""
         # 检查数据有效性
         if not (-90 <= lat_deg <= 90) or not (-180 <= lon_deg <= 180):
             print(f"警告: Traffic无效的经纬度数据 LAT={lat_deg}, LON={lon_deg}")
@@ -325,15 +463,18 @@ class InlineGDL90Encoder:
         
         # 根据官方规范和example: st aa aa aa
         # 字节1: s(1位) + t(3位) + 4位填充(0)
-        traffic_alert_status = 0  # 0 = 无交通警报
+        traffic_alert_status = 1 if traffic_alert else 0  # 1 = 交通警报 (由TrafficAlerter判定)
         address_type = 0          # 0 = ADS-B with ICAO address
         padding = 0               # 4位填充为0
         
         byte1 = ((traffic_alert_status & 0x1) << 7) | ((address_type & 0x7) << 4) | padding
         msg.append(byte1)
         
-        # 字节2-4: 完整的24位ICAO地址(3字节)
-        msg.extend(self._pack24bit(icao_address & 0xFFFFFF))
+        # 字节2-4: 完整的24位ICAO地址(3字节)，与呼号等静态字段一起按ICAO缓存
+        identity = self._traffic_identity.get(icao_address)
+        if identity is None or identity[0] != callsign:
+            identity = self._cache_traffic_identity(icao_address, callsign)
+        msg.extend(identity[1])
         
         # 纬度(24位)
         msg.extend(self._pack24bit(self._make_latitude(lat_deg)))
@@ -389,25 +530,59 @@ class InlineGDL90Encoder:
         track_heading = int(track_deg / (360.0 / 256))  # 转换为1.4度单位
         msg.append(track_heading & 0xff)
         
+        # 发射器类别 + 呼号 + 应急代码 (缓存的静态字节)
+        msg.extend(identity[2])
+        
+        return msg
+    
+    def _cache_traffic_identity(self, icao_address, callsign):
+        """生成并缓存一个目标的静态字节: 地址 (3字节) 和 发射器类别+呼号+应急代码 (10字节)"""
+        if len(self._traffic_identity) >= TRAFFIC_IDENTITY_CACHE_SIZE:
+            self._traffic_identity.clear()
+        tail = bytearray()
+        
         # 发射器类别 (8位)
         emitter_cat = 1  # 轻型飞机
-        msg.append(emitter_cat & 0xff)
+        tail.append(emitter_cat & 0xff)
         
         # 呼号(8字节ASCII)
-        call_sign_bytes = bytearray(callsign.encode('ascii')[:8].ljust(8, b' '))
-        msg.extend(call_sign_bytes)
+        tail.extend(callsign.encode('ascii')[:8].ljust(8, b' '))
         
         # 应急/优先代码(4位) + 备用(4位)
         emergency_code = 0  # 无应急
         spare = 0          # 备用
-        msg.append(((emergency_code & 0xf) << 4) | (spare & 0xf))
+        tail.append(((emergency_code & 0xf) << 4) | (spare & 0xf))
         
-        return self._prepared_message(msg)
+        identity = (callsign, bytes(self._pack24bit(icao_address & 0xFFFFFF)), bytes(tail))
+        self._traffic_identity[icao_address] = identity
+        return identity
 
 # =============================================================================
 # 内置XPlane UDP功能 (基于XPlane-UDP库)
 # =============================================================================
 
+class TokenBucket:
+    """令牌桶限速器 - 平滑批量发送的请求速率"""
+    
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.clock = clock      # 单调时钟和等待函数 (测试时可替换为虚拟时钟)
+        self.sleep = sleep
+        self.last = clock()
+    
+    def consume(self, count=1):
+        """取出count个令牌，不足时阻塞等待"""
+        while True:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= count:
+                self.tokens -= count
+                return
+            self.sleep((count - self.tokens) / self.rate)
+
 class XPlaneUdpInline:
     """内置XPlane UDP类 - 包含必要的连接和数据获取功能"""
     
@@ -419,10 +594,16 @@ class XPlaneUdpInline:
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.settimeout(3.0)
         self.dataref_idx = 0
+        # dataref注册表：正向和反向查找都是O(1)
         self.datarefs = {}  # key = idx, value = dataref
+        self.dataref_index = {}  # key = dataref, value = idx
+        self.dataref_freqs = {}  # key = dataref, value = 订阅频率 (用于断线后重放订阅)
         self.beacon_data = {}
         self.xplane_values = {}
         self.default_freq = 1
+        self.send_bucket = TokenBucket(RREF_SEND_RATE, RREF_SEND_BURST)
+        self.trace = False     # 启用延迟追踪时记录数据报到达的单调时钟时间
+        self.receive_ns = 0
     
     def find_ip(self):
         """在网络中找到XPlane主机的IP"""
@@ -475,36 +656,52 @@ class XPlaneUdpInline:
         
         return self.beacon_data
     
+    def _send_rref(self, dataref, freq, idx):
+        """发送单个RREF请求 (经令牌桶限速)"""
+        cmd = b"RREF\x00"
+        string = dataref.encode()
+        message = struct.pack("<5sii400s", cmd, freq, idx, string)
+        assert(len(message) == 413)
+        self.send_bucket.consume()
+        self.socket.sendto(message, (self.beacon_data["IP"], self.beacon_data["Port"]))
+    
     def add_dataref(self, dataref, freq=None):
         """配置XPlane发送dataref数据"""
         if freq is None:
             freq = self.default_freq
         
-        idx = -9999
-        if dataref in self.datarefs.values():
-            idx = list(self.datarefs.keys())[list(self.datarefs.values()).index(dataref)]
+        idx = self.dataref_index.get(dataref)
+        if idx is not None:
             if freq == 0:
-                if dataref in self.xplane_values.keys():
-                    del self.xplane_values[dataref]
+                self.xplane_values.pop(dataref, None)
                 del self.datarefs[idx]
+                del self.dataref_index[dataref]
+                self.dataref_freqs.pop(dataref, None)
         else:
             idx = self.dataref_idx
-            self.datarefs[self.dataref_idx] = dataref
+            self.datarefs[idx] = dataref
+            self.dataref_index[dataref] = idx
             self.dataref_idx += 1
         
-        cmd = b"RREF\x00"
-        string = dataref.encode()
-        message = struct.pack("<5sii400s", cmd, freq, idx, string)
-        assert(len(message) == 413)
-        self.socket.sendto(message, (self.beacon_data["IP"], self.beacon_data["Port"]))
+        if freq != 0:
+            self.dataref_freqs[dataref] = freq
         
-        if (self.dataref_idx % 100 == 0):
-            time.sleep(0.2)
+        self._send_rref(dataref, freq, idx)
+    
+    def add_datarefs(self, datarefs, freq=None):
+        """批量订阅datarefs，返回成功订阅的数量"""
+        count = 0
+        for dataref in datarefs:
+            self.add_dataref(dataref, freq=freq)
+            count += 1
+        return count
     
     def get_values(self):
         """获取XPlane发送的dataref值"""
         try:
             data, addr = self.socket.recvfrom(1472)
+            if self.trace:
+                self.receive_ns = time.monotonic_ns()
             
             ret_values = {}
             header = data[0:5]
@@ -532,31 +729,124 @@ class XPlaneUdpInline:
         
         return self.xplane_values
     
+    def resubscribe(self):
+        """按原有索引和频率重放全部dataref订阅 (X-Plane重启后订阅会丢失)"""
+        for dataref, freq in list(self.dataref_freqs.items()):
+            self._send_rref(dataref, freq, self.dataref_index[dataref])
+        return len(self.dataref_freqs)
+    
+    def unsubscribe_all(self):
+        """批量退订全部datarefs (freq=0)，让X-Plane立即停止发送"""
+        entries = list(self.dataref_index.items())
+        self.datarefs.clear()
+        self.dataref_index.clear()
+        self.dataref_freqs.clear()
+        self.xplane_values.clear()
+        if not self.beacon_data:
+            return 0
+        for dataref, idx in entries:
+            self._send_rref(dataref, 0, idx)
+        return len(entries)
+    
+    def reconnect(self):
+        """重新发现X-Plane并重放订阅，失败时抛出异常"""
+        beacon = self.find_ip()
+        count = self.resubscribe()
+        return beacon, count
+    
     def __del__(self):
-        for i in range(len(self.datarefs)):
-            self.add_dataref(next(iter(self.datarefs.values())), freq=0)
+        try:
+            self.unsubscribe_all()
+        except Exception:
+            pass  # 解释器退出时socket可能已不可用
         self.socket.close()
 
 # =============================================================================
 # 主程序类 (更新后使用内置库)
 # =============================================================================
 
+class MessageCounter:
+    """按UTC秒统计输出的报告数，心跳中报告上一秒的计数"""
+    
+    def __init__(self):
+        self.second = None      # 当前统计的UTC秒
+        self.uplink = 0
+        self.reports = 0
+        self.previous = (0, 0)  # 上一秒的 (上行消息数, 报告数)
+    
+    def _advance(self, now):
+        second = int(now)
+        if second == self.second:
+            return
+        if self.second is not None and second == self.second + 1:
+            self.previous = (self.uplink, self.reports)
+        else:
+            self.previous = (0, 0)  # 中间有整秒没有输出
+        self.second = second
+        self.uplink = 0
+        self.reports = 0
+    
+    def add(self, reports=0, uplink=0, now=None):
+        self._advance(time.time() if now is None else now)
+        self.reports += reports
+        self.uplink += uplink
+    
+    def previous_second(self, now=None):
+        """返回上一秒的 (上行消息数, 报告数)"""
+        self._advance(time.time() if now is None else now)
+        return self.previous
+
 class GDL90Encoder:
     """GDL90编码器包装类"""
     def __init__(self, aircraft_id="PYTHON"):
         self.encoder = InlineGDL90Encoder(aircraft_id)
+        self._device_id_frame = None
+        self.counters = MessageCounter()  # 输出阶段发送的交通报告计数
+    
+    def create_heartbeat(self, ready=True, now=None):
+        """ready=False时清除GPS Pos Valid位，告知EFB数据暂不可用; 消息计数为上一秒发送的报告数"""
+        if now is None:
+            now = time.time()
+        st1 = 0x81 if ready else 0x01
+        uplink, reports = self.counters.previous_second(now)
+        return self.encoder.create_heartbeat(st1=st1, uplink_count=uplink, report_count=reports, timestamp=now)
     
-    def create_heartbeat(self):
-        return self.encoder.create_heartbeat()
+    def count_reports(self, count, now=None):
+        """输出阶段实际发送报告后调用，计入心跳的消息计数"""
+        self.counters.add(reports=count, now=now)
     
     def create_position_report(self, data):
         return self.encoder.create_position_report(data)
     
-    def create_traffic_report(self, target):
-        """为交通目标创建traffic report"""
-        data = target.data.copy()
+    def create_ahrs_report(self, data):
+        return self.encoder.create_ahrs_report(data)
+    
+    def create_geo_altitude(self, data):
+        """自机几何高度 (X-Plane的elevation为MSL高度，设备标识消息中声明为MSL基准)"""
+        return self.encoder.create_geo_altitude(data.get('alt', 0.0))
+    
+    def create_device_id(self):
+        """设备标识消息内容不变，只编码一次"""
+        if self._device_id_frame is None:
+            self._device_id_frame = bytes(self.encoder.create_device_id())
+        return self._device_id_frame
+    
+    def create_traffic_report(self, target, data=None, alert=False):
+        """为交通目标创建traffic report (data可传入推算后的位置数据，alert设置交通警报位)"""
+        data = (target.data if data is None else data).copy()
         data['icao_address'] = target.icao_address
+        data['traffic_alert'] = alert
         return self.encoder.create_traffic_report(data)
+    
+    def create_traffic_reports(self, targets, datas, alerted=()):
+        """批量为交通目标创建traffic report，datas为对应的 (可能已推算的) 位置数据"""
+        batch = []
+        for target, data in zip(targets, datas):
+            data = dict(data)
+            data['icao_address'] = target.icao_address
+            data['traffic_alert'] = target.icao_address in alerted
+            batch.append(data)
+        return self.encoder.create_traffic_reports(batch)
 
 class XPlaneDataReceiverNew:
     """使用内置XPlane-UDP功能的数据接收器"""
@@ -568,6 +858,7 @@ class XPlaneDataReceiverNew:
         }
         self.running = False
         self.beacon_data = None
+        self.data_ready = False  # 数据流是否正常 (断线恢复期间为False)
     
     def start(self):
         """开始接收X-Plane数据"""
@@ -589,8 +880,7 @@ class XPlaneDataReceiverNew:
                 ("sim/flightmodel/position/phi", 'roll')
             ]
             
-            for dataref, key in datarefs:
-                self.xplane_udp.add_dataref(dataref, freq=10)
+            self.xplane_udp.add_datarefs([dataref for dataref, key in datarefs], freq=10)
             
             self.running = True
             threading.Thread(target=self._receive_loop, daemon=True).start()
@@ -604,6 +894,7 @@ class XPlaneDataReceiverNew:
             if values:
                 print("✅ 成功接收到飞行数据!")
                 self._update_current_data(values)
+                self.data_ready = True
                 return True
             else:
                 print("⚠️  5秒后仍未收到数据")
@@ -614,9 +905,8 @@ class XPlaneDataReceiverNew:
             # 检查X-Plane是否还在运行
             running, ip = is_xplane_running()
             if not running:
-                print("❌ X-Plane似乎已经关闭，程序将退出")
+                print("❌ X-Plane似乎已经关闭")
                 print("请先启动X-Plane再运行本程序")
-                exit(1)
             return False
     
     def _update_current_data(self, xplane_values):
@@ -647,18 +937,34 @@ class XPlaneDataReceiverNew:
                     self.current_data[key] = value
     
     def _receive_loop(self):
-        """接收数据循环"""
+        """接收数据循环 - 数据中断时自动重新发现X-Plane并恢复订阅"""
         print("开始接收XPlane数据...")
         while self.running:
             try:
                 values = self.xplane_udp.get_values()
                 if values:
                     self._update_current_data(values)
+                    self.data_ready = True
                 time.sleep(0.1)
             except Exception as e:
-                if self.running:
-                    print(f"接收数据错误: {e}")
-                break
+                if not self.running:
+                    break
+                print(f"⚠️  X-Plane数据中断: {e}")
+                self.data_ready = False
+                self._recover()
+    
+    def _recover(self):
+        """重新发现X-Plane并重放订阅，直到成功或停止"""
+        while self.running:
+            try:
+                beacon, count = self.xplane_udp.reconnect()
+                self.beacon_data = beacon
+                print(f"🔄 已重新连接X-Plane ({beacon['IP']}:{beacon['Port']})，重放 {count} 个订阅")
+                return True
+            except Exception as e:
+                print(f"   等待X-Plane恢复: {e}")
+                time.sleep(XPLANE_RECOVERY_RETRY)
+        return False
     
     def stop(self):
         """停止接收数据"""
@@ -673,32 +979,46 @@ class TrafficTarget:
     """表示一个交通目标"""
     def __init__(self, plane_id):
         self.plane_id = plane_id
-        self.icao_address = 0x100000 + plane_id  # 生成唯一的ICAO地址
+        self.icao_address = SYNTHETIC_ICAO_BASE + plane_id  # 收到mode-S id前使用按槽位生成的地址
+        self.modes_id = 0  # X-Plane报告的mode-S id (0表示没有)
         self.data = {
             'lat': 0.0, 'lon': 0.0, 'alt': 0.0, 'speed': 0.0,
             'track': 0.0, 'vs': 0.0, 'callsign': f'TRF{plane_id:03d}'
         }
         self.last_update = 0
+        self.last_sent_cycle = 0  # 最近一次被TrafficSelector选中的周期
+        self.sample_time = 0.0    # 位置最近一次变化的时间 (用于航位推算)
+        self._last_fix = None     # 上一个位置样本 (lat, lon, time)，用于估算地速
         self.active = False
-    
-    def update_data(self, xplane_values):
-        """从X-Plane数据更新目标信息"""
-        # 单个飞机的数据映射
-        individual_dataref_mapping = {
-            f'sim/cockpit2/tcas/targets/position/double/plane{self.plane_id}_lat': 'lat',
-            f'sim/cockpit2/tcas/targets/position/double/plane{self.plane_id}_lon': 'lon', 
-            f'sim/cockpit2/tcas/targets/position/double/plane{self.plane_id}_ele': 'alt'
-        }
-        
-        # 添加tailnum字符数组的映射
-        for char_idx in range(8):
-            individual_dataref_mapping[f'sim/multiplayer/position/plane{self.plane_id}_tailnum[{char_idx}]'] = f'tailnum_char_{char_idx}'
         
+        # dataref名称只在构造时生成一次
+        self._position_refs = (
+            (f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_lat', 'lat'),
+            (f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_lon', 'lon'),
+            (f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_ele', 'alt'),
+        )
+        self._tailnum_refs = tuple(f'sim/multiplayer/position/plane{plane_id}_tailnum[{char_idx}]'
+                                   for char_idx in range(8))
+        self._modes_ref = f'sim/cockpit2/tcas/targets/modeS_id[{plane_id}]'
+        
+        # 身份缓存: 每次占用只解析一次呼号，槽位被重新分配时失效
+        self.identity_resolved = False
+        self._tailnum_codes = None  # 上次解析时的tailnum字符码
+        self._tailnum = ''          # 上次解析出的tailnum (空表示没有真实tailnum)
+    
+    def update_data(self, xplane_values, now=None):
+        """
+        从X-Plane数据更新目标信息，返回是否收到有效数据
+
+        now由调用方每批数据取一次; 活跃状态的过期由接收器的时间轮统一处理
+        """
+        if now is None:
+            now = time.time()
         updated = False
-        old_callsign = self.data.get('callsign', f'TRF{self.plane_id:03d}')
+        old_position = (self.data['lat'], self.data['lon'])
         
-        # 处理单个飞机的datarefs
-        for dataref, key in individual_dataref_mapping.items():
+        # 处理单个飞机的datarefs (位置、高度)
+        for dataref, key in self._position_refs:
             if dataref in xplane_values:
                 value = xplane_values[dataref]
                 
@@ -777,57 +1097,98 @@ class TrafficTarget:
                     if abs(psi_data) > 0.001:
                         updated = True
         
-        # 重构tailnum字符串
+        # 呼号每次占用只解析一次，tailnum字符码不变时跳过字符串处理
         if updated:
-            tailnum_chars = []
-            for char_idx in range(8):
-                char_key = f'tailnum_char_{char_idx}'
-                if char_key in self.data:
-                    char_code = int(self.data[char_key])
-                    if 32 <= char_code <= 126:  # 可打印ASCII字符
-                        tailnum_chars.append(chr(char_code))
-                    elif char_code == 0:  # 字符串结束
-                        break
-                    else:
-                        tailnum_chars.append('?')  # 非打印字符
-                else:
-                    break
-            
-            # 生成callsign
-            if tailnum_chars:
-                # 使用重构的真实tailnum
-                callsign = ''.join(tailnum_chars).strip()[:8]
-                if callsign:
-                    if callsign != old_callsign:
-                        print(f"✈️  交通目标{self.plane_id}: {callsign}")
-                    self.data['callsign'] = callsign
-                else:
-                    # fallback到生成的callsign
-                    callsign = self._generate_callsign()
-                    self.data['callsign'] = callsign
-            else:
-                # fallback到生成的callsign
-                callsign = self._generate_callsign()
-                self.data['callsign'] = callsign
+            self.modes_id = int(xplane_values.get(self._modes_ref, 0))
+            self._resolve_identity(xplane_values)
         
-
+        if (self.data['lat'], self.data['lon']) != old_position:
+            self._update_fix(now)
         
         if updated:
-            self.last_update = time.time()
+            self.last_update = now
             self.active = True
-        else:
-            # 如果超过30秒没有更新，标记为非活跃
-            if time.time() - self.last_update > 30.0:
-                self.active = False
         
         return updated
     
+    def _resolve_identity(self, xplane_values):
+        """解析本次占用的呼号: 优先使用tailnum，没有时生成一次固定的备用呼号"""
+        codes = tuple(int(xplane_values.get(ref, 0)) for ref in self._tailnum_refs)
+        if codes == self._tailnum_codes and self.identity_resolved:
+            return
+        self._tailnum_codes = codes
+        
+        tailnum_chars = []
+        for char_code in codes:
+            if 32 <= char_code <= 126:  # 可打印ASCII字符
+                tailnum_chars.append(chr(char_code))
+            elif char_code == 0:  # 字符串结束
+                break
+            else:
+                tailnum_chars.append('?')  # 非打印字符
+        tailnum = ''.join(tailnum_chars).strip()[:8]
+        
+        if tailnum:
+            if self._tailnum and tailnum != self._tailnum:
+                # 槽位换成了另一架飞机，之前的位置样本不能用于估算地速
+                self._last_fix = None
+            if tailnum != self.data['callsign']:
+                print(f"✈️  交通目标{self.plane_id}: {tailnum}")
+            self._tailnum = tailnum
+            self.data['callsign'] = tailnum
+        elif not self.identity_resolved:
+            # 没有tailnum: 在占用开始时生成一次，之后保持不变，避免EFB上的航迹频繁重建
+            self.data['callsign'] = self._generate_callsign()
+        self.identity_resolved = True
+    
+    def reset_identity(self):
+        """槽位过期 (将被重新分配) 时清除身份缓存"""
+        self.identity_resolved = False
+        self._tailnum_codes = None
+        self._tailnum = ''
+        self._last_fix = None
+        self.modes_id = 0
+        self.icao_address = SYNTHETIC_ICAO_BASE + self.plane_id
+        self.data['callsign'] = f'TRF{self.plane_id:03d}'
+    
+    def set_icao_address(self, icao_address):
+        """更新槽位的ICAO地址，由接收器根据mode-S id分配"""
+        if self.icao_address != SYNTHETIC_ICAO_BASE + self.plane_id:
+            # 之前已是真实地址: 槽位换成了另一架飞机
+            self._tailnum_codes = None
+            self._tailnum = ''
+            self._last_fix = None
+            self.identity_resolved = False
+        elif not self._tailnum:
+            self.identity_resolved = False  # 备用呼号改用真实地址生成 (每次占用只发生一次)
+        self.icao_address = icao_address
+    
+    def _update_fix(self, now):
+        """记录新的位置样本，TCAS datarefs不提供地速，用相邻样本估算"""
+        self.sample_time = now
+        lat, lon = self.data['lat'], self.data['lon']
+        if self._last_fix is not None:
+            last_lat, last_lon, last_time = self._last_fix
+            dt = now - last_time
+            if dt < MIN_SPEED_SAMPLE_INTERVAL:
+                return  # 间隔太短，等待下一个样本再估算
+            if dt <= MAX_SPEED_SAMPLE_INTERVAL:
+                north_nm = (lat - last_lat) * 60.0
+                east_nm = (lon - last_lon) * 60.0 * math.cos(math.radians(lat))
+                self.data['speed'] = math.hypot(north_nm, east_nm) / dt * 3600.0
+        self._last_fix = (lat, lon, now)
+    
     def _generate_callsign(self):
         """基于可用的ID信息生成callsign"""
         # 注意：由于X-Plane UDP协议限制，tailnum返回0.0而不是真实字符串
         # 我们需要用其他方法生成有意义的callsign
         
-        # 方案1: 基于位置生成相对稳定的唯一标识
+        # 方案1: 使用mode-S id提供的真实ICAO地址
+        icao_addr = getattr(self, 'icao_address', 0)
+        if icao_addr and icao_addr != SYNTHETIC_ICAO_BASE + self.plane_id:
+            return f"I{icao_addr & 0xFFFF:04X}"[:8]
+        
+        # 方案2: 基于位置生成标识 (每次占用只生成一次，见_resolve_identity)
         lat = self.data.get('lat', 0)
         lon = self.data.get('lon', 0)
         if lat != 0 or lon != 0:
@@ -835,24 +1196,44 @@ class TrafficTarget:
             pos_hash = abs(hash((round(lat, 4), round(lon, 4)))) % 9999
             return f"T{pos_hash:04d}"[:8]
         
-        # 方案2: 使用ICAO地址生成callsign (如果将来能获取到的话)
-        icao_addr = getattr(self, 'icao_address', 0)
-        if icao_addr and icao_addr != 0x100000 + self.plane_id:
-            return f"I{icao_addr & 0xFFFF:04X}"[:8]
-        
         # 方案3: 默认格式
         return f'TRF{self.plane_id:03d}'
 
 class CombinedXPlaneReceiver:
     """整合的X-Plane数据接收器 - 同时处理自己飞机和交通目标"""
-    def __init__(self, enable_traffic=False):
+    # 自机dataref -> current_data键 (psi同时作为位置报告的航迹和AHRS的航向)
+    OWN_DATAREFS = (
+        ('sim/flightmodel/position/latitude', 'lat'),
+        ('sim/flightmodel/position/longitude', 'lon'),
+        ('sim/flightmodel/position/elevation', 'alt'),
+        ('sim/flightmodel/position/groundspeed', 'speed'),
+        ('sim/flightmodel/position/psi', 'track'),
+        ('sim/flightmodel/position/vh_ind_fpm', 'vs'),
+        ('sim/flightmodel/position/theta', 'pitch'),
+        ('sim/flightmodel/position/phi', 'roll'),
+        ('sim/flightmodel/position/psi', 'heading'),
+        ('sim/flightmodel/position/indicated_airspeed', 'ias'),
+        ('sim/flightmodel/position/true_airspeed', 'tas'),
+    )
+    # 姿态相关datarefs，启用AHRS输出时按attitude_freq订阅
+    ATTITUDE_DATAREFS = (
+        'sim/flightmodel/position/theta',
+        'sim/flightmodel/position/phi',
+        'sim/flightmodel/position/psi',
+        'sim/flightmodel/position/indicated_airspeed',
+        'sim/flightmodel/position/true_airspeed',
+    )
+    
+    def __init__(self, enable_traffic=False, attitude_freq=10):
         self.xplane_udp = XPlaneUdpInline()
         self.enable_traffic = enable_traffic
+        self.attitude_freq = attitude_freq  # 姿态datarefs订阅频率 (Hz)
         
         # 自己飞机数据
         self.current_data = {
             'lat': 0.0, 'lon': 0.0, 'alt': 0.0, 'speed': 0.0,
-            'track': 0.0, 'vs': 0.0, 'pitch': 0.0, 'roll': 0.0
+            'track': 0.0, 'vs': 0.0, 'pitch': 0.0, 'roll': 0.0,
+            'heading': 0.0, 'ias': 0.0, 'tas': 0.0
         }
         
         # 交通目标数据（仅在启用时使用）
@@ -860,9 +1241,23 @@ class CombinedXPlaneReceiver:
         if enable_traffic:
             for i in range(1, MAX_TRAFFIC_TARGETS + 1):
                 self.traffic_targets[i] = TrafficTarget(i)
+        self.traffic_expiry = TimingWheel()  # 活跃槽位号的过期时间轮
+        self.active_targets = []             # 活跃目标列表，只在活跃集合变化时重建
+        self._active_version = 0
+        self.icao_slots = {}                 # ICAO地址 -> 槽位号 (活跃目标)
         
         self.running = False
         self.beacon_data = None
+        self.data_ready = False  # 数据流是否正常 (断线恢复期间为False)
+        self.sample_time = 0.0   # 自机位置最近一次变化的时间 (用于航位推算)
+        self.tracing = False
+        self.trace_stamp = (0, 0)          # 最近一次自机更新的 (RREF到达, 状态更新完成) 单调时钟纳秒
+        self.traffic_trace_stamp = (0, 0)  # 最近一次交通槽位更新的时间戳
+    
+    def enable_tracing(self):
+        """记录RREF到达和状态更新的时间戳，供发送端的延迟追踪使用"""
+        self.tracing = True
+        self.xplane_udp.trace = True
     
     def start(self):
         """开始接收X-Plane数据"""
@@ -873,19 +1268,11 @@ class CombinedXPlaneReceiver:
             
             # 订阅自己飞机的datarefs
             print("订阅自机数据...")
-            own_datarefs = [
-                ("sim/flightmodel/position/latitude", 'lat'),
-                ("sim/flightmodel/position/longitude", 'lon'),
-                ("sim/flightmodel/position/elevation", 'alt'),
-                ("sim/flightmodel/position/groundspeed", 'speed'),
-                ("sim/flightmodel/position/psi", 'track'),
-                ("sim/flightmodel/position/vh_ind_fpm", 'vs'),
-                ("sim/flightmodel/position/theta", 'pitch'),
-                ("sim/flightmodel/position/phi", 'roll')
-            ]
-            
-            for dataref, key in own_datarefs:
-                self.xplane_udp.add_dataref(dataref, freq=10)
+            attitude_datarefs = set(self.ATTITUDE_DATAREFS)
+            position_datarefs = [dataref for dataref, key in self.OWN_DATAREFS if dataref not in attitude_datarefs]
+            self.xplane_udp.add_datarefs(position_datarefs, freq=10)
+            # 姿态数据单独按attitude_freq订阅 (AHRS输出需要更高频率)
+            self.xplane_udp.add_datarefs(list(self.ATTITUDE_DATAREFS), freq=max(10, int(self.attitude_freq)))
             
             # 如果启用交通目标，订阅TCAS datarefs
             if self.enable_traffic:
@@ -907,30 +1294,31 @@ class CombinedXPlaneReceiver:
                         print(f"  ⚠️  无法订阅数组dataref {dataref}: {e}")
                 
                 # 订阅单个飞机的datarefs (位置、高度、tailnum)
-                # 支持更多飞机目标 (1-63)
+                # 支持更多飞机目标 (1-63)，一次批量发送，由令牌桶控制发送速率
+                plane_datarefs = []
                 for plane_id in range(1, min(64, MAX_TRAFFIC_TARGETS + 1)):
-                    datarefs = [
+                    plane_datarefs.extend([
                         f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_lat',
                         f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_lon',
                         f'sim/cockpit2/tcas/targets/position/double/plane{plane_id}_ele'
-                    ]
+                    ])
                     
                     # 为字符串tailnum添加每个字符位置的dataref (最多8个字符)
                     for char_idx in range(8):
-                        datarefs.append(f'sim/multiplayer/position/plane{plane_id}_tailnum[{char_idx}]')
-                    
-                    for dataref in datarefs:
-                        try:
-                            self.xplane_udp.add_dataref(dataref, freq=5)  # 5Hz更新频率
-                            datarefs_subscribed += 1
-                        except Exception as e:
-                            if plane_id <= 3:  # 只对前3个飞机打印错误
-                                print(f"  警告: 无法订阅 {dataref}: {e}")
-                            continue
-                    
-                    # 为了避免过载，每5个飞机暂停一下
-                    if plane_id % 5 == 0:
-                        time.sleep(0.2)
+                        plane_datarefs.append(f'sim/multiplayer/position/plane{plane_id}_tailnum[{char_idx}]')
+                
+                try:
+                    datarefs_subscribed += self.xplane_udp.add_datarefs(plane_datarefs, freq=5)  # 5Hz更新频率
+                except Exception as e:
+                    print(f"  警告: 批量订阅交通datarefs失败: {e}")
+                
+                # mode-S id (真实ICAO地址) 只在槽位重新分配时变化，低频订阅
+                modes_datarefs = [f'sim/cockpit2/tcas/targets/modeS_id[{plane_id}]'
+                                  for plane_id in range(1, min(64, MAX_TRAFFIC_TARGETS + 1))]
+                try:
+                    datarefs_subscribed += self.xplane_udp.add_datarefs(modes_datarefs, freq=MODES_ID_FREQ)
+                except Exception as e:
+                    print(f"  警告: 订阅mode-S id失败: {e}")
                 
                 print(f"✅ 订阅了 {datarefs_subscribed} 个交通datarefs (包含数组格式)")
             
@@ -946,6 +1334,7 @@ class CombinedXPlaneReceiver:
             if values:
                 print("✅ 成功接收到飞行数据!")
                 self._update_current_data(values)
+                self.data_ready = True
                 
                 if self.enable_traffic:
                     active_targets = self.get_active_targets()
@@ -964,62 +1353,498 @@ class CombinedXPlaneReceiver:
             return False
     
     def _update_current_data(self, xplane_values):
-        """更新自己飞机数据"""
-        dataref_mapping = {
-            'sim/flightmodel/position/latitude': 'lat',
-            'sim/flightmodel/position/longitude': 'lon',
-            'sim/flightmodel/position/elevation': 'alt',
-            'sim/flightmodel/position/groundspeed': 'speed',
-            'sim/flightmodel/position/psi': 'track',
-            'sim/flightmodel/position/vh_ind_fpm': 'vs',
-            'sim/flightmodel/position/theta': 'pitch',
-            'sim/flightmodel/position/phi': 'roll'
-        }
-        
-        for dataref, value in xplane_values.items():
-            if dataref in dataref_mapping:
-                key = dataref_mapping[dataref]
-                
-                if key == 'alt':
-                    # 高度从米转换为英尺
-                    self.current_data[key] = value * 3.28084
-                elif key == 'speed':
-                    # 地速从米/秒转换为节
-                    self.current_data[key] = value * 1.94384
-                else:
-                    # 其他数据直接使用
-                    self.current_data[key] = value
-        
-        # 更新交通目标数据
+        """更新自己飞机数据和交通目标数据"""
+        self._update_ownship(xplane_values)
         if self.enable_traffic:
-            for target in self.traffic_targets.values():
-                target.update_data(xplane_values)
+            self._update_traffic(xplane_values, time.time())
+    
+    def _update_ownship(self, xplane_values):
+        """更新自己飞机数据 (只查找需要的datarefs，不遍历全部累积值)"""
+        current_data = self.current_data
+        old_position = (current_data['lat'], current_data['lon'])
+        
+        for dataref, key in self.OWN_DATAREFS:
+            value = xplane_values.get(dataref)
+            if value is None:
+                continue
+            if key == 'alt':
+                # 高度从米转换为英尺
+                current_data[key] = value * 3.28084
+            elif key in ('speed', 'tas'):
+                # 地速/真空速从米/秒转换为节
+                current_data[key] = value * 1.94384
+            else:
+                # 其他数据直接使用
+                current_data[key] = value
+        
+        # get_values返回的是累积值，只有位置真正变化时才算新样本
+        if (current_data['lat'], current_data['lon']) != old_position:
+            self.sample_time = time.time()
+    
+    def _update_traffic(self, xplane_values, now):
+        """更新交通目标数据"""
+        expiry = self.traffic_expiry
+        modes_changed = False
+        for plane_id, target in self.traffic_targets.items():
+            modes_id = target.modes_id
+            if target.update_data(xplane_values, now):
+                expiry.touch(plane_id, now + TRAFFIC_STALE_AFTER)
+                modes_changed |= target.modes_id != modes_id
+        for plane_id in expiry.advance(now):
+            target = self.traffic_targets[plane_id]
+            target.active = False
+            target.reset_identity()
+        if expiry.version != self._active_version:
+            # 在接收线程中整体替换列表，读取方无需加锁
+            self._active_version = expiry.version
+            self.active_targets = [self.traffic_targets[plane_id] for plane_id in sorted(expiry.active())]
+            modes_changed = True
+        if modes_changed:
+            self._assign_icao_addresses()
     
     def _receive_loop(self):
-        """接收数据循环"""
+        """
+        接收数据循环 - 数据中断时自动重新发现X-Plane并恢复订阅
+        
+        每个数据包都更新自机数据 (recvfrom阻塞等待，不额外sleep)，保证姿态数据低延迟;
+        交通槽位处理开销较大，按TRAFFIC_UPDATE_INTERVAL限频 (get_values返回累积值，不会丢数据)。
+        """
         print("开始接收XPlane数据...")
+        last_traffic_update = 0.0
         while self.running:
             try:
                 values = self.xplane_udp.get_values()
                 if values:
-                    self._update_current_data(values)
-                time.sleep(0.1)
+                    self._update_ownship(values)
+                    if self.tracing:
+                        # 整体替换元组，发送线程读到的两个时间戳总是同一次更新的
+                        self.trace_stamp = (self.xplane_udp.receive_ns, time.monotonic_ns())
+                    now = time.time()
+                    if self.enable_traffic and now - last_traffic_update >= TRAFFIC_UPDATE_INTERVAL:
+                        self._update_traffic(values, now)
+                        last_traffic_update = now
+                        if self.tracing:
+                            self.traffic_trace_stamp = (self.xplane_udp.receive_ns, time.monotonic_ns())
+                    self.data_ready = True
             except Exception as e:
-                if self.running:
-                    print(f"接收数据错误: {e}")
-                break
+                if not self.running:
+                    break
+                print(f"⚠️  X-Plane数据中断: {e}")
+                self.data_ready = False
+                self._recover()
+    
+    def _recover(self):
+        """重新发现X-Plane并重放订阅，直到成功或停止"""
+        while self.running:
+            try:
+                beacon, count = self.xplane_udp.reconnect()
+                self.beacon_data = beacon
+                print(f"🔄 已重新连接X-Plane ({beacon['IP']}:{beacon['Port']})，重放 {count} 个订阅")
+                return True
+            except Exception as e:
+                print(f"   等待X-Plane恢复: {e}")
+                time.sleep(XPLANE_RECOVERY_RETRY)
+        return False
+    
+    def _assign_icao_addresses(self):
+        """
+        按mode-S id维护槽位 <-> ICAO地址映射
+        
+        无效或与编号更小的槽位重复的id回退到按槽位生成的地址，
+        保证目标表中一个地址只对应一架飞机。
+        """
+        icao_slots = {}
+        for target in self.active_targets:
+            icao = target.modes_id
+            if not 0 < icao <= 0xFFFFFF or icao in icao_slots:
+                icao = SYNTHETIC_ICAO_BASE + target.plane_id
+            if icao != target.icao_address:
+                target.set_icao_address(icao)
+            icao_slots[icao] = target.plane_id
+        self.icao_slots = icao_slots
     
     def get_active_targets(self):
-        """获取活跃的交通目标列表"""
+        """获取活跃的交通目标列表 (按槽位号排序，调用方不要修改)"""
         if not self.enable_traffic:
             return []
-        return [target for target in self.traffic_targets.values() if target.active]
+        return self.active_targets
     
     def stop(self):
         """停止接收数据"""
         print("停止接收数据...")
         self.running = False
 
+# =============================================================================
+# 交通数据源
+# =============================================================================
+
+TRAFFIC_FIELDS = ('lat', 'lon', 'alt', 'speed', 'track', 'vs', 'callsign')
+
+class XPlaneTcasSource(TrafficSource):
+    """把X-Plane TCAS槽位中的活跃目标写入共享目标表"""
+    
+    name = 'xplane'
+    
+    def __init__(self, receiver):
+        self.receiver = receiver
+        self._published = set()  # 上一周期写入的ICAO地址
+    
+    def poll(self, table, now):
+        published = set()
+        for target in self.receiver.get_active_targets():
+            data = target.data
+            table.upsert(target.icao_address, {key: data[key] for key in TRAFFIC_FIELDS},
+                         sample_time=target.sample_time, source=self.name, now=now)
+            published.add(target.icao_address)
+        
+        # 槽位变为非活跃时立即从目标表移除，不等过期
+        for icao in self._published - published:
+            record = table.get(icao)
+            if record is not None and record.source == self.name:
+                table.remove(icao)
+        self._published = published
+        return len(published)
+
+# =============================================================================
+# 航位推算 (Dead Reckoning)
+# =============================================================================
+
+def dead_reckon_batch(lats, lons, alts, speeds, tracks, vss, sample_times, send_time,
+                      max_horizon=MAX_EXTRAPOLATION):
+    """
+    把一批目标从各自的最后样本推算到send_time
+    
+    输入为等长的列 (纬度/经度度数, 高度英尺, 地速节, 航迹度, 垂直速度fpm, 样本时间秒)，
+    单次遍历完成计算，返回 (lats, lons, alts) 三个新列表。
+    推算时长被限制在 [0, max_horizon] 内，避免长时间无数据的目标飞出实际位置。
+    """
+    cos = math.cos
+    sin = math.sin
+    to_rad = math.pi / 180.0
+    out_lats = [0.0] * len(lats)
+    out_lons = [0.0] * len(lats)
+    out_alts = [0.0] * len(lats)
+    
+    for i in range(len(lats)):
+        lat = lats[i]
+        dt = send_time - sample_times[i] if sample_times[i] > 0 else 0.0
+        if dt <= 0.0:
+            out_lats[i], out_lons[i], out_alts[i] = lat, lons[i], alts[i]
+            continue
+        if dt > max_horizon:
+            dt = max_horizon
+        
+        # 地速(节) * 时间(秒) / 3600 = 距离(海里)，1海里 = 1/60 纬度
+        dist_deg = speeds[i] * dt / 216000.0
+        trk = tracks[i] * to_rad
+        cos_lat = cos(lat * to_rad)
+        out_lats[i] = lat + dist_deg * cos(trk)
+        out_lons[i] = lons[i] + (dist_deg * sin(trk) / cos_lat if cos_lat > 1e-6 else 0.0)
+        out_alts[i] = alts[i] + vss[i] * dt / 60.0
+    
+    return out_lats, out_lons, out_alts
+
+class DeadReckoner:
+    """航位推算阶段 - 让发送频率与X-Plane数据频率解耦"""
+    
+    def __init__(self, max_horizon=MAX_EXTRAPOLATION):
+        self.max_horizon = max_horizon
+    
+    def project(self, data, sample_time, send_time):
+        """推算单个数据字典 (自机)，返回新的字典"""
+        lats, lons, alts = dead_reckon_batch(
+            [data['lat']], [data['lon']], [data['alt']],
+            [data.get('speed', 0.0)], [data.get('track', 0.0)], [data.get('vs', 0.0)],
+            [sample_time], send_time, self.max_horizon)
+        projected = dict(data)
+        projected['lat'], projected['lon'], projected['alt'] = lats[0], lons[0], alts[0]
+        return projected
+    
+    def project_targets(self, targets, send_time):
+        """批量推算交通目标，返回与targets对应的数据字典列表"""
+        datas = [target.data for target in targets]
+        lats, lons, alts = dead_reckon_batch(
+            [d['lat'] for d in datas], [d['lon'] for d in datas], [d['alt'] for d in datas],
+            [d.get('speed', 0.0) for d in datas], [d.get('track', 0.0) for d in datas],
+            [d.get('vs', 0.0) for d in datas], [target.sample_time for target in targets],
+            send_time, self.max_horizon)
+        
+        projected = []
+        for i, d in enumerate(datas):
+            p = dict(d)
+            p['lat'], p['lon'], p['alt'] = lats[i], lons[i], alts[i]
+            projected.append(p)
+        return projected
+
+# =============================================================================
+# 交通目标筛选 (距离/高度范围 + 发送预算)
+# =============================================================================
+
+def relative_geometry(own_lat, own_lon, own_alt, lats, lons, alts):
+    """
+    单次遍历计算所有目标相对自机的位置 (局部平面近似)
+    
+    返回 (east_nm, north_nm, dalt_ft) 三个列表: 东向/北向距离(海里)，高度差(英尺, 目标-自机)
+    """
+    lon_scale = 60.0 * math.cos(math.radians(own_lat))
+    east = [0.0] * len(lats)
+    north = [0.0] * len(lats)
+    dalt = [0.0] * len(lats)
+    for i in range(len(lats)):
+        dlon = lons[i] - own_lon
+        # 跨越日期变更线时取较短的一侧
+        if dlon > 180.0:
+            dlon -= 360.0
+        elif dlon < -180.0:
+            dlon += 360.0
+        east[i] = dlon * lon_scale
+        north[i] = (lats[i] - own_lat) * 60.0
+        dalt[i] = alts[i] - own_alt
+    return east, north, dalt
+
+class TrafficSelector:
+    """按距离和高度范围筛选交通目标，并在超出每周期发送预算时按优先级分配"""
+    
+    def __init__(self, max_range_nm=None, alt_band_ft=None, frame_budget=None):
+        self.max_range_nm = max_range_nm    # None表示不限距离
+        self.alt_band_ft = alt_band_ft      # 相对自机的高度范围 (上下)，None表示不限
+        self.frame_budget = frame_budget    # 每周期最多发送的交通报告数，None表示不限
+        self.cycle = 0                      # 每个目标最近一次被选中的周期记在目标上 (last_sent_cycle)
+        self.last_stats = {'candidates': 0, 'in_range': 0, 'sent': 0, 'deferred': 0}
+    
+    def prefilter(self, own_data, table):
+        """
+        用目标表的空间索引取出距离范围内的候选目标 (未设置距离范围时返回全部)
+        
+        后续的推算、警报和筛选只处理候选目标，每周期的开销与总目标数无关
+        """
+        if self.max_range_nm is None:
+            return table.active_records()
+        get = table.get
+        return [get(key) for key, _ in table.index.query_radius(
+            own_data['lat'], own_data['lon'], self.max_range_nm + INDEX_MARGIN_NM)]
+    
+    def select(self, own_data, targets, datas, urgent=None):
+        """
+        筛选本周期要发送的目标
+        
+        targets/datas: 一一对应的交通目标和 (可能已推算的) 位置数据
+        urgent: 需要优先发送的ICAO地址集合 (例如正在报警的目标)
+        返回 (selected_targets, selected_datas)，按优先级从高到低排列
+        """
+        self.cycle += 1
+        
+        east, north, dalt = relative_geometry(
+            own_data['lat'], own_data['lon'], own_data['alt'],
+            [d['lat'] for d in datas], [d['lon'] for d in datas], [d['alt'] for d in datas])
+        
+        max_range = self.max_range_nm
+        alt_band = self.alt_band_ft
+        ranked = []
+        for i in range(len(datas)):
+            dist = math.hypot(east[i], north[i])
+            if max_range is not None and dist > max_range:
+                continue
+            if alt_band is not None and abs(dalt[i]) > alt_band:
+                continue
+            score = dist + abs(dalt[i]) / THREAT_ALT_WEIGHT_FT
+            if urgent and targets[i].icao_address in urgent:
+                score = -1.0 / (1.0 + score)  # 报警目标排在所有普通目标之前
+            ranked.append((score, i))
+        ranked.sort()
+        
+        budget = self.frame_budget
+        if budget is None or len(ranked) <= budget:
+            chosen = [i for _, i in ranked]
+        else:
+            # 近处/高威胁目标每周期发送，其余目标按最久未发送的顺序轮流占用剩余预算
+            distant_slots = max(1, int(budget * DISTANT_SLOT_RATIO)) if budget > 1 else 0
+            core = [i for _, i in ranked[:budget - distant_slots]]
+            rest = [i for _, i in ranked[budget - distant_slots:]]
+            rest.sort(key=lambda i: targets[i].last_sent_cycle)
+            chosen = core + rest[:distant_slots]
+        
+        for i in chosen:
+            targets[i].last_sent_cycle = self.cycle
+        
+        self.last_stats = {
+            'candidates': len(datas),
+            'in_range': len(ranked),
+            'sent': len(chosen),
+            'deferred': len(ranked) - len(chosen)
+        }
+        return [targets[i] for i in chosen], [datas[i] for i in chosen]
+
+# =============================================================================
+# 交通警报 (最近会遇点 CPA)
+# =============================================================================
+
+class TrafficAlerter:
+    """计算自机与所有目标的最近会遇点 (CPA)，设置带滞回的交通警报"""
+    
+    def __init__(self, alert_time=ALERT_TIME_S, alert_range_nm=ALERT_RANGE_NM,
+                 alert_alt_ft=ALERT_ALT_FT, clear_factor=ALERT_CLEAR_FACTOR):
+        self.alert_time = alert_time
+        self.alert_range_nm = alert_range_nm
+        self.alert_alt_ft = alert_alt_ft
+        self.clear_factor = clear_factor
+        self.alerted = set()          # 当前处于警报状态的ICAO地址
+        self.last_compute_time = 0.0  # 最近一个周期的计算耗时 (秒)
+        self.total_compute_time = 0.0
+        self.cycles = 0
+    
+    def evaluate(self, own_data, targets, datas):
+        """
+        单次遍历计算所有目标的CPA时间和距离，更新并返回警报目标集合
+        
+        targets/datas: 一一对应的交通目标和 (可能已推算的) 位置数据
+        """
+        start = time.perf_counter()
+        east, north, dalt = relative_geometry(
+            own_data['lat'], own_data['lon'], own_data['alt'],
+            [d['lat'] for d in datas], [d['lon'] for d in datas], [d['alt'] for d in datas])
+        
+        to_rad = math.pi / 180.0
+        sin = math.sin
+        cos = math.cos
+        own_gs = own_data.get('speed', 0.0) / 3600.0  # 海里/秒
+        own_trk = own_data.get('track', 0.0) * to_rad
+        own_ve = own_gs * sin(own_trk)
+        own_vn = own_gs * cos(own_trk)
+        own_vs = own_data.get('vs', 0.0) / 60.0       # 英尺/秒
+        
+        previous = self.alerted
+        alerted = set()
+        for i, d in enumerate(datas):
+            gs = d.get('speed', 0.0) / 3600.0
+            trk = d.get('track', 0.0) * to_rad
+            vx = gs * sin(trk) - own_ve
+            vy = gs * cos(trk) - own_vn
+            x = east[i]
+            y = north[i]
+            
+            # 相对运动下的最近会遇时间，已经在远离时取当前时刻
+            v2 = vx * vx + vy * vy
+            tcpa = -(x * vx + y * vy) / v2 if v2 > 1e-12 else 0.0
+            if tcpa < 0.0:
+                tcpa = 0.0
+            cx = x + vx * tcpa
+            cy = y + vy * tcpa
+            dcpa2 = cx * cx + cy * cy
+            valt = abs(dalt[i] + (d.get('vs', 0.0) / 60.0 - own_vs) * tcpa)
+            
+            icao = targets[i].icao_address
+            factor = self.clear_factor if icao in previous else 1.0
+            horizontal = self.alert_range_nm * factor
+            if (tcpa <= self.alert_time * factor and dcpa2 <= horizontal * horizontal
+                    and valt <= self.alert_alt_ft * factor):
+                alerted.add(icao)
+        
+        self.alerted = alerted
+        self.last_compute_time = time.perf_counter() - start
+        self.total_compute_time += self.last_compute_time
+        self.cycles += 1
+        return alerted
+    
+    def metrics(self):
+        """返回警报引擎的计算耗时统计"""
+        average = self.total_compute_time / self.cycles if self.cycles else 0.0
+        return {
+            'alerts': len(self.alerted),
+            'last_compute_ms': self.last_compute_time * 1000.0,
+            'avg_compute_ms': average * 1000.0,
+            'cycles': self.cycles
+        }
+
+# =============================================================================
+# AHRS 姿态输出 (独立发送线程)
+# =============================================================================
+
+class AhrsLane:
+    """
+    独立的姿态输出线程
+    
+    按单调时钟的固定节拍 (rate Hz) 发送AHRS消息，与1-2Hz的位置/交通发送循环分开，
+    不受交通编码耗时影响。落后超过一个周期时重新对齐节拍，不补发。
+    """
+    
+    def __init__(self, receiver, sock, address, rate=AHRS_RATE, trace=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        if not AHRS_MIN_RATE <= rate <= AHRS_MAX_RATE:
+            raise ValueError(f"AHRS输出频率必须在 {AHRS_MIN_RATE:g}-{AHRS_MAX_RATE:g}Hz 之间")
+        self.receiver = receiver
+        self.sock = sock
+        self.address = address
+        self.interval = 1.0 / rate
+        self.encoder = GDL90Encoder()  # 独立的编码器，不与主循环共享
+        self.running = False
+        self.thread = None
+        self.sent = 0
+        self.skipped = 0          # 落后超过一个周期而跳过的节拍数
+        self.max_jitter_ms = 0.0  # 实际发送时刻与计划时刻的最大偏差
+        self._jitter_total = 0.0
+        self.trace = trace        # 延迟追踪通道 (TraceLane)，None表示不追踪
+        self.clock = clock        # 节拍使用的单调时钟和等待函数 (测试时可替换为虚拟时钟)
+        self.sleep = sleep
+    
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+    
+    def _run(self):
+        interval = self.interval
+        clock = self.clock
+        deadline = clock() + interval
+        while self.running:
+            delay = deadline - clock()
+            if delay > 0:
+                self.sleep(delay)
+            now = clock()
+            lateness = now - deadline
+            if lateness > interval:
+                missed = int(lateness / interval)
+                self.skipped += missed
+                deadline += missed * interval
+                lateness -= missed * interval
+            deadline += interval
+            
+            if not self.receiver.data_ready:
+                continue
+            trace = self.trace
+            if trace is not None:
+                receive_ns, update_ns = self.receiver.trace_stamp
+                encode_start = time.monotonic_ns()
+            try:
+                frame = self.encoder.create_ahrs_report(self.receiver.current_data)
+                if trace is not None:
+                    encode_end = time.monotonic_ns()
+                self.sock.sendto(frame, self.address)
+            except Exception as e:
+                print(f"AHRS发送错误: {e}")
+                continue
+            if trace is not None:
+                trace.record(receive_ns, update_ns, encode_start, encode_end, time.monotonic_ns())
+            jitter_ms = lateness * 1000.0
+            self.sent += 1
+            self._jitter_total += jitter_ms
+            if jitter_ms > self.max_jitter_ms:
+                self.max_jitter_ms = jitter_ms
+    
+    def metrics(self):
+        """发送统计: 已发送数、跳过的节拍、平均/最大抖动 (毫秒)"""
+        return {
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'avg_jitter_ms': self._jitter_total / self.sent if self.sent else 0.0,
+            'max_jitter_ms': self.max_jitter_ms,
+        }
+
 # =============================================================================
 # X-Plane状态检测功能
 # =============================================================================
@@ -1139,8 +1964,24 @@ def check_traffic_settings():
     print("      如果没有其他飞机，将不会有交通数据")
     print("="*60)
 
-def broadcast_gdl90(enable_traffic=False):
-    """广播GDL-90数据给FDPRO"""
+def broadcast_gdl90(enable_traffic=False, extrapolate=False, max_extrapolation=MAX_EXTRAPOLATION,
+                    position_rate=2.0, traffic_rate=2.0,
+                    max_range_nm=None, alt_band_ft=None, frame_budget=None,
+                    enable_alerts=True, alert_time=ALERT_TIME_S, alert_range_nm=ALERT_RANGE_NM,
+                    alert_alt_ft=ALERT_ALT_FT, extra_sources=None, ahrs_rate=None, tracer=None):
+    """
+    广播GDL-90数据给FDPRO
+    
+    extrapolate: 启用航位推算，把位置推算到实际发送时刻
+    max_extrapolation: 最大推算时长 (秒)
+    position_rate / traffic_rate: 自机/交通报告发送频率 (Hz)
+    max_range_nm / alt_band_ft: 只发送该距离和相对高度范围内的交通目标
+    frame_budget: 每周期最多发送的交通报告数
+    enable_alerts: 根据最近会遇点设置交通警报位 (阈值: alert_time秒, alert_range_nm海里, alert_alt_ft英尺)
+    extra_sources: X-Plane TCAS之外的额外交通数据源 (TrafficSource列表)
+    ahrs_rate: 启用AHRS姿态输出的频率 (Hz, 5-20)，None表示不发送
+    tracer: 延迟追踪 (LatencyTracer)，记录各输出通道从RREF到达到发送的各阶段耗时，None表示不追踪
+    """
     # 首先检查X-Plane是否运行
     print("🔍 检查X-Plane状态...")
     running, detected_ip = is_xplane_running()
@@ -1178,9 +2019,27 @@ def broadcast_gdl90(enable_traffic=False):
     # 创建GDL-90编码器
     encoder = GDL90Encoder(aircraft_id="PYTHON1")
     
+    # 航位推算 (可选)
+    reckoner = DeadReckoner(max_extrapolation) if extrapolate else None
+    
+    # 交通目标筛选 (可选)
+    selector = None
+    if max_range_nm is not None or alt_band_ft is not None or frame_budget is not None:
+        selector = TrafficSelector(max_range_nm, alt_band_ft, frame_budget)
+    
+    # 交通警报 (可选)
+    alerter = TrafficAlerter(alert_time, alert_range_nm, alert_alt_ft) if enable_alerts else None
+    
+    # 共享交通目标表: X-Plane TCAS和额外数据源都写入这里
+    traffic_table = TrafficTable()
+    traffic_sources = []
+    
     # 使用整合的接收器
     print("\n=== 连接到X-Plane ===")
-    xplane_receiver = CombinedXPlaneReceiver(enable_traffic=enable_traffic)
+    xplane_receiver = CombinedXPlaneReceiver(enable_traffic=enable_traffic,
+                                             attitude_freq=ahrs_rate or 10)
+    if tracer is not None:
+        xplane_receiver.enable_tracing()
     
     if not xplane_receiver.start():
         print("❌ 无法连接到X-Plane")
@@ -1201,14 +2060,28 @@ def broadcast_gdl90(enable_traffic=False):
     else:
         print("✅ 成功连接到X-Plane")
     
+    if enable_traffic:
+        traffic_sources = [XPlaneTcasSource(xplane_receiver)] + list(extra_sources or [])
+    
+    # 延迟追踪通道 (每个发送线程一个，只由该线程写入)
+    position_trace = tracer.lane('position') if tracer is not None else None
+    traffic_trace = tracer.lane('traffic') if tracer is not None and enable_traffic else None
+    
+    # AHRS姿态输出 (独立线程)
+    ahrs_lane = None
+    if ahrs_rate:
+        ahrs_lane = AhrsLane(xplane_receiver, broadcast_sock, (BROADCAST_IP, FDPRO_PORT), ahrs_rate,
+                             trace=tracer.lane('ahrs') if tracer is not None else None)
+        ahrs_lane.start()
+    
     try:
-        heartbeat_interval = 1.0  # 心跳每秒发送一次
-        position_interval = 0.5   # 位置报告每秒发送两次
-        traffic_interval = 0.5    # 交通报告每秒发送两次
+        heartbeat_interval = 1.0  # 心跳在每个UTC整秒发送 (接收端据此估算延迟)
+        position_interval = 1.0 / position_rate  # 位置报告发送间隔 (默认每秒两次)
+        traffic_interval = 1.0 / traffic_rate    # 交通报告发送间隔 (默认每秒两次)
         status_interval = 10.0    # 每10秒显示一次状态
-        xplane_check_interval = 10.0  # 每10秒检查一次X-Plane状态
+        xplane_check_interval = 10.0  # 每10秒检查一次X-Plane数据流状态
         
-        last_heartbeat = time.time()
+        next_heartbeat = math.floor(time.time()) + heartbeat_interval
         last_position = time.time()
         last_traffic = time.time()
         last_status = time.time()
@@ -1217,33 +2090,57 @@ def broadcast_gdl90(enable_traffic=False):
         mode_text = "自己飞机位置 + 交通目标" if enable_traffic else "自己飞机位置"
         print(f"开始广播GDL-90数据到FDPRO... (模式: {mode_text})")
         print(f"目标: {BROADCAST_IP}:{FDPRO_PORT}")
+        if reckoner:
+            print(f"航位推算: 已启用 (最大推算 {max_extrapolation:.1f}s, "
+                  f"自机 {position_rate:g}Hz, 交通 {traffic_rate:g}Hz)")
+        if ahrs_lane:
+            print(f"AHRS姿态输出: {ahrs_rate:g}Hz (独立线程)")
         
         while True:
             current_time = time.time()
             
-            # 定期检查X-Plane状态
+            # 定期检查X-Plane数据流状态 (中断时由接收器自动恢复，广播不退出)
+            data_ready = xplane_receiver.data_ready
             if current_time - last_xplane_check >= xplane_check_interval:
-                running, _ = is_xplane_running()
-                if not running:
-                    print("\n❌ X-Plane已关闭，程序将退出")
-                    break
+                if not data_ready:
+                    print("⏳ X-Plane数据中断，正在等待恢复 (心跳继续发送)...")
                 last_xplane_check = current_time
             
-            # 发送心跳消息
-            if current_time - last_heartbeat >= heartbeat_interval:
-                heartbeat_msg = encoder.create_heartbeat()
+            # 发送心跳消息 (数据中断时发送"未就绪"状态)
+            if current_time >= next_heartbeat:
+                heartbeat_msg = encoder.create_heartbeat(ready=data_ready)
                 broadcast_sock.sendto(heartbeat_msg, (BROADCAST_IP, FDPRO_PORT))
-                last_heartbeat = current_time
-                print(f"💓 发送心跳 ({len(heartbeat_msg)} bytes)")
+                # 设备标识和自机几何高度与心跳同为1Hz
+                broadcast_sock.sendto(encoder.create_device_id(), (BROADCAST_IP, FDPRO_PORT))
+                if data_ready:
+                    broadcast_sock.sendto(encoder.create_geo_altitude(xplane_receiver.current_data),
+                                          (BROADCAST_IP, FDPRO_PORT))
+                next_heartbeat = math.floor(current_time) + heartbeat_interval
+                status_text = "" if data_ready else " [未就绪]"
+                print(f"💓 发送心跳 ({len(heartbeat_msg)} bytes){status_text}")
+            
+            # 数据中断期间不发送过期的位置和交通报告
+            if not data_ready:
+                time.sleep(0.01)
+                continue
             
             # 发送位置报告
             if current_time - last_position >= position_interval:
                 try:
-                    position_msg = encoder.create_position_report(xplane_receiver.current_data)
+                    if position_trace is not None:
+                        receive_ns, update_ns = xplane_receiver.trace_stamp
+                        encode_start = time.monotonic_ns()
+                    data = xplane_receiver.current_data
+                    if reckoner:
+                        data = reckoner.project(data, xplane_receiver.sample_time, current_time)
+                    position_msg = encoder.create_position_report(data)
+                    if position_trace is not None:
+                        encode_end = time.monotonic_ns()
                     broadcast_sock.sendto(position_msg, (BROADCAST_IP, FDPRO_PORT))
+                    if position_trace is not None:
+                        position_trace.record(receive_ns, update_ns, encode_start, encode_end, time.monotonic_ns())
                     last_position = current_time
                     # 打印位置信息（简化输出）
-                    data = xplane_receiver.current_data
                     print(f"✈️  自己飞机 ({len(position_msg)} bytes): "
                           f"LAT={data['lat']:.6f}, LON={data['lon']:.6f}, ALT={data['alt']:.0f}ft")
                 except Exception as e:
@@ -1252,26 +2149,51 @@ def broadcast_gdl90(enable_traffic=False):
             
             # 发送交通报告（仅在启用时）
             if enable_traffic and current_time - last_traffic >= traffic_interval:
-                active_targets = xplane_receiver.get_active_targets()
+                if traffic_trace is not None:
+                    receive_ns, update_ns = xplane_receiver.traffic_trace_stamp
+                    encode_start = time.monotonic_ns()
+                for source in traffic_sources:
+                    try:
+                        source.poll(traffic_table, current_time)
+                    except Exception as e:
+                        print(f"交通数据源错误 ({source.name}): {e}")
+                traffic_table.expire(current_time)
+                if selector:
+                    active_targets = selector.prefilter(xplane_receiver.current_data, traffic_table)
+                else:
+                    active_targets = traffic_table.active_records()
                 
                 if active_targets:
-                    sent_count = 0
-                    sample_callsigns = []
+                    own_data = xplane_receiver.current_data
+                    if reckoner:
+                        own_data = reckoner.project(own_data, xplane_receiver.sample_time, current_time)
+                        target_datas = reckoner.project_targets(active_targets, current_time)
+                    else:
+                        target_datas = [target.data for target in active_targets]
+                    
+                    alerted = alerter.evaluate(own_data, active_targets, target_datas) if alerter else set()
+                    
+                    if selector:
+                        active_targets, target_datas = selector.select(
+                            own_data, active_targets, target_datas, urgent=alerted)
                     
-                    for target in active_targets:
-                        try:
-                            traffic_msg = encoder.create_traffic_report(target)
+                    sent_count = 0
+                    try:
+                        traffic_msgs = encoder.create_traffic_reports(active_targets, target_datas, alerted)
+                        if traffic_trace is not None:
+                            encode_end = time.monotonic_ns()
+                        for traffic_msg in traffic_msgs:
                             broadcast_sock.sendto(traffic_msg, (BROADCAST_IP, FDPRO_PORT))
                             sent_count += 1
-                            
-                            # 收集前3个作为示例
-                            if len(sample_callsigns) < 3:
-                                sample_callsigns.append(target.data['callsign'])
-                                
-                        except Exception as e:
-                            print(f"交通报告编码错误 (目标{target.plane_id}): {e}")
+                    except Exception as e:
+                        print(f"交通报告编码/发送错误: {e}")
+                    encoder.count_reports(sent_count)
+                    if traffic_trace is not None and sent_count:
+                        # 一个周期一条记录: 处理包括数据源轮询、筛选、警报和整批编码，发送到最后一帧为止
+                        traffic_trace.record(receive_ns, update_ns, encode_start, encode_end, time.monotonic_ns())
                     
-                    # 显示汇总信息
+                    # 显示汇总信息 (前3个作为示例)
+                    sample_callsigns = [target.data['callsign'] for target in active_targets[:3]]
                     if sent_count > 0:
                         if sent_count <= 3:
                             print(f"📡 发送交通报告: {', '.join(sample_callsigns)}")
@@ -1283,18 +2205,42 @@ def broadcast_gdl90(enable_traffic=False):
             # 定期显示状态
             if current_time - last_status >= status_interval:
                 if enable_traffic:
-                    active_targets = xplane_receiver.get_active_targets()
-                    print(f"📊 状态: {len(active_targets)} 个活跃交通目标")
+                    active_targets = traffic_table.active_records()
+                    print(f"📊 状态: {len(active_targets)} 个活跃交通目标 ({len(traffic_sources)} 个数据源)")
+                    if selector:
+                        stats = selector.last_stats
+                        print(f"   筛选: 范围内 {stats['in_range']}, 本周期发送 {stats['sent']}, "
+                              f"延后 {stats['deferred']}")
+                    if alerter:
+                        metrics = alerter.metrics()
+                        print(f"   警报: {metrics['alerts']} 个目标, CPA计算 {metrics['last_compute_ms']:.2f}ms "
+                              f"(平均 {metrics['avg_compute_ms']:.2f}ms)")
                     if not active_targets:
                         print("   提示: 在X-Plane中启用AI交通以查看交通目标")
                 else:
                     print("📊 状态: 仅发送自机位置 (使用 --traffic 启用交通目标)")
+                if ahrs_lane:
+                    metrics = ahrs_lane.metrics()
+                    print(f"   AHRS: 已发送 {metrics['sent']}, 跳过 {metrics['skipped']}, "
+                          f"抖动 平均 {metrics['avg_jitter_ms']:.2f}ms / 最大 {metrics['max_jitter_ms']:.2f}ms")
+                if position_trace is not None:
+                    total = position_trace.histograms()['total']
+                    if total.count:
+                        print(f"   自机位置数据年龄 (RREF->发送): p50 {total.percentile(0.50) * 1e3:.1f}ms, "
+                              f"p99 {total.percentile(0.99) * 1e3:.1f}ms, 最大 {total.max * 1e3:.1f}ms")
                 last_status = current_time
             
             time.sleep(0.01)
     
     except KeyboardInterrupt:
         print("\n停止广播...")
+        for source in extra_sources or []:
+            source.close()
+        if ahrs_lane:
+            ahrs_lane.stop()
+        if tracer is not None:
+            print("\n".join(tracer.report_lines()))
+            tracer.close()
         xplane_receiver.stop()
         broadcast_sock.close()
 
@@ -1308,6 +2254,11 @@ if __name__ == "__main__":
   python main.py              # 仅发送自己飞机位置
   python main.py --traffic    # 发送自己飞机位置 + 交通目标
   python main.py -t           # 简写形式
+  python main.py -t --extrapolate --position-rate 5 --traffic-rate 5  # 航位推算 + 高频输出
+  python main.py -t --range 40 --alt-band 10000 --budget 30           # 范围筛选 + 发送预算
+  python main.py -t --replay-traffic tracks.csv --replay-speed 4      # 叠加回放录制的交通轨迹
+  python main.py --ahrs --ahrs-rate 20                                # 输出AHRS姿态 (合成视景)
+  python main.py -t --trace-latency --trace-port 8765                 # 追踪RREF到发送的各阶段延迟
         """
     )
     parser.add_argument(
@@ -1315,9 +2266,143 @@ if __name__ == "__main__":
         action='store_true',
         help='启用交通目标报告 (需要X-Plane中有AI交通或多人游戏)'
     )
+    parser.add_argument(
+        '--extrapolate',
+        action='store_true',
+        help='启用航位推算，把位置推算到发送时刻 (适合提高发送频率)'
+    )
+    parser.add_argument(
+        '--max-extrapolation',
+        type=float,
+        default=MAX_EXTRAPOLATION,
+        help=f'最大推算时长，秒 (默认: {MAX_EXTRAPOLATION})'
+    )
+    parser.add_argument(
+        '--position-rate',
+        type=float,
+        default=2.0,
+        help='自机位置报告发送频率，Hz (默认: 2)'
+    )
+    parser.add_argument(
+        '--traffic-rate',
+        type=float,
+        default=2.0,
+        help='交通报告发送频率，Hz (默认: 2)'
+    )
+    parser.add_argument(
+        '--range',
+        type=float,
+        default=None,
+        help='只发送该距离内的交通目标，海里 (默认: 不限)'
+    )
+    parser.add_argument(
+        '--alt-band',
+        type=float,
+        default=None,
+        help='只发送相对自机高度差在该范围内的交通目标，英尺 (默认: 不限)'
+    )
+    parser.add_argument(
+        '--budget',
+        type=int,
+        default=None,
+        help='每周期最多发送的交通报告数，超出时远处目标降低频率 (默认: 不限)'
+    )
+    parser.add_argument(
+        '--no-alerts',
+        action='store_true',
+        help='不计算交通警报 (最近会遇点)'
+    )
+    parser.add_argument(
+        '--alert-time',
+        type=float,
+        default=ALERT_TIME_S,
+        help=f'交通警报时间阈值，秒 (默认: {ALERT_TIME_S:g})'
+    )
+    parser.add_argument(
+        '--alert-range',
+        type=float,
+        default=ALERT_RANGE_NM,
+        help=f'交通警报水平距离阈值，海里 (默认: {ALERT_RANGE_NM:g})'
+    )
+    parser.add_argument(
+        '--alert-alt',
+        type=float,
+        default=ALERT_ALT_FT,
+        help=f'交通警报垂直间隔阈值，英尺 (默认: {ALERT_ALT_FT:g})'
+    )
+    parser.add_argument(
+        '--ahrs',
+        action='store_true',
+        help='发送AHRS姿态消息 (ForeFlight扩展 0x65)，用于EFB合成视景'
+    )
+    parser.add_argument(
+        '--ahrs-rate',
+        type=float,
+        default=AHRS_RATE,
+        help=f'AHRS输出频率，Hz，{AHRS_MIN_RATE:g}-{AHRS_MAX_RATE:g} (默认: {AHRS_RATE:g})'
+    )
+    parser.add_argument(
+        '--replay-traffic',
+        metavar='FILE',
+        default=None,
+        help='回放录制的交通轨迹文件 (CSV或JSON Lines)，与X-Plane交通一起发送'
+    )
+    parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=1.0,
+        help='轨迹回放倍速，0.5-50 (默认: 1)'
+    )
+    parser.add_argument(
+        '--replay-seek',
+        type=float,
+        default=0.0,
+        help='从轨迹录制起点跳过的秒数 (默认: 0)'
+    )
+    parser.add_argument(
+        '--replay-loop',
+        action='store_true',
+        help='轨迹回放结束后从头循环'
+    )
+    parser.add_argument(
+        '--trace-latency',
+        action='store_true',
+        help='追踪从RREF到达到发送的各阶段延迟 (kill -USR1 <pid> 打印，退出时也打印)'
+    )
+    parser.add_argument(
+        '--trace-port',
+        type=int,
+        default=None,
+        help='在本机该端口提供延迟追踪的JSON (GET http://127.0.0.1:PORT/latency)，隐含 --trace-latency'
+    )
     
     args = parser.parse_args()
     
+    if args.ahrs and not AHRS_MIN_RATE <= args.ahrs_rate <= AHRS_MAX_RATE:
+        parser.error(f'--ahrs-rate 必须在 {AHRS_MIN_RATE:g}-{AHRS_MAX_RATE:g} 之间')
+    
+    extra_sources = []
+    if args.replay_traffic:
+        if not args.traffic:
+            parser.error('--replay-traffic 需要同时启用 --traffic')
+        try:
+            extra_sources.append(TrackFileSource(args.replay_traffic, speed=args.replay_speed,
+                                                 seek=args.replay_seek, loop=args.replay_loop))
+        except (OSError, ValueError) as e:
+            parser.error(f'无法回放轨迹文件: {e}')
+    
+    tracer = None
+    if args.trace_latency or args.trace_port is not None:
+        tracer = LatencyTracer()
+        if tracer.install_signal():
+            print(f"⏱️  延迟追踪已启用: kill -USR1 {os.getpid()} 打印各阶段延迟")
+        if args.trace_port is not None:
+            try:
+                host, port = tracer.serve(args.trace_port)
+            except OSError as e:
+                parser.error(f'无法监听延迟追踪端口 {args.trace_port}: {e}')
+            print(f"⏱️  延迟追踪: http://{host}:{port}/latency")
+    
     # 提示信息
     print("="*70)
     print("X-Plane 12 到 FDPRO 的 GDL-90 数据广播 - 整合版本")
@@ -1328,12 +2413,14 @@ if __name__ == "__main__":
         print("🚁 运行模式: 自己飞机位置 + 交通目标报告")
         print("   - 发送心跳消息 (Heartbeat)")
         print("   - 发送自己飞机位置报告 (Ownship Report)")
+        print("   - 发送自机几何高度和设备标识 (Geo Altitude / ID)")
         print("   - 发送交通目标报告 (Traffic Report)")
         print("   - 需要X-Plane中启用AI交通或多人游戏")
     else:
         print("✈️  运行模式: 仅自己飞机位置报告")
         print("   - 发送心跳消息 (Heartbeat)")
         print("   - 发送自己飞机位置报告 (Ownship Report)")
+        print("   - 发送自机几何高度和设备标识 (Geo Altitude / ID)")
         print("   - 提示: 使用 --traffic 参数启用交通目标")
     
     print()
@@ -1347,4 +2434,18 @@ if __name__ == "__main__":
     print(f"   - 广播地址: {BROADCAST_IP}")
     print("="*70)
     
-    broadcast_gdl90(enable_traffic=args.traffic)
+    broadcast_gdl90(enable_traffic=args.traffic,
+                    extrapolate=args.extrapolate,
+                    max_extrapolation=args.max_extrapolation,
+                    position_rate=args.position_rate,
+                    traffic_rate=args.traffic_rate,
+                    max_range_nm=args.range,
+                    alt_band_ft=args.alt_band,
+                    frame_budget=args.budget,
+                    enable_alerts=not args.no_alerts,
+                    alert_time=args.alert_time,
+                    alert_range_nm=args.alert_range,
+                    alert_alt_ft=args.alert_alt,
+                    extra_sources=extra_sources,
+                    ahrs_rate=args.ahrs_rate if args.ahrs else None,
+                    tracer=tracer)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+交通目标空间网格索引
+按经纬度把目标分到等角网格桶中，位置变化时增量更新，
+支持半径查询、矩形范围查询和最近N个目标查询。
+广播端 (main.py) 和接收端 (xp/gdl90_receiver.py) 共用。
+"""
+
+import math
+
+DEFAULT_CELL_DEG = 0.5    # 网格大小 (度)，约30海里
+
+def _distance_nm(lat1, lon1, lat2, lon2):
+    """局部平面近似距离 (海里)，与广播端relative_geometry使用同一近似"""
+    dlon = lon2 - lon1
+    if dlon > 180.0:
+        dlon -= 360.0
+    elif dlon < -180.0:
+        dlon += 360.0
+    east = dlon * 60.0 * math.cos(math.radians((lat1 + lat2) * 0.5))
+    north = (lat2 - lat1) * 60.0
+    return math.hypot(east, north)
+
+class SpatialGrid:
+    """等角经纬度网格索引，key通常是ICAO地址"""
+
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.cols = int(math.ceil(360.0 / cell_deg))
+        self.rows = int(math.ceil(180.0 / cell_deg))
+        self.cells = {}       # (row, col) -> set(key)
+        self.positions = {}   # key -> (lat, lon, (row, col))
+
+    def _cell(self, lat, lon):
+        row = int((lat + 90.0) / self.cell_deg)
+        col = int((lon + 180.0) / self.cell_deg) % self.cols
+        return min(max(row, 0), self.rows - 1), col
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def update(self, key, lat, lon):
+        """插入或移动一个目标，只有跨越网格时才改动桶"""
+        cell = self._cell(lat, lon)
+        old = self.positions.get(key)
+        if old is not None and old[2] != cell:
+            bucket = self.cells[old[2]]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[old[2]]
+        if old is None or old[2] != cell:
+            self.cells.setdefault(cell, set()).add(key)
+        self.positions[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        """删除目标，不存在时忽略"""
+        old = self.positions.pop(key, None)
+        if old is None:
+            return
+        bucket = self.cells[old[2]]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[old[2]]
+
+    def clear(self):
+        self.cells.clear()
+        self.positions.clear()
+
+    def _cells_in_range(self, lat_min, lon_min, lat_max, lon_max):
+        """生成覆盖矩形范围的网格 (经度可跨越日期变更线: lon_min > lon_max)"""
+        row_min, col_min = self._cell(lat_min, lon_min)
+        row_max, col_max = self._cell(lat_max, lon_max)
+        if lon_max - lon_min >= 360.0:
+            cols = range(self.cols)
+        elif col_min <= col_max and lon_min <= lon_max:
+            cols = range(col_min, col_max + 1)
+        else:
+            cols = list(range(col_min, self.cols)) + list(range(0, col_max + 1))
+        cells = self.cells
+        for row in range(row_min, row_max + 1):
+            for col in cols:
+                bucket = cells.get((row, col))
+                if bucket:
+                    yield bucket
+
+    def query_bbox(self, lat_min, lon_min, lat_max, lon_max):
+        """返回矩形范围内的key列表 (lon_min > lon_max表示跨越日期变更线)"""
+        wraps = lon_min > lon_max
+        positions = self.positions
+        result = []
+        for bucket in self._cells_in_range(lat_min, lon_min, lat_max, lon_max):
+            for key in bucket:
+                lat, lon, _ = positions[key]
+                if lat < lat_min or lat > lat_max:
+                    continue
+                if wraps:
+                    if lon_max < lon < lon_min:
+                        continue
+                elif lon < lon_min or lon > lon_max:
+                    continue
+                result.append(key)
+        return result
+
+    def query_radius(self, lat, lon, radius_nm):
+        """返回半径内的 (key, 距离海里) 列表，按距离从近到远排序"""
+        dlat = radius_nm / 60.0
+        lat_min = max(-90.0, lat - dlat)
+        lat_max = min(90.0, lat + dlat)
+        cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+        if cos_lat < 1e-6 or radius_nm / (60.0 * cos_lat) >= 180.0:
+            lon_min, lon_max = -180.0, 180.0 + 360.0  # 极地附近覆盖全部经度
+        else:
+            dlon = radius_nm / (60.0 * cos_lat)
+            lon_min = lon - dlon
+            lon_max = lon + dlon
+            if lon_min < -180.0:
+                lon_min += 360.0
+            if lon_max > 180.0:
+                lon_max -= 360.0
+
+        positions = self.positions
+        result = []
+        for bucket in self._cells_in_range(lat_min, lon_min, lat_max, lon_max):
+            for key in bucket:
+                key_lat, key_lon, _ = positions[key]
+                dist = _distance_nm(lat, lon, key_lat, key_lon)
+                if dist <= radius_nm:
+                    result.append((key, dist))
+        result.sort(key=lambda item: item[1])
+        return result
+
+    def nearest(self, lat, lon, count, max_radius_nm=None):
+        """返回最近的count个 (key, 距离海里)，搜索半径逐步加倍"""
+        if count <= 0 or not self.positions:
+            return []
+        radius = self.cell_deg * 60.0
+        limit = max_radius_nm if max_radius_nm is not None else 180.0 * 60.0
+        while True:
+            radius = min(radius, limit)
+            found = self.query_radius(lat, lon, radius)
+            if len(found) >= count or radius >= limit:
+                return found[:count]
+            radius *= 2.0
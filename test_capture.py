@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+二进制抓包格式测试
+验证写入/读取往返、发送方编号、时间基准重设和不完整记录的处理
+"""
+
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_capture import CaptureWriter, CaptureReader, CaptureFormatError, summarize, MAX_OFFSET_NS
+from main import InlineGDL90Encoder
+
+def _frames(count):
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0, 'lon': -122.0}))
+            for i in range(count)]
+
+def test_capture_round_trip():
+    """帧、发送方和时间按写入顺序读出，帧视图不拷贝"""
+    print("📦 测试抓包读写...")
+    frames = _frames(20)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        writer = CaptureWriter(path)
+        base = writer.start_mono_ns
+        for i, frame in enumerate(frames):
+            writer.write(frame, ('10.0.0.1' if i % 2 else '10.0.0.2', 4000), base + i * 1_000_000)
+        writer.close()
+        assert os.path.getsize(path) == writer.bytes_written
+
+        with CaptureReader(path) as reader:
+            records = [(t, sender, bytes(frame)) for t, sender, frame in reader]
+            assert [r[2] for r in records] == frames
+            assert records[3] == (3_000_000, '10.0.0.1:4000', frames[3])
+            assert records[4][1] == '10.0.0.2:4000'
+            assert abs(reader.wall_time(0) - writer.start_wall_ns / 1e9) < 1e-6
+            first = next(iter(reader))[2]
+            assert isinstance(first, memoryview) and first.obj is not None
+            del first
+
+        summary = summarize(path)
+        assert summary['frames'] == 20 and summary['by_message_id'] == {0x14: 20}
+        assert abs(summary['duration'] - 0.019) < 1e-9
+    print("✅ 抓包读写正确")
+
+def test_capture_rebase_and_truncation():
+    """超过48位时间偏移后重设基准; 末尾不完整的记录被忽略; 已有文件不被覆盖"""
+    print("⏱️  测试抓包时间基准和截断...")
+    frames = _frames(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'long.gdl90cap')
+        writer = CaptureWriter(path)
+        base = writer.start_mono_ns
+        writer.write(frames[0], ('127.0.0.1', 1), base + 5)
+        writer.write(frames[1], ('127.0.0.1', 1), base + MAX_OFFSET_NS + 10)
+        writer.write(frames[2], ('127.0.0.1', 1), base + MAX_OFFSET_NS + 30)
+        writer.close()
+        try:
+            CaptureWriter(path)
+            assert False, "不应覆盖已有的抓包文件"
+        except FileExistsError:
+            pass
+
+        with open(path, 'ab') as f:
+            f.write(b'\x20\x00\x00')   # 写入中断留下的半个记录头
+        with CaptureReader(path) as reader:
+            times = [t for t, _, _ in reader]
+        assert times == [5, MAX_OFFSET_NS + 10, MAX_OFFSET_NS + 30]
+
+        bogus = os.path.join(tmp, 'bogus.bin')
+        with open(bogus, 'wb') as f:
+            f.write(b'not a capture file at all, sorry')
+        try:
+            CaptureReader(bogus)
+            assert False, "应拒绝非抓包文件"
+        except CaptureFormatError:
+            pass
+    print("✅ 抓包时间基准和截断处理正确")
+
+if __name__ == "__main__":
+    test_capture_round_trip()
+    test_capture_rebase_and_truncation()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+过期时间轮测试
+验证刷新、过期时刻、活跃集合版本号，以及过期开销只与到期目标数相关
+"""
+
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from expiry import TimingWheel
+
+def test_touch_and_expire():
+    """刷新推迟过期，到期后返回且版本号递增"""
+    print("⏳ 测试过期时间轮...")
+    wheel = TimingWheel(tick=1.0, slots=8)
+    wheel.touch('a', 10.0)
+    wheel.touch('b', 12.0)
+    version = wheel.version
+    wheel.touch('a', 11.0)                  # 只刷新，不改变活跃集合
+    assert wheel.version == version
+
+    assert wheel.advance(10.5) == []
+    assert wheel.advance(11.0) == ['a']
+    assert wheel.version == version + 1
+    assert set(wheel.active()) == {'b'}
+
+    wheel.touch('c', 40.0)                  # 超过一圈 (8秒) 的过期时间
+    assert wheel.advance(20.0) == ['b']
+    assert wheel.advance(39.0) == [] and 'c' in wheel
+    assert wheel.advance(45.0) == ['c']
+
+    wheel.touch('d', 30.0)                  # 已经过去的过期时间在下一个tick到期
+    assert wheel.advance(46.0) == ['d']
+    wheel.touch('e', 100.0)
+    wheel.discard('e')
+    assert len(wheel) == 0
+    print("✅ 过期时间轮正确")
+
+def test_expire_cost():
+    """大量活跃目标中只有少数到期时，推进时间轮不应扫描全部目标"""
+    wheel = TimingWheel()
+    for key in range(100000):
+        wheel.touch(key, 1000.0 + key % 30)
+    wheel.advance(999.0)
+
+    start = time.perf_counter()
+    for now in range(1000, 1030):
+        expired = wheel.advance(float(now))
+        assert len(expired) > 3000
+        for key in expired:
+            wheel.touch(key, now + 30.0)    # 立即重新加入，活跃数保持不变
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  100000 个活跃目标，30次推进共过期/刷新 {100000} 个: {elapsed * 1000:.1f}ms")
+    assert len(wheel) == 100000
+
+if __name__ == "__main__":
+    test_touch_and_expire()
+    test_expire_cost()
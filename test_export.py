@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+列式导出测试
+验证抓包和JSON消息日志导出的列内容、分块/并行导出结果一致，以及更新率和位置抖动分析
+"""
+
+import sys
+import os
+import importlib.util
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_capture import CaptureWriter
+from gdl90_export import export, load_columns, update_rates, position_jitter, bounded_imap
+from main import InlineGDL90Encoder
+
+# xp/目录下有同名模块，按路径加载根目录的接收端 (用于生成JSON消息日志)
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+ADDR = ('10.0.0.1', 4000)
+
+def _session():
+    """3架飞机各20秒、1Hz匀速向北飞行，每秒一个心跳，外加一个CRC错误的帧"""
+    encoder = InlineGDL90Encoder()
+    frames = []
+    for second in range(20):
+        frames.append((second, bytes(encoder.create_heartbeat(report_count=3, timestamp=43200 + second))))
+        for i in range(3):
+            frames.append((second + 0.1 * (i + 1), bytes(encoder.create_traffic_report({
+                'icao_address': 0xA00000 + i, 'lat': 47.0 + i + second * 0.001, 'lon': -122.0,
+                'alt': 3000.0 + i * 1000, 'speed': 220.0, 'track': 0.0, 'vs': -640.0 if i else None,
+                'callsign': f'T{i:04d}'}))))
+    frames.append((20.0, b'\x7e\x14\x00\x01\x02\x7e'))
+    return frames
+
+def _raw(path):
+    """列的原始字节 (NaN不等于自身，不能直接比较array)"""
+    return {name: column.tobytes() if hasattr(column, 'tobytes') else column
+            for name, column in load_columns(path).items()}
+
+def _write_capture(path, frames):
+    writer = CaptureWriter(path)
+    for t, frame in frames:
+        writer.write(frame, ADDR, writer.start_mono_ns + int(t * 1e9))
+    writer.close()
+    return writer.start_wall_ns / 1e9
+
+def test_capture_export():
+    """抓包导出为按类型的列，分块并行导出与单块导出的文件相同"""
+    print("📦 测试抓包列式导出...")
+    frames = _session()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        start = _write_capture(path, frames)
+        single = export(path, os.path.join(tmp, 'single'))
+        parallel = export(path, os.path.join(tmp, 'parallel'), chunk_records=7, workers=2)
+        assert single['rows'] == parallel['rows'] == {'traffic': 60, 'heartbeat': 20}
+        assert single['skipped'] == parallel['skipped'] == 1
+        assert single['chunks'] == 1 and parallel['chunks'] > 5
+        for kind in ('traffic', 'heartbeat'):
+            assert _raw(os.path.join(tmp, 'single', f'{kind}.npz')) == _raw(os.path.join(tmp, 'parallel', f'{kind}.npz'))
+        assert not [name for name in os.listdir(os.path.join(tmp, 'parallel')) if not name.endswith('.npz')]
+
+        traffic = load_columns(os.path.join(tmp, 'single', 'traffic.npz'))
+        assert traffic['ts'].typecode == 'd' and traffic['icao'].typecode == 'I'
+        assert abs(traffic['ts'][0] - (start + 0.1)) < 1e-6
+        assert list(traffic['icao'][:3]) == [0xA00000, 0xA00001, 0xA00002]
+        assert abs(traffic['lat'][4] - 48.001) < 1e-4 and traffic['alt'][4] == 4000
+        assert traffic['gs'][0] == 220.0 and traffic['vs'][1] == -640.0 and traffic['vs'][0] != traffic['vs'][0]
+        assert traffic['callsign'][2] == b'T0002'
+        heartbeat = load_columns(os.path.join(tmp, 'single', 'heartbeat.npz'))
+        assert list(heartbeat['utc_seconds'][:2]) == [43200, 43201] and heartbeat['reports'][0] == 3
+    print("✅ 抓包列式导出正确")
+
+def test_bounded_imap():
+    """并行导出按顺序取结果，进程池中未取走的任务不超过窗口大小"""
+    print("🪟 测试并行导出的任务窗口...")
+
+    class _Pool:
+        def __init__(self):
+            self.outstanding = 0
+            self.peak = 0
+
+        def apply_async(self, func, args):
+            pool = self
+            pool.outstanding += 1
+            pool.peak = max(pool.peak, pool.outstanding)
+
+            class _Result:
+                def get(self):
+                    pool.outstanding -= 1
+                    return func(*args)
+            return _Result()
+
+    pool = _Pool()
+    results = bounded_imap(pool, lambda n: n * n, range(100), 4)
+    assert next(results) == 0 and pool.outstanding == 4   # 取走一个结果后才提交下一个任务
+    assert list(results) == [n * n for n in range(1, 100)]
+    assert pool.peak == 4 and pool.outstanding == 0
+    assert list(bounded_imap(_Pool(), abs, [], 4)) == []
+    print("✅ 任务窗口有界")
+
+def test_message_log_export():
+    """JSON消息日志导出的列与抓包导出的相同 (时间戳除外)"""
+    print("📝 测试JSON日志列式导出...")
+    frames = _session()
+    with tempfile.TemporaryDirectory() as tmp:
+        capture = os.path.join(tmp, 'session.gdl90cap')
+        _write_capture(capture, frames)
+        receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, 'receiver.log'), quiet=True)
+        for t, frame in frames:
+            receiver._log_message(frame, ADDR, 1_700_000_000.0 + t)
+        receiver.message_log.close()
+
+        from_log = export(receiver.message_log.path, os.path.join(tmp, 'log'))
+        export(capture, os.path.join(tmp, 'capture'))
+        assert from_log['rows'] == {'traffic': 60, 'heartbeat': 20} and from_log['skipped'] == 1
+        log_columns = load_columns(os.path.join(tmp, 'log', 'traffic.npz'))
+        capture_columns = load_columns(os.path.join(tmp, 'capture', 'traffic.npz'))
+        for name in ('icao', 'lat', 'lon', 'alt', 'gs', 'track', 'nic', 'nacp', 'callsign'):
+            assert log_columns[name] == capture_columns[name], name
+        assert abs(log_columns['ts'][0] - 1_700_000_000.1) < 1e-6
+    print("✅ JSON日志列式导出正确")
+
+def test_column_analysis():
+    """匀速飞行的目标更新率为1Hz，位置抖动只有编码量化误差"""
+    print("📈 测试更新率和位置抖动分析...")
+    frames = _session()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        _write_capture(path, frames)
+        export(path, tmp)
+        columns = load_columns(os.path.join(tmp, 'traffic.npz'))
+    rates = update_rates(columns)
+    assert set(rates) == {0xA00000, 0xA00001, 0xA00002}
+    assert all(abs(info['rate_hz'] - 1.0) < 1e-6 and info['reports'] == 20 for info in rates.values())
+    jitter = position_jitter(columns)
+    assert all(value < 5.0 for value in jitter.values())
+    print("✅ 更新率和位置抖动分析正确")
+
+if __name__ == "__main__":
+    test_capture_export()
+    test_bounded_imap()
+    test_message_log_export()
+    test_column_analysis()
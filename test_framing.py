@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+GDL-90帧切分和原始帧过滤测试
+验证单数据报多帧、共用标记、跨读取的未完成帧和超长帧丢弃，以及解码前的帧过滤
+"""
+
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_framing import iter_frames, FrameSplitter
+from gdl90_filter import FrameFilter, parse_types, parse_icao_list, parse_bbox
+from main import InlineGDL90Encoder
+
+def _frames(count):
+    encoder = InlineGDL90Encoder()
+    return [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0, 'lon': -122.0,
+                                                 'callsign': f'T{i}'}))
+            for i in range(count)]
+
+def test_iter_frames():
+    """一个数据报中的多帧被逐个切出，视图不拷贝数据"""
+    print("✂️  测试数据报帧切分...")
+    frames = _frames(5)
+    datagram = b'\x00\x01' + b''.join(frames) + b'\x02'   # 首尾的杂散字节被忽略
+    views = list(iter_frames(datagram))
+    assert [bytes(v) for v in views] == frames
+    assert views[0].obj is datagram
+
+    # 相邻帧共用一个标记
+    shared = frames[0] + frames[1][1:]
+    assert [bytes(v) for v in iter_frames(shared)] == frames[:2]
+    assert list(iter_frames(b'\x7e\x7e\x7e')) == [] and list(iter_frames(b'abc')) == []
+    print("✅ 数据报帧切分正确")
+
+def test_frame_splitter_stream():
+    """按任意位置切开的字节流重组出相同的帧，超长的未完成帧被丢弃"""
+    print("🧵 测试字节流帧切分...")
+    frames = _frames(20)
+    stream = b''.join(frames)
+    for chunk in (1, 7, 33, 500):
+        splitter = FrameSplitter()
+        out = []
+        for i in range(0, len(stream), chunk):
+            out.extend(bytes(f) for f in splitter.feed(stream[i:i + chunk]))
+        assert out == frames, chunk
+        assert splitter.frames == len(frames)
+
+    splitter = FrameSplitter(max_frame=64)
+    out = [bytes(f) for f in splitter.feed(b'\x7e' + b'\x11' * 100)]
+    out += [bytes(f) for f in splitter.feed(b'\x22' * 10 + frames[0])]
+    assert out == [frames[0]] and splitter.dropped == 1
+    print("✅ 字节流帧切分正确")
+
+def test_frame_filter():
+    """按类型、ICAO地址和范围在解码前过滤，转义的头部也能正确判断"""
+    print("🧹 测试原始帧过滤...")
+    encoder = InlineGDL90Encoder()
+    heartbeat = bytes(encoder.create_heartbeat())
+    near = bytes(encoder.create_traffic_report({'icao_address': 0xABCDEF, 'lat': 47.5, 'lon': -122.5}))
+    far = bytes(encoder.create_traffic_report({'icao_address': 0xA1B2C3, 'lat': 10.0, 'lon': 170.0}))
+    escaped = bytes(encoder.create_traffic_report({'icao_address': 0x7E7D7E, 'lat': 47.5, 'lon': -122.5}))
+    assert b'\x7d' in escaped[1:12]
+
+    assert parse_types('traffic, 0x0A') == {0x14, 0x0A}
+    assert parse_icao_list('abcdef,0x7E7D7E') == {0xABCDEF, 0x7E7D7E}
+
+    traffic_only = FrameFilter(types={0x14})
+    assert not traffic_only.accepts(heartbeat) and traffic_only.accepts(near)
+
+    by_icao = FrameFilter(icao={0xABCDEF, 0x7E7D7E})
+    assert by_icao.accepts(heartbeat)  # 地址过滤只作用于位置报告
+    assert by_icao.accepts(near) and by_icao.accepts(escaped) and not by_icao.accepts(far)
+
+    by_bbox = FrameFilter(bbox=parse_bbox('47,-123,48,-122'))
+    assert by_bbox.accepts(near) and by_bbox.accepts(escaped) and not by_bbox.accepts(far)
+    assert FrameFilter(bbox=(0.0, 160.0, 20.0, -170.0)).accepts(far)  # 跨越日期变更线
+    assert FrameFilter(types={0x14}).accepts(b'garbage')              # 无法判断的帧交给解码器
+    assert not FrameFilter().active and by_bbox.active
+    print("✅ 原始帧过滤正确")
+
+if __name__ == "__main__":
+    test_iter_frames()
+    test_frame_splitter_stream()
+    test_frame_filter()
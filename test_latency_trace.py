@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+广播端延迟追踪测试
+验证环形缓冲只返回完整的最近记录、各阶段延迟的计算，以及RREF到达时间戳、AHRS通道、
+SIGUSR1打印和本机HTTP端点
+"""
+
+import sys
+import os
+import json
+import signal
+import socket
+import struct
+import time
+import urllib.error
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from latency_trace import TraceLane, LatencyTracer
+from main import AhrsLane, XPlaneUdpInline
+
+def test_ring_buffer():
+    """写满后覆盖最早的记录; 各阶段延迟按时间戳差计算"""
+    print("🔁 测试延迟追踪环形缓冲...")
+    lane = TraceLane('position', size=8)
+    ms = 1_000_000
+    for n in range(20):
+        base = n * 1000 * ms
+        # RREF到达后1ms更新状态，等待(n)ms后开始编码，编码0.2ms，发送0.05ms
+        lane.record(base, base + ms, base + (1 + n) * ms, base + (1 + n) * ms + 200_000,
+                    base + (1 + n) * ms + 250_000)
+    samples = lane.samples()
+    assert len(samples) == 7 and samples[-1][0] == 19 * 1000 * ms and samples[0][0] == 13 * 1000 * ms
+    histograms = lane.histograms()
+    assert histograms['update'].count == 7 and abs(histograms['update'].max - 0.001) < 1e-9
+    assert abs(histograms['wait'].min - 0.013) < 1e-9 and abs(histograms['wait'].max - 0.019) < 1e-9
+    assert abs(histograms['encode'].max - 0.0002) < 1e-9
+    assert abs(histograms['total'].max - 0.02025) < 1e-9
+
+    # 没有上游时间戳 (接收器未记录) 时只统计编码和发送
+    empty = TraceLane('ahrs', size=4)
+    empty.record(0, 0, 5 * ms, 6 * ms, 7 * ms)
+    histograms = empty.histograms()
+    assert histograms['total'].count == 0 and histograms['encode'].count == 1
+    print("✅ 环形缓冲和阶段延迟正确")
+
+def test_rref_receive_stamp():
+    """启用追踪后get_values记录RREF数据报到达的单调时钟时间"""
+    print("📥 测试RREF到达时间戳...")
+    xplane = XPlaneUdpInline()
+    xplane.socket.bind(('127.0.0.1', 0))
+    xplane.datarefs[0] = 'sim/flightmodel/position/latitude'
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packet = b"RREF," + struct.pack('<if', 0, 47.5)
+        tx.sendto(packet, xplane.socket.getsockname())
+        xplane.get_values()
+        assert xplane.receive_ns == 0   # 未启用追踪时不记录
+        xplane.trace = True
+        before = time.monotonic_ns()
+        tx.sendto(packet, xplane.socket.getsockname())
+        values = xplane.get_values()
+        assert before <= xplane.receive_ns <= time.monotonic_ns()
+        assert values['sim/flightmodel/position/latitude'] == 47.5
+    finally:
+        tx.close()
+    print("✅ RREF到达时间戳正确")
+
+def test_ahrs_lane_trace():
+    """AHRS通道每次发送记录一条追踪，并使用接收器最近一次更新的时间戳"""
+    print("🧭 测试AHRS通道延迟追踪...")
+
+    class _Receiver:
+        data_ready = True
+        current_data = {'roll': 1.0, 'pitch': 2.0, 'heading': 90.0, 'ias': 100.0, 'tas': 110.0}
+        trace_stamp = (0, 0)
+
+    receiver = _Receiver()
+    now = time.monotonic_ns()
+    receiver.trace_stamp = (now, now + 100_000)
+    tracer = LatencyTracer()
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(('127.0.0.1', 0))
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    lane = AhrsLane(receiver, tx, rx.getsockname(), rate=20.0, trace=tracer.lane('ahrs'))
+    lane.start()
+    time.sleep(0.3)
+    lane.stop()
+    tx.close()
+    rx.close()
+
+    trace = tracer.lanes['ahrs']
+    assert trace.head == lane.sent > 0
+    histograms = trace.histograms()
+    assert histograms['update'].count == trace.head and abs(histograms['update'].max - 0.0001) < 1e-9
+    assert 0 < histograms['total'].max < 1.0
+    print("✅ AHRS通道延迟追踪正确")
+
+def test_dump_and_endpoint():
+    """SIGUSR1打印各阶段延迟; HTTP端点返回JSON快照"""
+    print("🌐 测试延迟追踪输出...")
+    tracer = LatencyTracer(size=16)
+    lane = tracer.lane('position')
+    for n in range(5):
+        lane.record(n * 10_000_000 + 1, n * 10_000_000 + 2_000_000, n * 10_000_000 + 3_000_000,
+                    n * 10_000_000 + 3_500_000, n * 10_000_000 + 4_000_000)
+
+    if hasattr(signal, 'SIGUSR1'):
+        output = []
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            assert tracer.install_signal(output.append)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(0.05)   # 信号处理函数在主线程的下一条字节码执行
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert output and 'position (5 条)' in output[0] and 'total' in output[0]
+
+    host, port = tracer.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}/latency", timeout=2) as response:
+            snapshot = json.load(response)
+        try:
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=2)
+            assert False, "未知路径应返回404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+    finally:
+        tracer.close()
+    position = snapshot['lanes']['position']
+    assert position['records'] == 5 and position['window'] == 5
+    assert abs(position['stages']['total']['max'] - 0.003999999) < 1e-6
+    print("✅ 延迟追踪输出正确")
+
+if __name__ == "__main__":
+    test_ring_buffer()
+    test_rref_receive_stamp()
+    test_ahrs_lane_trace()
+    test_dump_and_endpoint()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+日志时间范围查询测试
+验证时间索引的写入和定位、按索引查询与顺序扫描结果一致，以及ICAO/类型过滤
+"""
+
+import sys
+import os
+import contextlib
+import datetime
+import importlib.util
+import io
+import json
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_capture import CaptureWriter
+from gdl90_index import IndexWriter, TimeIndex, index_path, open_index
+import gdl90_logquery
+from gdl90_logquery import query, parse_time
+from gdl90_msglog import AsyncMessageLog, format_timestamp
+from main import InlineGDL90Encoder
+
+# xp/目录下有同名模块，按路径加载根目录的接收端 (查询工具从这里导入解码器)
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+def test_time_index_seek():
+    """索引按时间间隔稀疏写入，seek返回不晚于查询时间的最后一个位置"""
+    print("🗂️  测试时间索引...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data.idx')
+        writer = IndexWriter(path, interval=1.0, every=1000)
+        for i in range(100):
+            writer.add(1000.0 + i * 0.25, i * 50)
+        writer.close()
+        assert writer.entries == 25
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')   # 写入中断留下的半个条目
+        index = TimeIndex(path)
+        assert len(index) == 25
+        assert index.seek(999.0) is None
+        assert index.seek(1002.6) == (8 * 50, 0)
+        assert index.seek(5000.0) == (96 * 50, 0)
+    print("✅ 时间索引正确")
+
+def test_capture_query():
+    """抓包按索引查询的结果与不用索引的顺序扫描一致，定位后仍能解析发送方"""
+    print("🔎 测试抓包时间范围查询...")
+    encoder = InlineGDL90Encoder()
+    frames = [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i % 10, 'lat': 47.0, 'lon': -122.0}))
+              for i in range(3000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        writer = CaptureWriter(path)
+        base = writer.start_mono_ns
+        for i, frame in enumerate(frames):
+            writer.write(frame, ('10.0.0.%d' % (i // 1000), 4000), base + i * 10_000_000)   # 100帧/秒
+        writer.close()
+        start_time = writer.start_wall_ns / 1e9
+
+        index = open_index(path)
+        assert index is not None and len(index) == 30 and len(index.senders) == 3
+        start, end = start_time + 11.995, start_time + 12.495   # 避开帧时间, 不受浮点误差影响
+        indexed = [(t, sender, bytes(frame)) for t, sender, frame in query(path, start, end)]
+        assert len(indexed) == 50
+        assert indexed[0][1] == '10.0.0.1:4000' and indexed[0][2] == frames[1200]
+
+        only = [(t, bytes(frame)) for t, _, frame in query(path, start, end, icao={0xA00003})]
+        assert [frame for _, frame in only] == [frames[1203], frames[1213], frames[1223], frames[1233], frames[1243]]
+        assert list(query(path, start, end, types={0x00})) == []
+
+        os.remove(index_path(path))
+        scanned = [(t, sender, bytes(frame)) for t, sender, frame in query(path, start, end)]
+        assert scanned == indexed
+    print("✅ 抓包时间范围查询正确")
+
+def test_capture_query_output():
+    """抓包查询按消息日志格式输出，不创建接收器 (不影响接收端logger的handlers)"""
+    print("🖨️  测试抓包查询输出...")
+    encoder = InlineGDL90Encoder()
+    frames = [bytes(encoder.create_heartbeat()),
+              bytes(encoder.create_traffic_report({'icao_address': 0xA00001, 'lat': 47.0, 'lon': -122.0,
+                                                   'callsign': 'Q1'}))]
+    sentinel = logging.NullHandler()
+    logger = logging.getLogger('GDL90Receiver')
+    logger.addHandler(sentinel)
+    output = io.StringIO()
+    argv = sys.argv
+    previous = sys.modules.get('gdl90_receiver')
+    sys.modules['gdl90_receiver'] = _receiver
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.gdl90cap')
+            writer = CaptureWriter(path)
+            for i, frame in enumerate(frames):
+                writer.write(frame, ('10.0.0.1', 4000), writer.start_mono_ns + i * 10_000_000)
+            writer.close()
+            sys.argv = ['gdl90_logquery.py', path]
+            with contextlib.redirect_stdout(output):
+                gdl90_logquery.main()
+        assert sentinel in logger.handlers
+    finally:
+        sys.argv = argv
+        logger.removeHandler(sentinel)
+        if previous is None:
+            del sys.modules['gdl90_receiver']
+        else:
+            sys.modules['gdl90_receiver'] = previous
+
+    lines = output.getvalue().splitlines()
+    entries = [json.loads(line.split(' - ', 1)[1]) for line in lines[:2]]
+    assert [entry['message_type'] for entry in entries] == ['Heartbeat', 'Traffic Report']
+    assert entries[1]['sender'] == '10.0.0.1:4000' and entries[1]['data']['callsign'] == 'Q1'
+    assert lines[2].startswith('🔎 2 条记录')
+    print("✅ 抓包查询输出正确")
+
+def test_message_log_query():
+    """JSON消息日志的索引随后台写入生成，查询按行首时间粗筛后按条目时间精确过滤"""
+    print("📝 测试消息日志时间范围查询...")
+    base = datetime.datetime(2025, 8, 12, 22, 33, 0).timestamp()
+
+    def format_record(record):
+        seq, received_at, icao = record
+        entry = {'seq': seq, 'timestamp': datetime.datetime.fromtimestamp(received_at).isoformat(),
+                 'message_type': 'Traffic Report', 'data': {'icao_address': f"0x{icao:06X}"}}
+        return f"{format_timestamp(received_at)} - {json.dumps(entry)}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'receiver_messages.log')
+        log = AsyncMessageLog(path, format_record, batch_size=100, record_time=lambda record: record[1]).start()
+        for i in range(2000):
+            log.enqueue((i + 1, base + i * 0.05, 0xABC000 + i % 4))
+        log.close()
+        assert len(open_index(path)) == 100
+
+        start = parse_time('22:33:40', base) - 0.01   # 避开记录时间, 不受浮点误差影响
+        results = list(query(path, start, start + 1.02))
+        assert [entry['seq'] for _, entry in results] == list(range(801, 822))
+        results = list(query(path, start, start + 1.02, icao={0xABC001}))
+        assert [entry['seq'] for _, entry in results] == [802, 806, 810, 814, 818]
+        assert list(query(path, start, start + 1.02, types={0x00})) == []
+
+        os.remove(index_path(path))
+        assert [entry['seq'] for _, entry in query(path, start, start + 1.02)] == list(range(801, 822))
+    print("✅ 消息日志时间范围查询正确")
+
+if __name__ == "__main__":
+    test_time_index_seek()
+    test_capture_query()
+    test_capture_query_output()
+    test_message_log_query()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+日志轮转测试
+验证消息日志和主日志按大小轮转、后台压缩、索引随段改名，以及读取端透明读取压缩的轮转段
+"""
+
+import sys
+import os
+import datetime
+import gzip
+import json
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_logquery import query
+from gdl90_logrotate import LogRotation, RotatingLogHandler, SegmentCompressor, open_log, segment_paths
+from gdl90_msglog import AsyncMessageLog, format_timestamp
+from traffic_sources import read_track_file
+
+def _format_record(record):
+    seq, received_at = record
+    entry = {'seq': seq, 'timestamp': datetime.datetime.fromtimestamp(received_at).isoformat(),
+             'message_type': 'Heartbeat', 'data': {}}
+    return f"{format_timestamp(received_at)} - {json.dumps(entry)}"
+
+def test_message_log_rotation():
+    """消息日志按大小轮转为gzip段，跨段查询的结果与写入的记录一致"""
+    print("🔄 测试消息日志轮转...")
+    base = datetime.datetime(2025, 8, 12, 22, 33, 0).timestamp()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'receiver_messages.log')
+        rotation = LogRotation(max_bytes=20000, compressor=SegmentCompressor('gzip'))
+        log = AsyncMessageLog(path, _format_record, record_time=lambda record: record[1], rotation=rotation)
+        log._open()   # 不启动写入线程，按写入线程的顺序逐批写入和轮转，结果可重复
+        for i in range(1000):
+            log.enqueue((i + 1, base + i * 0.1))
+            if i % 50 == 49:
+                log._drain()
+                log._maybe_rotate()
+        log._close_file()
+        rotation.close()
+
+        segments = segment_paths(path)
+        assert rotation.rotations >= 3 and len(segments) == rotation.rotations + 1
+        assert all(segment.endswith('.gz') for segment in segments[:-1])
+        assert all(os.path.exists(segment + '.idx') for segment in segments)
+        assert rotation.compressor.metrics()['compressed'] == rotation.rotations
+        assert not [name for name in os.listdir(tmp) if not name.startswith('receiver_messages.log')]
+        with open_log(segments[0], 'rt') as f:
+            assert json.loads(f.readline().split(' - ', 1)[1])['seq'] == 1
+
+        seqs = [entry['seq'] for _, entry in query(path, base - 1, base + 1000)]
+        assert seqs == list(range(1, 1001))
+        window = [entry['seq'] for _, entry in query(path, base + 49.95, base + 60.05)]
+        assert window == list(range(501, 602))
+    print("✅ 消息日志轮转正确")
+
+def test_main_log_rotation():
+    """主日志处理器超过大小上限时轮转，不压缩时保留未压缩的段"""
+    print("📝 测试主日志轮转...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'receiver.log')
+        rotation = LogRotation(max_bytes=1000)
+        handler = RotatingLogHandler(path, rotation)
+        logger = logging.getLogger('test_main_log_rotation')
+        logger.propagate = False
+        logger.addHandler(handler)
+        for i in range(100):
+            logger.warning("统计信息 - 总计: %d", i)
+        logger.removeHandler(handler)
+        handler.close()
+        segments = segment_paths(path)
+        assert rotation.rotations >= 2 and len(segments) == rotation.rotations + 1
+        lines = []
+        for segment in segments:
+            with open_log(segment, 'rt') as f:
+                lines.extend(f.read().splitlines())
+        assert lines == [f"统计信息 - 总计: {i}" for i in range(100)]
+    print("✅ 主日志轮转正确")
+
+def test_compressed_track_file():
+    """轨迹文件可以直接用gzip压缩后回放"""
+    print("🗜️  测试读取压缩的轨迹文件...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'track.jsonl.gz')
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for i in range(3):
+                f.write(json.dumps({'timestamp': i, 'icao': 'ABCDEF', 'lat': 47.0 + i, 'lon': -122.0}) + '\n')
+        records = list(read_track_file(path))
+        assert [r[0] for r in records] == [0.0, 1.0, 2.0] and records[2][2]['lat'] == 49.0
+    print("✅ 压缩的轨迹文件读取正确")
+
+if __name__ == "__main__":
+    test_message_log_rotation()
+    test_main_log_rotation()
+    test_compressed_track_file()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+广播端输出消息测试
+验证心跳计数以及AHRS、几何高度、设备标识等扩展消息的字段编码和发送节拍，
+并用接收端解码器 (gdl90_receiver.GDL90Decoder) 做端到端校验
+"""
+
+import sys
+import os
+import importlib.util
+import struct
+import tempfile
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder, GDL90Encoder, AhrsLane, gdl90_crc_compute
+
+# xp/目录下有同名的gdl90_receiver模块，按路径加载根目录的接收端，避免与xp的测试互相覆盖
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+GDL90Decoder = _receiver.GDL90Decoder
+
+def _payload(frame):
+    """去掉标记、反转义并校验CRC，返回消息体"""
+    assert frame[0] == 0x7E and frame[-1] == 0x7E
+    body = bytes(frame[1:-1]).replace(b'\x7d\x5e', b'\x7e').replace(b'\x7d\x5d', b'\x7d')
+    assert bytes(gdl90_crc_compute(body[:-2])) == body[-2:]
+    return body[:-2]
+
+def test_ahrs_encoding():
+    """AHRS消息: 0.1度单位的姿态/航向，缺失字段发送无效值"""
+    print("🛩️  测试AHRS消息编码...")
+    encoder = InlineGDL90Encoder()
+    payload = _payload(encoder.create_ahrs_report(
+        {'roll': -12.34, 'pitch': 5.0, 'heading': 271.3, 'ias': 120.4, 'tas': 131.6}))
+    assert payload[:2] == b'\x65\x01' and len(payload) == 12
+    assert struct.unpack('>hhHHH', payload[2:]) == (-123, 50, 2713, 120, 132)
+
+    payload = _payload(encoder.create_ahrs_report({'heading': 359.97}))
+    assert struct.unpack('>hhHHH', payload[2:]) == (0x7FFF, 0x7FFF, 0, 0xFFFF, 0xFFFF)
+
+    payload = _payload(encoder.create_ahrs_report({'roll': 250.0, 'pitch': -95.0}))
+    assert struct.unpack('>hh', payload[2:6]) == (1800, -950)
+    print("✅ AHRS消息编码正确")
+
+def test_ahrs_lane_rate():
+    """按固定节拍发送，落后超过一个周期时跳过节拍并重新对齐，数据未就绪时不发送 (虚拟时钟)"""
+    print("⏱️  测试AHRS发送节拍...")
+    interval = 1.0 / 16.0          # 二进制可精确表示，计划时刻可以直接比较
+    ready_window = (12 * interval, 15 * interval)   # 这段时间内数据未就绪
+    end = 20 * interval
+
+    class _Clock:
+        now = 0.0
+
+    clock = _Clock()
+
+    class _Receiver:
+        current_data = {'roll': 1.0, 'pitch': 2.0, 'heading': 90.0, 'ias': 100.0, 'tas': 110.0}
+
+        @property
+        def data_ready(self):
+            return not ready_window[0] <= clock.now < ready_window[1]
+
+    class _Socket:
+        def __init__(self):
+            self.times = []
+
+        def sendto(self, frame, address):
+            self.times.append(clock.now)
+            if len(self.times) == 5:
+                clock.now += 3.5 * interval   # 第5次发送阻塞3.5个周期
+
+    def sleep(seconds):
+        clock.now += seconds
+        if clock.now >= end:
+            lane.running = False
+
+    sock = _Socket()
+    lane = AhrsLane(_Receiver(), sock, ('127.0.0.1', 4000), rate=16.0,
+                    clock=lambda: clock.now, sleep=sleep)
+    lane.running = True
+    lane._run()
+
+    # 第5次发送后落后2.5个周期: 跳过2个节拍，在8.5处补发一次后回到原节拍; 12-14未就绪不发送
+    expected = [1, 2, 3, 4, 5, 8.5, 9, 10, 11, 15, 16, 17, 18, 19, 20]
+    assert sock.times == [n * interval for n in expected], [t / interval for t in sock.times]
+    metrics = lane.metrics()
+    assert lane.sent == len(expected) and lane.skipped == 2
+    assert metrics['max_jitter_ms'] == 0.5 * interval * 1000.0
+    assert metrics['avg_jitter_ms'] == 0.5 * interval * 1000.0 / len(expected)
+    print(f"   发送 {lane.sent} 个, 跳过 {lane.skipped} 个节拍, 最大抖动 {metrics['max_jitter_ms']:.2f}ms")
+
+    try:
+        AhrsLane(_Receiver(), None, None, rate=50.0)
+        assert False, "超出范围的频率应被拒绝"
+    except ValueError:
+        pass
+    print("✅ AHRS发送节拍正确")
+
+def test_geo_altitude_and_device_id():
+    """几何高度和设备标识消息经接收端解码后字段一致"""
+    print("📏 测试几何高度和设备标识消息...")
+    encoder = GDL90Encoder()
+    decoder = GDL90Decoder()
+
+    decoded = decoder.decode_message(bytearray(encoder.create_geo_altitude({'alt': 3502.4})))
+    assert decoded['message_type'] == 'Ownship Geometric Altitude'
+    assert decoded['geo_altitude_ft'] == 3500 and decoded['vfom_m'] == 15
+    assert not decoded['vertical_warning']
+
+    decoded = decoder.decode_message(bytearray(InlineGDL90Encoder().create_geo_altitude(-1000.0, vfom_m=None)))
+    assert decoded['geo_altitude_ft'] == -1000 and decoded['vfom_m'] is None
+
+    frame = encoder.create_device_id()
+    assert frame is encoder.create_device_id()  # 内容不变，只编码一次
+    decoded = decoder.decode_message(bytearray(frame))
+    assert decoded['message_type'] == 'Device ID'
+    assert decoded['device_name'] == 'XP2FDPRO' and decoded['serial'] is None
+    assert decoded['geo_altitude_datum'] == 'MSL'
+
+    decoded = decoder.decode_message(bytearray(encoder.create_ahrs_report(
+        {'roll': -3.2, 'pitch': 1.0, 'heading': 200.5, 'ias': 90.0, 'tas': None})))
+    assert decoded['message_type'] == 'AHRS'
+    assert (decoded['roll_deg'], decoded['heading_deg'], decoded['tas_kts']) == (-3.2, 200.5, None)
+
+    stats = decoder.get_stats()
+    assert stats['geo_altitude_count'] == 2 and stats['device_id_count'] == 1 and stats['ahrs_count'] == 1
+    print("✅ 几何高度和设备标识消息正确")
+
+def test_heartbeat_counts():
+    """心跳报告上一UTC秒发送的报告数，同一秒内复用已编码的帧"""
+    print("💓 测试心跳消息计数...")
+    encoder = GDL90Encoder()
+    decoder = GDL90Decoder()
+
+    first = encoder.create_heartbeat(now=1000.2)
+    assert first is encoder.create_heartbeat(now=1000.7)  # 同一秒复用模板
+    encoder.count_reports(7, now=1000.5)
+    encoder.count_reports(5, now=1000.9)
+    assert encoder.create_heartbeat(now=1000.95) is first  # 计数在下一秒才生效
+
+    decoded = decoder.decode_message(bytearray(encoder.create_heartbeat(now=1001.1)))
+    assert (decoded['uplink_count'], decoded['report_count']) == (0, 12)
+    assert decoded['timestamp_raw'] == 1001
+
+    # 中间有整秒没有发送报告，计数归零; 报告数超过10位时饱和
+    encoder.count_reports(3, now=1001.5)
+    assert decoder.decode_message(bytearray(encoder.create_heartbeat(now=1003.0)))['report_count'] == 0
+    encoder.count_reports(5000, now=1003.5)
+    assert decoder.decode_message(bytearray(encoder.create_heartbeat(now=1004.0)))['report_count'] == 0x3FF
+
+    # 接收端: 心跳声明的报告数与实际收到的交通报告数比较估计丢包
+    decoder = GDL90Decoder()
+    encoder = GDL90Encoder()
+    target_frame = InlineGDL90Encoder().create_traffic_report({'icao_address': 0xABCDEF, 'lat': 47.0, 'lon': -122.0})
+    decoder.decode_message(bytearray(encoder.create_heartbeat(now=2000.0)))
+    encoder.count_reports(4, now=2000.5)
+    for _ in range(3):
+        decoder.decode_message(bytearray(target_frame))
+    decoder.decode_message(bytearray(encoder.create_heartbeat(now=2001.0)))
+    assert decoder.get_stats()['reports_announced'] == 4
+    assert decoder.estimated_lost_reports() == 1
+    print("✅ 心跳消息计数正确")
+
+def test_position_report_view():
+    """位置报告按需解码: 字段与编码值一致，只访问的字段被计算"""
+    print("🔎 测试位置报告视图...")
+    decoder = GDL90Decoder()
+    frame = InlineGDL90Encoder().create_traffic_report(
+        {'icao_address': 0xABCDEF, 'lat': 47.5, 'lon': -122.25, 'alt': 3500.0, 'speed': 140.0,
+         'track': 90.0, 'vs': -640.0, 'callsign': 'N12345', 'traffic_alert': True})
+    view = decoder.decode_message(bytearray(frame))
+    assert view.message_id == 0x14 and view.icao == 0xABCDEF
+    assert view['message_type'] == 'Traffic Report' and view['callsign'] == 'N12345'
+    assert view._cache == {'callsign': 'N12345'}  # 其余字段尚未计算
+    assert 'error' not in view and view.get('error') is None
+
+    fields = dict(view)
+    assert fields['icao_address'] == '0xABCDEF' and fields['status'] == 1
+    assert abs(fields['latitude'] - 47.5) < 1e-4 and abs(fields['longitude'] + 122.25) < 1e-4
+    assert fields['altitude_ft'] == 3500 and fields['ground_speed_kts'] == 140
+    assert fields['vertical_speed_fpm'] == -640 and abs(fields['track_deg'] - 90.0) < 1.5
+
+    view = decoder.decode_message(bytearray(InlineGDL90Encoder().create_position_report(
+        {'lat': 47.0, 'lon': -122.0, 'alt': 1000.0})))
+    assert view['message_type'] == 'Ownship Report' and view['altitude_ft'] == 1000
+    print("✅ 位置报告视图正确")
+
+def test_filtered_frames_counted():
+    """解码前被过滤的帧不显示、不记录，但仍按类型计入统计"""
+    print("🧹 测试过滤帧的统计...")
+    receiver = _receiver.GDL90Receiver(port=0, quiet=True)
+    receiver.frame_filter = _receiver.FrameFilter(icao={0xABCDEF})
+    shown = []
+    receiver._display_message = lambda decoded, addr: shown.append(decoded.get('icao_address'))
+    encoder = InlineGDL90Encoder()
+    for icao in (0xABCDEF, 0x123456, 0x654321):
+        receiver._handle_frame(bytes(encoder.create_traffic_report({'icao_address': icao, 'lat': 47.0, 'lon': -122.0})),
+                               ('127.0.0.1', 4000))
+    receiver._handle_frame(bytes(encoder.create_heartbeat()), ('127.0.0.1', 4000))
+
+    stats = receiver.decoder.get_stats()
+    assert shown == ['0xABCDEF', None]  # 心跳不受地址过滤影响
+    assert stats['traffic_count'] == 3 and stats['filtered_count'] == 2 and stats['heartbeat_count'] == 1
+    assert stats['total_messages'] == 4
+
+    # 没有消息日志时，只显示交通报告的设置下推为类型过滤
+    receiver = _receiver.GDL90Receiver(port=0, quiet=True)
+    receiver.show_heartbeat = receiver.show_ownship = receiver.show_unknown = False
+    receiver._push_down_display_filter()
+    assert receiver.frame_filter.accepts(bytes(encoder.create_traffic_report({'icao_address': 1})))
+    assert not receiver.frame_filter.accepts(bytes(encoder.create_heartbeat()))
+    print("✅ 过滤帧的统计正确")
+
+def test_async_message_log():
+    """消息日志: 接收线程只排队原始帧，写入线程批量解码写入; 队列满时丢弃并计数"""
+    print("📝 测试后台消息日志...")
+    encoder = InlineGDL90Encoder()
+    frames = [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.0, 'lon': -122.0,
+                                                   'callsign': f'T{i}'})) for i in range(50)]
+    with tempfile.TemporaryDirectory() as tmp:
+        receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, 'rx.log'), quiet=True)
+        receiver.show_traffic = False
+        for frame in frames:
+            receiver._handle_frame(frame, ('127.0.0.1', 4000), 1700000000.25)
+        receiver.message_log.close()
+        with open(os.path.join(tmp, 'rx_messages.log'), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 50 and receiver.message_log.metrics()['written'] == 50
+        prefix, entry = lines[7].split(' - ', 1)
+        entry = json.loads(entry)
+        assert prefix.endswith('.250') and entry['seq'] == 8
+        assert entry['message_type'] == 'Traffic Report' and entry['data']['callsign'] == 'T7'
+        assert receiver.decoder.get_stats()['traffic_count'] == 50  # 写入线程的解码不计入接收统计
+
+        # 写入线程未启动时队列很快填满，超出的记录被丢弃
+        log = _receiver.AsyncMessageLog(os.path.join(tmp, 'small.log'), str, max_queue=10)
+        for i in range(25):
+            log.enqueue(i)
+        assert log.depth == 10 and log.dropped == 15 and log.max_depth == 10
+    print("✅ 后台消息日志正确")
+
+if __name__ == "__main__":
+    test_ahrs_encoding()
+    test_ahrs_lane_rate()
+    test_geo_altitude_and_device_id()
+    test_heartbeat_counts()
+    test_position_report_view()
+    test_filtered_frames_counted()
+    test_async_message_log()
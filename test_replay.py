@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+会话回放测试
+验证抓包原样回放 (保持数据报边界)、JSON日志重新编码，以及按倍速安排发送时刻
+"""
+
+import sys
+import os
+import importlib.util
+import socket
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from gdl90_capture import CaptureWriter
+from gdl90_replay import load_datagrams, replay, encode_entry
+from main import InlineGDL90Encoder
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+def _session_frames():
+    encoder = InlineGDL90Encoder()
+    traffic = [bytes(encoder.create_traffic_report({'icao_address': 0xA00000 + i, 'lat': 47.5 + i * 0.01,
+                                                    'lon': -122.3, 'alt': 3000.0 + i * 100, 'speed': 120.0,
+                                                    'track': 90.0, 'vs': -640.0, 'callsign': f'T{i:04d}'}))
+               for i in range(4)]
+    return [
+        [bytes(encoder.create_heartbeat(report_count=2, timestamp=45000)),
+         bytes(encoder.create_position_report({'lat': 47.0, 'lon': -122.0, 'alt': 2500.0, 'speed': 100.0}))],
+        traffic[:2],
+        traffic[2:],
+        [bytes(encoder.create_ahrs_report({'roll': -5.0, 'pitch': 2.5, 'heading': 270.0, 'ias': 95, 'tas': 101}))],
+    ]
+
+def test_capture_replay():
+    """抓包中同一数据报的帧合并发送，接收端收到的数据报与原始的相同"""
+    print("▶️  测试抓包回放...")
+    datagrams = _session_frames()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'session.gdl90cap')
+        writer = CaptureWriter(path)
+        for i, frames in enumerate(datagrams):
+            for frame in frames:
+                writer.write(frame, ('10.0.0.1', 4000), writer.start_mono_ns + i * 50_000_000)
+        writer.close()
+
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(1.0)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            stats = replay(load_datagrams(path), sender, receiver.getsockname(), speed=None)
+            received = [receiver.recv(65535) for _ in datagrams]
+        finally:
+            sender.close()
+            receiver.close()
+    assert received == [b''.join(frames) for frames in datagrams]
+    assert stats.datagrams == 4 and stats.frames == 7 and stats.send_errors == 0
+    assert abs(stats.recorded - 0.15) < 1e-6
+    print("✅ 抓包回放正确")
+
+def test_message_log_reencode():
+    """JSON消息日志条目重新编码后，解码结果与原始消息一致"""
+    print("🔁 测试JSON日志重新编码...")
+    datagrams = _session_frames()
+    frames = [frame for group in datagrams for frame in group]
+    frames.append(b'\x7e\x14\x00\x01\x7e')   # CRC错误的帧按原始字节发送
+    decoder = _receiver.GDL90Decoder()
+    with tempfile.TemporaryDirectory() as tmp:
+        log_receiver = _receiver.GDL90Receiver(port=0, log_file=os.path.join(tmp, 'receiver.log'), quiet=True)
+        for i, frame in enumerate(frames):
+            log_receiver._log_message(frame, ('10.0.0.1', 4000), 1_700_000_000.0 + i * 0.1)
+        log_receiver.message_log.close()
+
+        replayed = [datagram for _, _, datagram in load_datagrams(os.path.join(tmp, 'receiver_messages.log'))]
+    assert len(replayed) == len(frames)
+    assert replayed[-1] == frames[-1]
+    for original, copy in zip(frames[:-1], replayed[:-1]):
+        expected, actual = dict(decoder.decode_message(original)), dict(decoder.decode_message(copy))
+        for key, value in expected.items():
+            if isinstance(value, float):
+                assert abs(actual[key] - value) < 1e-4, (key, value, actual[key])
+            else:
+                assert actual[key] == value, (key, value, actual[key])
+    assert encode_entry(InlineGDL90Encoder(), {'message_type': 'Unknown', 'data': {}}) is None
+    print("✅ JSON日志重新编码正确")
+
+def test_replay_schedule():
+    """按倍速换算发送时刻 (用虚拟时钟验证)，超出范围的倍速被拒绝"""
+    print("⏱️  测试回放时间安排...")
+    now = [0.0]
+    sent = []
+
+    class FakeSocket:
+        def sendto(self, data, target):
+            sent.append((now[0], data))
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    def clock():
+        now[0] += 0.0001   # 每次读时钟前进0.1ms，使忙等能结束
+        return now[0]
+
+    datagrams = [(1000.0, 'a', b'\x7e\x00\x7e'), (1001.0, 'a', b'\x7e\x00\x7e'), (1004.0, 'a', b'\x7e\x00\x7e')]
+    stats = replay(datagrams, FakeSocket(), ('127.0.0.1', 4000), speed=2.0, clock=clock, sleep=sleep)
+    offsets = [t - sent[0][0] for t, _ in sent]
+    assert abs(offsets[1] - 0.5) < 0.001 and abs(offsets[2] - 2.0) < 0.001
+    summary = stats.summary()
+    assert summary['datagrams'] == 3 and summary['recorded'] == 4.0
+    assert 0 <= summary['lateness_p50'] <= summary['lateness_p99'] <= summary['lateness_max'] < 0.001
+    assert stats.lateness.count == 3
+
+    # 帧数按完整帧计: 共用标记的相邻帧各算一帧，截断的错误帧 (raw_hex) 算一条消息
+    shared = [(1000.0, 'a', b'\x7e\x00\x01\x7e\x0b\x02\x7e'), (1000.1, 'a', b'\x7e\x14\x00\x01')]
+    stats = replay(shared, FakeSocket(), ('127.0.0.1', 4000), speed=None)
+    assert stats.datagrams == 2 and stats.frames == 3
+    try:
+        replay(datagrams, FakeSocket(), ('127.0.0.1', 4000), speed=500)
+        assert False, "应拒绝超出范围的倍速"
+    except ValueError:
+        pass
+    print("✅ 回放时间安排正确")
+
+if __name__ == "__main__":
+    test_capture_replay()
+    test_message_log_reencode()
+    test_replay_schedule()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+空间网格索引测试
+验证增量更新、半径/矩形查询、最近目标查询和日期变更线处理，
+以及接收端 (xp/gdl90_receiver.py) 在接收线程更新和过期目标时从其他线程查询
+"""
+
+import sys
+import os
+import importlib.util
+import random
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from spatial_index import SpatialGrid, _distance_nm
+
+# 根目录下有同名模块，按路径加载xp/目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'xp_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'xp', 'gdl90_receiver.py'))
+_xp_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_xp_receiver)
+
+def test_incremental_updates():
+    """目标移动跨越网格后只出现在新网格中"""
+    grid = SpatialGrid(cell_deg=0.5)
+    grid.update(1, 47.0, -122.0)
+    grid.update(1, 47.01, -122.01)    # 同一网格内移动
+    grid.update(1, 48.2, -122.0)      # 跨越网格
+    assert len(grid) == 1
+    assert sum(len(bucket) for bucket in grid.cells.values()) == 1
+    assert grid.query_radius(47.0, -122.0, 10.0) == []
+    assert [key for key, _ in grid.query_radius(48.2, -122.0, 1.0)] == [1]
+    grid.remove(1)
+    grid.remove(1)
+    assert len(grid) == 0 and not grid.cells
+
+def test_queries_match_linear_scan():
+    """随机目标下半径查询结果与逐个扫描一致"""
+    rng = random.Random(7)
+    grid = SpatialGrid()
+    points = {}
+    for key in range(3000):
+        lat, lon = rng.uniform(40.0, 55.0), rng.uniform(-10.0, 10.0)
+        points[key] = (lat, lon)
+        grid.update(key, lat, lon)
+
+    for radius in (5.0, 40.0, 200.0):
+        found = grid.query_radius(50.0, 0.0, radius)
+        expected = sorted(k for k, (lat, lon) in points.items()
+                          if _distance_nm(50.0, 0.0, lat, lon) <= radius)
+        assert sorted(k for k, _ in found) == expected
+        assert [d for _, d in found] == sorted(d for _, d in found)
+
+    nearest = grid.nearest(50.0, 0.0, 10)
+    expected = sorted(points, key=lambda k: _distance_nm(50.0, 0.0, *points[k]))[:10]
+    assert [k for k, _ in nearest] == expected
+
+    inside = grid.query_bbox(49.0, -1.0, 51.0, 1.0)
+    expected = [k for k, (lat, lon) in points.items() if 49.0 <= lat <= 51.0 and -1.0 <= lon <= 1.0]
+    assert sorted(inside) == sorted(expected)
+
+def test_antimeridian():
+    """跨越日期变更线的查询"""
+    grid = SpatialGrid()
+    grid.update('east', 10.0, 179.9)
+    grid.update('west', 10.0, -179.9)
+    grid.update('far', 10.0, 170.0)
+    assert sorted(k for k, _ in grid.query_radius(10.0, 179.95, 20.0)) == ['east', 'west']
+    assert sorted(grid.query_bbox(9.0, 179.0, 11.0, -179.0)) == ['east', 'west']
+
+def test_concurrent_receiver_queries():
+    """接收线程不断插入、移动和过期目标时，其他线程的查询不出错"""
+    receiver = _xp_receiver.GDL90Receiver()
+    receiver.parser.stale_after = 0.05
+    errors = []
+    done = threading.Event()
+
+    def receive():
+        rng = random.Random(3)
+        now = 0.0
+        try:
+            for _ in range(20000):
+                now += 0.001
+                receiver.parser.track_aircraft(_xp_receiver.AircraftData(
+                    callsign='T', latitude=47.0 + rng.uniform(-1.0, 1.0), longitude=-122.0 + rng.uniform(-1.0, 1.0),
+                    altitude=3000.0, heading=0.0, speed=100.0, on_ground=False,
+                    mode_s_id=rng.randrange(500), timestamp=now))
+                receiver.parser.expire_aircraft(now)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def query():
+        try:
+            while not done.is_set():
+                receiver.get_aircraft_within(47.0, -122.0, 60.0)
+                receiver.get_aircraft_in_bbox(46.5, -122.5, 47.5, -121.5)
+                receiver.get_nearest_aircraft(47.0, -122.0, 5)
+                receiver.get_aircraft_json()
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)   # 频繁切换线程，让查询和更新交错
+    try:
+        threads = [threading.Thread(target=receive)] + [threading.Thread(target=query) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, errors
+    assert len(receiver.parser.aircraft) == len(receiver.parser.index)
+
+if __name__ == "__main__":
+    test_incremental_updates()
+    test_queries_match_linear_scan()
+    test_antimeridian()
+    test_concurrent_receiver_queries()
+    print("✅ 空间网格索引测试通过")
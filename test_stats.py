@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+接收端时间分布统计测试
+验证对数刻度直方图的分位数精度和合并，以及接收端按消息类型/ICAO统计到达间隔、位置变化和心跳延迟
+"""
+
+import sys
+import os
+import importlib.util
+import json
+import math
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import InlineGDL90Encoder
+from gdl90_stats import LogHistogram, ArrivalStats, BUCKETS_PER_DECADE
+
+# xp/目录下有同名模块，按路径加载根目录的接收端
+_spec = importlib.util.spec_from_file_location(
+    'root_gdl90_receiver', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gdl90_receiver.py'))
+_receiver = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_receiver)
+
+def _traffic_view(encoder, icao):
+    frame = bytes(encoder.create_traffic_report({'icao_address': icao, 'lat': 47.0, 'lon': -122.0}))
+    return _receiver.GDL90Decoder().decode_message(frame)
+
+def test_log_histogram():
+    """分位数的相对误差不超过一个桶宽，超出范围的值进入首尾的桶"""
+    print("📏 测试对数直方图...")
+    hist = LogHistogram(1e-6, 1e3)
+    values = [0.001 * (i + 1) for i in range(1000)]   # 1ms .. 1s 均匀分布
+    for value in values:
+        hist.add(value)
+    width = 10 ** (1 / BUCKETS_PER_DECADE)
+    for p, expected in ((0.50, 0.500), (0.95, 0.950), (0.99, 0.990)):
+        actual = hist.percentile(p)
+        assert expected <= actual <= expected * width, (p, expected, actual)
+    assert hist.percentile(1.0) == hist.max == 1.0
+
+    hist.add(0.0)
+    hist.add(5000.0)
+    assert hist.counts[0] == 1 and hist.counts[-1] == 1
+    other = LogHistogram(1e-6, 1e3)
+    other.add(0.25)
+    hist.merge(other)
+    snapshot = hist.snapshot()
+    assert snapshot['count'] == 1003 and snapshot['min'] == 0.0 and snapshot['max'] == 5000.0
+    assert sum(count for _, count in snapshot['buckets']) == 1003
+    assert snapshot['buckets'][-1] == [None, 1]
+    try:
+        hist.merge(LogHistogram(0.1, 1e6))
+        assert False, "应拒绝合并分桶不同的直方图"
+    except ValueError:
+        pass
+    print("✅ 对数直方图正确")
+
+def test_receiver_arrival_stats():
+    """接收端统计每种消息的到达间隔、每个目标的更新间隔和位置变化，以及心跳延迟"""
+    print("⏱️  测试接收端时间分布统计...")
+    encoder = InlineGDL90Encoder()
+    receiver = _receiver.GDL90Receiver(port=0, quiet=True)
+    assert receiver.arrival_stats is None   # 默认不统计，不增加接收线程的开销
+    receiver.arrival_stats = ArrivalStats()
+    receiver.show_heartbeat = receiver.show_traffic = receiver.show_ownship = False
+    addr = ('10.0.0.1', 4000)
+    start = 1_700_000_000.0            # UTC整秒
+    for second in range(10):
+        # 心跳在整秒发送，12ms后到达
+        heartbeat = bytes(encoder.create_heartbeat(timestamp=start + second))
+        receiver._handle_frame(heartbeat, addr, start + second + 0.012)
+        for half in range(2):
+            t = start + second + half * 0.5 + 0.1
+            for i in range(3):
+                # 每0.5秒向北移动约100米 (0.0009度)
+                frame = bytes(encoder.create_traffic_report({
+                    'icao_address': 0xA00000 + i, 'lat': 47.0 + (second * 2 + half) * 0.0009,
+                    'lon': -122.0 + i * 0.1, 'alt': 3000.0, 'callsign': f'T{i}'}))
+                receiver._handle_frame(frame, addr, t + i * 0.001)
+    receiver._handle_frame(b'\x7e\x14\x00\x01\x7e', addr, start + 20)   # 错误帧不统计
+
+    stats = receiver.arrival_stats
+    width = 10 ** (1 / BUCKETS_PER_DECADE)
+    heartbeat = stats.interarrival['Heartbeat']
+    assert heartbeat.count == 9 and 1.0 <= heartbeat.percentile(0.99) <= 1.0 * width
+    assert stats.latency.count == 10 and 0.012 <= stats.latency.percentile(0.50) <= 0.012 * width
+    assert sorted(stats.targets) == [0xA00000, 0xA00001, 0xA00002]
+    target = stats.targets[0xA00001]
+    assert target.interarrival.count == 19
+    assert 0.5 <= target.interarrival.percentile(0.50) <= 0.5 * width
+    assert 95 < target.position_delta.percentile(0.50) < 105 * width
+
+    # 时间戳晚于接收时间的心跳 (发送端时钟超前) 不计入延迟
+    receiver._handle_frame(bytes(encoder.create_heartbeat(timestamp=start + 31)), addr, start + 30.5)
+    assert stats.sender_ahead == 1 and stats.latency.count == 10
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'stats.json')
+        receiver.stats_json = path
+        receiver._show_stats()
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    assert snapshot['targets']['0xA00002']['interarrival']['count'] == 19
+    assert snapshot['target_interarrival']['count'] == 57
+    assert math.isclose(snapshot['latency']['max'], 0.012, abs_tol=1e-6)
+    assert any('心跳延迟' in line for line in stats.report_lines())
+
+    limited = ArrivalStats(max_targets=2)
+    for i in range(3):
+        limited.record(_traffic_view(encoder, 0xB00000 + i), start)
+    assert len(limited.targets) == 2 and limited.untracked == 1
+    print("✅ 接收端时间分布统计正确")
+
+if __name__ == "__main__":
+    test_log_histogram()
+    test_receiver_arrival_stats()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+交通数据处理流水线测试
+验证航位推算等广播前处理阶段的计算结果
+"""
+
+import sys
+import os
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from main import DeadReckoner, dead_reckon_batch, TrafficSelector, TrafficAlerter, GDL90Encoder, TrafficTarget, CombinedXPlaneReceiver
+from traffic_sources import TrafficTable
+
+def test_dead_reckoning():
+    """验证航位推算的方向、距离和最大推算时长"""
+    print("🧭 测试航位推算...")
+
+    # 3600节向东飞行1秒 = 1海里 = 1/60经度 (赤道)
+    lats, lons, alts = dead_reckon_batch(
+        [0.0], [0.0], [1000.0], [3600.0], [90.0], [600.0], [100.0], 101.0, max_horizon=2.0)
+    assert abs(lats[0]) < 1e-9
+    assert abs(lons[0] - 1.0 / 60.0) < 1e-9
+    assert abs(alts[0] - 1010.0) < 1e-9
+
+    # 超过最大推算时长后保持在max_horizon处
+    lats, lons, alts = dead_reckon_batch(
+        [0.0], [0.0], [1000.0], [3600.0], [0.0], [0.0], [100.0], 130.0, max_horizon=2.0)
+    assert abs(lats[0] - 2.0 / 60.0) < 1e-9
+
+    # 没有样本时间的目标不推算
+    reckoner = DeadReckoner(2.0)
+    data = {'lat': 47.0, 'lon': -122.0, 'alt': 3000.0, 'speed': 120.0, 'track': 45.0, 'vs': 0.0}
+    assert reckoner.project(data, 0.0, 100.0)['lat'] == 47.0
+
+    # 高纬度的经度变化按cos(lat)放大
+    projected = reckoner.project(data, 100.0, 101.0)
+    assert projected['lat'] > 47.0 and projected['lon'] > -122.0
+    assert data['lat'] == 47.0  # 原始数据不被修改
+    print("✅ 航位推算正确")
+
+class _Target:
+    """最小的交通目标替身 (TrafficSelector只需要icao_address和last_sent_cycle)"""
+    def __init__(self, icao_address):
+        self.icao_address = icao_address
+        self.last_sent_cycle = 0
+
+def _targets_north_of_ownship(distances_nm, alt_ft=3000.0):
+    targets = [_Target(0x200000 + i) for i in range(len(distances_nm))]
+    datas = [{'lat': 47.0 + d / 60.0, 'lon': -122.0, 'alt': alt_ft} for d in distances_nm]
+    return targets, datas
+
+def test_traffic_selection():
+    """验证范围筛选和超出预算时的轮流发送"""
+    print("📡 测试交通目标筛选...")
+    own = {'lat': 47.0, 'lon': -122.0, 'alt': 3000.0}
+
+    targets, datas = _targets_north_of_ownship([5.0, 50.0, 150.0])
+    selector = TrafficSelector(max_range_nm=100.0)
+    selected, _ = selector.select(own, targets, datas)
+    assert [t.icao_address for t in selected] == [0x200000, 0x200001]
+
+    datas[0]['alt'] = 20000.0
+    selector = TrafficSelector(alt_band_ft=5000.0)
+    selected, _ = selector.select(own, targets, datas)
+    assert 0x200000 not in [t.icao_address for t in selected]
+
+    # 10个目标，预算4: 最近的3个每周期发送，其余7个轮流占用1个位置
+    targets, datas = _targets_north_of_ownship([float(d) for d in range(1, 11)])
+    selector = TrafficSelector(frame_budget=4)
+    seen = set()
+    for _ in range(7):
+        selected, _ = selector.select(own, targets, datas)
+        addresses = [t.icao_address for t in selected]
+        assert len(addresses) == 4
+        assert addresses[:3] == [0x200000, 0x200001, 0x200002]
+        seen.update(addresses[3:])
+    assert len(seen) == 7
+    assert selector.last_stats['deferred'] == 6
+    print("✅ 交通目标筛选正确")
+
+def test_cpa_alerts():
+    """验证最近会遇点警报和滞回"""
+    print("🚨 测试交通警报...")
+    own = {'lat': 47.0, 'lon': -122.0, 'alt': 3000.0, 'speed': 120.0, 'track': 0.0, 'vs': 0.0}
+    targets = [_Target(0x300001), _Target(0x300002), _Target(0x300003)]
+    datas = [
+        # 正前方5海里对头飞行，约75秒后相遇
+        {'lat': 47.0 + 5.0 / 60.0, 'lon': -122.0, 'alt': 3000.0, 'speed': 120.0, 'track': 180.0, 'vs': 0.0},
+        # 后方2海里同向同速，相对静止
+        {'lat': 47.0 - 2.0 / 60.0, 'lon': -122.0, 'alt': 3000.0, 'speed': 120.0, 'track': 0.0, 'vs': 0.0},
+        # 正前方2海里对头飞行但高5000英尺
+        {'lat': 47.0 + 2.0 / 60.0, 'lon': -122.0, 'alt': 8000.0, 'speed': 120.0, 'track': 180.0, 'vs': 0.0},
+    ]
+    alerter = TrafficAlerter(alert_time=60.0, alert_range_nm=1.0, alert_alt_ft=1000.0)
+    assert alerter.evaluate(own, targets, datas) == set()
+
+    alerter = TrafficAlerter(alert_time=90.0, alert_range_nm=1.0, alert_alt_ft=1000.0)
+    assert alerter.evaluate(own, targets, datas) == {0x300001}
+
+    # 滞回: 进入警报后，目标稍微超出阈值 (但在放大后的阈值内) 仍保持警报
+    datas[0]['alt'] = 4200.0
+    assert alerter.evaluate(own, targets, datas) == {0x300001}
+    datas[0]['alt'] = 5000.0
+    assert alerter.evaluate(own, targets, datas) == set()
+    assert alerter.metrics()['cycles'] == 3
+    print("✅ 交通警报正确")
+
+def test_cpa_alerts_scale():
+    """大量合成目标下CPA计算不应成为发送循环的瓶颈"""
+    rng = random.Random(42)
+    own = {'lat': 47.0, 'lon': -122.0, 'alt': 5000.0, 'speed': 150.0, 'track': 90.0, 'vs': 0.0}
+    count = 5000
+    targets = [_Target(0x400000 + i) for i in range(count)]
+    datas = [{'lat': 47.0 + rng.uniform(-2, 2), 'lon': -122.0 + rng.uniform(-3, 3),
+              'alt': rng.uniform(0, 20000), 'speed': rng.uniform(80, 450),
+              'track': rng.uniform(0, 360), 'vs': rng.uniform(-2000, 2000)} for _ in range(count)]
+    alerter = TrafficAlerter()
+    start = time.perf_counter()
+    alerter.evaluate(own, targets, datas)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {count} 个目标CPA计算: {elapsed * 1000:.1f}ms")
+    assert elapsed < 0.5
+
+def test_traffic_table_pipeline():
+    """共享目标表: 写入、过期，以及大量目标时按范围预筛选后批量编码"""
+    print("🗂️  测试共享交通目标表...")
+    table = TrafficTable(stale_after=30.0)
+    table.upsert(0xABCDEF, {'lat': 47.0, 'lon': -122.0, 'alt': 3000.0}, source='test', now=100.0)
+    table.upsert(0xABCDEF, {'alt': 3500.0}, source='test', now=110.0)
+    assert len(table) == 1 and table.get(0xABCDEF).data['alt'] == 3500.0
+    assert table.expire(now=135.0) == []
+    assert table.expire(now=141.0) == [0xABCDEF]
+    assert len(table) == 0 and len(table.index) == 0
+
+    rng = random.Random(5)
+    for i in range(10000):
+        table.upsert(0x500000 + i, {'lat': rng.uniform(30.0, 60.0), 'lon': rng.uniform(-30.0, 30.0),
+                                    'alt': rng.uniform(0, 30000), 'callsign': f'R{i}'},
+                     source='test', now=200.0)
+    own = {'lat': 45.0, 'lon': 0.0, 'alt': 5000.0}
+    selector = TrafficSelector(max_range_nm=30.0, frame_budget=20)
+    candidates = selector.prefilter(own, table)
+    assert 0 < len(candidates) < 200
+    selected, datas = selector.select(own, candidates, [c.data for c in candidates])
+    assert len(selected) == min(20, selector.last_stats['in_range'])
+
+    # 轮流发送的状态记在目标上，目标过期后不在筛选器中残留
+    assert all(record.last_sent_cycle == selector.cycle for record in selected)
+    assert not any(isinstance(value, dict) and len(value) > len(selector.last_stats)
+                   for value in vars(selector).values())
+    removed = table.expire(now=300.0)
+    assert len(removed) == 10000 and len(table) == 0
+    table.upsert(selected[0].icao_address, dict(selected[0].data), source='test', now=300.0)
+    assert table.get(selected[0].icao_address).last_sent_cycle == 0
+
+    frames = GDL90Encoder().create_traffic_reports(selected, datas, alerted={selected[0].icao_address})
+    assert len(frames) == len(selected)
+    assert frames[0][0] == 0x7e and frames[0][1] == 0x14 and frames[0][2] & 0x80
+    print(f"✅ 10000个目标中预筛选出 {len(candidates)} 个候选，发送 {len(frames)} 个")
+
+def test_traffic_identity_cache():
+    """没有tailnum的移动目标呼号保持不变，槽位过期后重新解析"""
+    print("🆔 测试交通目标身份缓存...")
+    target = TrafficTarget(7)
+    prefix = 'sim/cockpit2/tcas/targets/position/double/plane7_'
+    callsigns = set()
+    for step in range(10):
+        target.update_data({prefix + 'lat': 47.0 + step * 0.01, prefix + 'lon': -122.0,
+                            prefix + 'ele': 1000.0}, now=100.0 + step)
+        callsigns.add(target.data['callsign'])
+    assert len(callsigns) == 1
+
+    values = {prefix + 'lat': 47.2, prefix + 'lon': -122.0, prefix + 'ele': 1000.0}
+    values.update({f'sim/multiplayer/position/plane7_tailnum[{i}]': float(c) for i, c in enumerate(b'N42XY')})
+    target.update_data(values, now=111.0)
+    assert target.data['callsign'] == 'N42XY'
+
+    target.reset_identity()
+    assert not target.identity_resolved and target.data['callsign'] == 'TRF007'
+
+    # 编码器缓存的静态字节随呼号变化而更新
+    encoder = GDL90Encoder()
+    first = encoder.create_traffic_report(target, {'lat': 47.0, 'lon': -122.0, 'callsign': 'AAA'})
+    second = encoder.create_traffic_report(target, {'lat': 47.0, 'lon': -122.0, 'callsign': 'BBB'})
+    assert b'AAA' in first and b'BBB' in second
+    print("✅ 交通目标身份缓存正确")
+
+def test_modes_icao_assignment():
+    """按mode-S id分配真实ICAO地址，重复或缺失的id回退到按槽位生成的地址"""
+    print("📇 测试mode-S地址映射...")
+    receiver = CombinedXPlaneReceiver(enable_traffic=True)
+    prefix = 'sim/cockpit2/tcas/targets/position/double/plane'
+    values = {prefix + '3_lat': 47.0, prefix + '3_lon': -122.0,
+              prefix + '4_lat': 47.1, prefix + '4_lon': -122.0,
+              prefix + '5_lat': 47.2, prefix + '5_lon': -122.0,
+              'sim/cockpit2/tcas/targets/modeS_id[3]': 0xA1B2C3,
+              'sim/cockpit2/tcas/targets/modeS_id[4]': 0xA1B2C3}
+    receiver._update_current_data(values)
+    addresses = {t.plane_id: t.icao_address for t in receiver.get_active_targets()}
+    assert addresses == {3: 0xA1B2C3, 4: 0x100004, 5: 0x100005}
+    assert receiver.icao_slots[0xA1B2C3] == 3
+
+    # 槽位3换成另一架飞机
+    values['sim/cockpit2/tcas/targets/modeS_id[3]'] = 0xC0FFEE
+    receiver._update_current_data(values)
+    assert receiver.traffic_targets[3].icao_address == 0xC0FFEE
+    assert receiver.traffic_targets[4].icao_address == 0xA1B2C3
+    print("✅ mode-S地址映射正确")
+
+if __name__ == "__main__":
+    test_dead_reckoning()
+    test_traffic_selection()
+    test_cpa_alerts()
+    test_cpa_alerts_scale()
+    test_traffic_table_pipeline()
+    test_traffic_identity_cache()
+    test_modes_icao_assignment()
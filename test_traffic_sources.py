@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+交通数据源测试
+验证轨迹文件回放的流式读取、倍速和跳转
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from traffic_sources import TrafficTable, TrackFileSource, read_track_file
+
+def _write(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def test_track_file_formats():
+    """CSV和JSON Lines解析为相同的记录，格式错误的行被跳过"""
+    print("📄 测试轨迹文件解析...")
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'tracks.csv')
+        _write(csv_path, [
+            'timestamp,icao,lat,lon,alt,speed,track,vs,callsign',
+            '100.0,A1B2C3,47.0,-122.0,3000,120,90,0,N123AB',
+            'bad,A1B2C3,47.0,-122.0,3000,120,90,0,N123AB',
+            '101.0,0xA1B2C3,47.01,-122.0,3100,,,,',
+        ])
+        jsonl_path = os.path.join(tmp, 'tracks.jsonl')
+        _write(jsonl_path, [
+            json.dumps({'timestamp': 100.0, 'icao': 'A1B2C3', 'lat': 47.0, 'lon': -122.0, 'alt': 3000,
+                        'speed': 120, 'track': 90, 'vs': 0, 'callsign': 'N123AB'}),
+            '',
+            json.dumps({'timestamp': 101.0, 'icao': 0xA1B2C3, 'lat': 47.01, 'lon': -122.0, 'alt': 3100}),
+        ])
+        csv_records = list(read_track_file(csv_path))
+        jsonl_records = list(read_track_file(jsonl_path))
+    assert csv_records == jsonl_records
+    assert len(csv_records) == 2
+    assert csv_records[0][1] == 0xA1B2C3 and csv_records[0][2]['callsign'] == 'N123AB'
+    assert 'speed' not in csv_records[1][2]  # 空字段不覆盖已有数据
+    print("✅ 轨迹文件解析正确")
+
+def test_track_replay_timing():
+    """倍速回放只写入当前回放时刻之前的记录，跳转后从指定位置开始"""
+    print("⏩ 测试轨迹回放倍速和跳转...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'tracks.csv')
+        lines = ['timestamp,icao,lat,lon,alt']
+        lines += [f'{1000 + t},{0xB00000 + t:06X},47.0,-122.0,{t * 100}' for t in range(60)]
+        _write(path, lines)
+
+        table = TrafficTable(stale_after=1e9)
+        source = TrackFileSource(path, speed=10.0)
+        assert source.poll(table, 50.0) == 1          # 起点: 只有t=0的记录
+        assert source.poll(table, 51.0) == 10         # 1秒墙钟 = 10秒录制时间
+        record = table.get(0xB0000A)
+        assert abs(record.sample_time - 51.0) < 1e-9  # 样本时间换算回墙钟
+        source.poll(table, 60.0)
+        assert source.finished and source.updates == 60
+        source.close()
+
+        table = TrafficTable(stale_after=1e9)
+        source = TrackFileSource(path, speed=1.0, seek=30.0)
+        assert source.poll(table, 0.0) == 1
+        assert 0xB0001E in table and 0xB0001D not in table
+        source.close()
+
+    try:
+        TrackFileSource(path, speed=100.0)
+        assert False, "超出范围的倍速应被拒绝"
+    except ValueError:
+        pass
+    print("✅ 轨迹回放倍速和跳转正确")
+
+if __name__ == "__main__":
+    test_track_file_formats()
+    test_track_replay_timing()
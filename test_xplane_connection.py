@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+X-Plane连接测试
+用替身代替X-Plane UDP连接，验证数据中断后的自动恢复，以及恢复期间广播只发送"未就绪"心跳;
+用记录数据报的socket验证RREF订阅注册表、断线后重放订阅、批量退订和令牌桶限速
+"""
+
+import sys
+import os
+import struct
+import types
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import main
+from main import CombinedXPlaneReceiver, XPlaneDataReceiverNew, XPlaneUdpInline, TokenBucket
+from main import RREF_SEND_RATE, RREF_SEND_BURST
+from traffic_sources import TrafficSource
+
+LAT = 'sim/flightmodel/position/latitude'
+
+class _ScriptedUdp:
+    """XPlaneUdpInline替身: get_values按脚本返回数据或抛出超时，reconnect先失败若干次"""
+
+    def __init__(self, receiver, script, reconnect_failures=0):
+        self.receiver = receiver
+        self.script = list(script)
+        self.reconnect_failures = reconnect_failures
+        self.reconnects = 0
+        self.ready_seen = []     # 每次get_values/reconnect调用时接收器的data_ready
+        self.trace = False
+        self.receive_ns = 0
+
+    def find_ip(self):
+        raise Exception("未找到XPlane IP")
+
+    def get_values(self):
+        self.ready_seen.append(('get', self.receiver.data_ready))
+        if not self.script:
+            self.receiver.running = False
+            raise Exception("XPlane超时")
+        step = self.script.pop(0)
+        if step is None:
+            raise Exception("XPlane超时")
+        return step
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.ready_seen.append(('reconnect', self.receiver.data_ready))
+        if self.reconnects <= self.reconnect_failures:
+            raise Exception("未找到XPlane IP")
+        return {'IP': '127.0.0.1', 'Port': 49000}, 8
+
+def _without_retry_delay(test):
+    """恢复重试不等待 (XPLANE_RECOVERY_RETRY在每次重试时读取)"""
+    def wrapper():
+        previous = main.XPLANE_RECOVERY_RETRY
+        main.XPLANE_RECOVERY_RETRY = 0.0
+        try:
+            test()
+        finally:
+            main.XPLANE_RECOVERY_RETRY = previous
+    wrapper.__name__ = test.__name__
+    wrapper.__doc__ = test.__doc__
+    return wrapper
+
+@_without_retry_delay
+def test_receive_loop_recovery():
+    """数据超时后data_ready变为False，reconnect失败时持续重试，恢复后收到数据再变回True"""
+    print("🔄 测试X-Plane断线恢复...")
+    for receiver in (CombinedXPlaneReceiver(), XPlaneDataReceiverNew()):
+        udp = _ScriptedUdp(receiver, [{LAT: 47.0}, None, {LAT: 47.5}], reconnect_failures=2)
+        receiver.xplane_udp = udp
+        receiver.running = True
+        receiver._receive_loop()
+
+        assert udp.reconnects == 3
+        assert udp.ready_seen == [('get', False), ('get', True),
+                                  ('reconnect', False), ('reconnect', False), ('reconnect', False),
+                                  ('get', False), ('get', True)], udp.ready_seen
+        assert receiver.beacon_data == {'IP': '127.0.0.1', 'Port': 49000}
+        assert receiver.current_data['lat'] == 47.5
+    print("✅ 断线后持续重连，恢复后重新就绪")
+
+@_without_retry_delay
+def test_recover_stops_with_receiver():
+    """停止接收器后恢复循环退出并返回False"""
+    print("🛑 测试停止时退出恢复循环...")
+    receiver = CombinedXPlaneReceiver()
+    udp = _ScriptedUdp(receiver, [], reconnect_failures=1000)
+    original = udp.reconnect
+
+    def reconnect():
+        if udp.reconnects == 4:
+            receiver.running = False
+        return original()
+
+    udp.reconnect = reconnect
+    receiver.xplane_udp = udp
+    receiver.running = True
+    assert receiver._recover() is False
+    assert udp.reconnects == 5 and not receiver.data_ready
+    print("✅ 停止后不再重连")
+
+def test_start_failure_returns_false():
+    """找不到X-Plane时start()返回False，不退出进程"""
+    print("🚫 测试启动失败...")
+    receiver = CombinedXPlaneReceiver()
+    receiver.xplane_udp = _ScriptedUdp(receiver, [])
+    try:
+        assert receiver.start() is False
+    except SystemExit:
+        assert False, "start()不应退出进程"
+    assert not receiver.running and not receiver.data_ready
+    print("✅ 启动失败返回False")
+
+class _Clock:
+    """替换main模块中的time: sleep推进虚拟时间，到达end后抛出KeyboardInterrupt结束广播"""
+
+    def __init__(self, start, end):
+        self.now = start
+        self.end = end
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0.01)
+        if self.now >= self.end:
+            raise KeyboardInterrupt
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def monotonic_ns(self):
+        return int(self.now * 1e9)
+
+class _Socket:
+    """记录广播数据报 (发送时间, 数据)"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+
+    def setsockopt(self, *args):
+        pass
+
+    def sendto(self, data, addr):
+        self.sent.append((self.clock.now, bytes(data)))
+
+    def close(self):
+        pass
+
+class _StubReceiver:
+    """CombinedXPlaneReceiver替身: ready_at之前数据流中断"""
+
+    def __init__(self, clock, ready_at):
+        self.clock = clock
+        self.ready_at = ready_at
+        self.current_data = {'lat': 47.0, 'lon': -122.0, 'alt': 3000.0, 'speed': 120.0,
+                             'track': 90.0, 'vs': 0.0}
+        self.sample_time = 0.0
+
+    @property
+    def data_ready(self):
+        return self.clock.now >= self.ready_at
+
+    def start(self):
+        return True
+
+    def stop(self):
+        pass
+
+    def get_active_targets(self):
+        return []
+
+class _PolledSource(TrafficSource):
+    """记录轮询时间的交通数据源"""
+
+    name = 'test'
+
+    def __init__(self):
+        self.polls = []
+
+    def poll(self, table, now):
+        self.polls.append(now)
+        table.upsert(0xA00001, {'lat': 47.01, 'lon': -122.0, 'alt': 3500.0, 'callsign': 'TEST1'},
+                     sample_time=now, source=self.name, now=now)
+        return 1
+
+def test_not_ready_broadcast():
+    """数据中断期间心跳清除GPS Pos Valid位 (st1=0x01)，不发送位置和交通报告"""
+    print("💓 测试未就绪时的广播...")
+    start, ready_at = 1_700_000_000.0, 1_700_000_003.5
+    clock = _Clock(start, start + 6.0)
+    sock = _Socket(clock)
+    source = _PolledSource()
+    patched = {
+        'time': clock,
+        'socket': types.SimpleNamespace(socket=lambda *args: sock, AF_INET=main.socket.AF_INET,
+                                        SOCK_DGRAM=main.socket.SOCK_DGRAM, SOL_SOCKET=main.socket.SOL_SOCKET,
+                                        SO_BROADCAST=main.socket.SO_BROADCAST),
+        'is_xplane_running': lambda: (True, '127.0.0.1'),
+        'check_traffic_settings': lambda: None,
+        'input': lambda: '',
+        'CombinedXPlaneReceiver': lambda **kwargs: _StubReceiver(clock, ready_at),
+    }
+    previous = {name: getattr(main, name) for name in patched if hasattr(main, name)}
+    for name, value in patched.items():
+        setattr(main, name, value)
+    try:
+        main.broadcast_gdl90(enable_traffic=True, extra_sources=[source])
+    finally:
+        for name in patched:
+            if name in previous:
+                setattr(main, name, previous[name])
+            else:
+                delattr(main, name)
+
+    heartbeats = [(t, frame[2]) for t, frame in sock.sent if frame[1] == 0x00]
+    assert [st1 for t, st1 in heartbeats if t < ready_at] == [0x01, 0x01, 0x01]
+    assert [st1 for t, st1 in heartbeats if t >= ready_at] == [0x81, 0x81]
+    for message_id in (0x0A, 0x0B, 0x14):   # 位置、几何高度、交通
+        times = [t for t, frame in sock.sent if frame[1] == message_id]
+        assert times and min(times) >= ready_at, (message_id, times)
+    assert source.polls and min(source.polls) >= ready_at
+    print(f"✅ 未就绪期间只发送心跳 ({len(sock.sent)} 个数据报)")
+
+class _RrefSocket:
+    """记录发送给X-Plane的RREF请求 (频率, 索引, dataref)"""
+
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.requests = []
+        self.times = []
+
+    def sendto(self, message, addr):
+        assert addr == ('127.0.0.1', 49000)
+        cmd, freq, idx, dataref = struct.unpack('<5sii400s', message)
+        assert cmd == b'RREF\x00'
+        self.requests.append((freq, idx, dataref.rstrip(b'\x00').decode()))
+        if self.clock is not None:
+            self.times.append(self.clock.now)
+
+    def close(self):
+        pass
+
+def _fake_udp(clock=None):
+    udp = XPlaneUdpInline()
+    udp.socket.close()
+    udp.socket = _RrefSocket(clock)
+    udp.beacon_data = {'IP': '127.0.0.1', 'Port': 49000}
+    return udp
+
+def test_dataref_registry():
+    """索引在多次add_datarefs之间保持不变，退订的索引不再复用"""
+    print("🗂️  测试RREF订阅注册表...")
+    udp = _fake_udp()
+    assert udp.add_datarefs(['a', 'b', 'c'], freq=10) == 3
+    assert udp.add_datarefs(['b', 'd'], freq=5) == 2
+    assert udp.dataref_index == {'a': 0, 'b': 1, 'c': 2, 'd': 3}
+    assert udp.socket.requests == [(10, 0, 'a'), (10, 1, 'b'), (10, 2, 'c'), (5, 1, 'b'), (5, 3, 'd')]
+
+    udp.xplane_values['a'] = 1.0
+    udp.add_dataref('a', freq=0)
+    udp.add_dataref('e')
+    assert udp.socket.requests[-2:] == [(0, 0, 'a'), (1, 4, 'e')]
+    assert udp.dataref_index == {'b': 1, 'c': 2, 'd': 3, 'e': 4}
+    assert udp.datarefs == {idx: dataref for dataref, idx in udp.dataref_index.items()}
+    assert udp.dataref_freqs == {'b': 5, 'c': 10, 'd': 5, 'e': 1} and 'a' not in udp.xplane_values
+    print("✅ 订阅索引稳定")
+
+def test_resubscribe_and_unsubscribe():
+    """resubscribe按原索引重发每个订阅的频率; unsubscribe_all对每个索引发送freq=0"""
+    print("📨 测试重放订阅和批量退订...")
+    udp = _fake_udp()
+    udp.add_datarefs(['a', 'b'], freq=10)
+    udp.add_datarefs(['c'], freq=2)
+    udp.add_dataref('b', freq=20)
+    udp.socket.requests.clear()
+
+    assert udp.resubscribe() == 3
+    assert sorted(udp.socket.requests) == [(2, 2, 'c'), (10, 0, 'a'), (20, 1, 'b')]
+    assert udp.dataref_index == {'a': 0, 'b': 1, 'c': 2}
+
+    udp.socket.requests.clear()
+    udp.xplane_values['a'] = 1.0
+    assert udp.unsubscribe_all() == 3
+    assert sorted(udp.socket.requests) == [(0, 0, 'a'), (0, 1, 'b'), (0, 2, 'c')]
+    assert not udp.datarefs and not udp.dataref_index and not udp.dataref_freqs and not udp.xplane_values
+    assert udp.resubscribe() == 0
+
+    # 没有找到过X-Plane时只清空注册表，不发送
+    udp = _fake_udp()
+    udp.add_dataref('a', freq=10)
+    udp.beacon_data = {}
+    udp.socket.requests.clear()
+    assert udp.unsubscribe_all() == 0 and not udp.socket.requests and not udp.dataref_index
+    print("✅ 重放订阅和批量退订正确")
+
+def test_rref_send_throttle():
+    """超过RREF_SEND_BURST的批量订阅按RREF_SEND_RATE限速"""
+    print("🪣 测试RREF令牌桶限速...")
+    clock = _Clock(0.0, float('inf'))
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += max(seconds, 1e-9)   # 虚拟时钟按1ns分辨率前进 (浮点误差下的极短等待也要推进时间)
+
+    udp = _fake_udp(clock)
+    udp.send_bucket = TokenBucket(RREF_SEND_RATE, RREF_SEND_BURST, clock=clock.monotonic, sleep=sleep)
+    extra = 100
+    udp.add_datarefs([f'sim/test/dataref{i}' for i in range(RREF_SEND_BURST + extra)], freq=5)
+
+    times = udp.socket.times
+    assert len(times) == RREF_SEND_BURST + extra
+    assert all(t == 0.0 for t in times[:RREF_SEND_BURST])   # 突发额度内不等待
+    assert times[RREF_SEND_BURST] > 0.0
+    assert abs(times[-1] - extra / RREF_SEND_RATE) < 1e-6
+    assert all(0 < seconds <= 1.0 / RREF_SEND_RATE + 1e-12 for seconds in sleeps)
+
+    # 空闲后令牌恢复，但不超过突发上限
+    clock.now += 10.0
+    bucket = udp.send_bucket
+    sleeps.clear()
+    for _ in range(RREF_SEND_BURST):
+        bucket.consume()
+    assert not sleeps
+    bucket.consume()
+    assert len(sleeps) >= 1
+    print(f"✅ 超出突发的 {extra} 个请求用时 {times[-1] * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    test_receive_loop_recovery()
+    test_recover_stops_with_receiver()
+    test_start_failure_returns_false()
+    test_not_ready_broadcast()
+    test_dataref_registry()
+    test_resubscribe_and_unsubscribe()
+    test_rref_send_throttle()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+交通数据源和共享交通目标表
+不同来源 (X-Plane TCAS、录制的ADS-B轨迹、脚本场景、另一台模拟器) 把目标写入
+同一个以ICAO地址为key的目标表，广播端每周期只处理表中的活跃目标。
+"""
+
+import time
+
+from spatial_index import SpatialGrid
+from expiry import TimingWheel
+
+DEFAULT_STALE_AFTER = 30.0   # 超过该时间 (秒) 没有更新的目标被移出目标表
+
+class TrafficRecord:
+    """目标表中的一个交通目标 (接口与main.TrafficTarget兼容: icao_address/data/sample_time)"""
+
+    __slots__ = ('icao_address', 'data', 'sample_time', 'last_update', 'source', 'last_sent_cycle')
+
+    def __init__(self, icao_address, source):
+        self.icao_address = icao_address
+        self.data = {
+            'lat': 0.0, 'lon': 0.0, 'alt': 0.0, 'speed': 0.0,
+            'track': 0.0, 'vs': 0.0, 'callsign': f'I{icao_address & 0xFFFF:04X}'
+        }
+        self.sample_time = 0.0   # 位置样本时间 (用于航位推算)
+        self.last_update = 0.0   # 最近一次写入的时间 (用于过期)
+        self.source = source     # 写入该目标的数据源名称
+        self.last_sent_cycle = 0 # 最近一次被TrafficSelector选中的周期 (超出发送预算时轮流发送)
+
+class TrafficTable:
+    """以ICAO地址为key的大容量交通目标表，O(1)写入/查找，附带空间索引"""
+
+    def __init__(self, stale_after=DEFAULT_STALE_AFTER):
+        self.stale_after = stale_after
+        self.records = {}             # ICAO地址 -> TrafficRecord
+        self.index = SpatialGrid()    # 以ICAO地址为key的空间索引
+        self.expiry = TimingWheel()   # 过期时间轮，expire只处理到期的目标
+
+    @property
+    def version(self):
+        """活跃目标集合的版本号，目标加入或移除时递增"""
+        return self.expiry.version
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, icao_address):
+        return icao_address in self.records
+
+    def get(self, icao_address):
+        return self.records.get(icao_address)
+
+    def upsert(self, icao_address, fields, sample_time=None, source='unknown', now=None):
+        """
+        插入或更新一个目标
+
+        fields: 要更新的数据字段 (lat/lon/alt/speed/track/vs/callsign 的任意子集)
+        sample_time: 位置样本时间，默认等于now
+        """
+        if now is None:
+            now = time.time()
+        record = self.records.get(icao_address)
+        if record is None:
+            record = TrafficRecord(icao_address, source)
+            self.records[icao_address] = record
+        record.data.update(fields)
+        record.sample_time = now if sample_time is None else sample_time
+        record.last_update = now
+        record.source = source
+        self.index.update(icao_address, record.data['lat'], record.data['lon'])
+        self.expiry.touch(icao_address, now + self.stale_after)
+        return record
+
+    def remove(self, icao_address):
+        """删除一个目标，不存在时忽略"""
+        if self.records.pop(icao_address, None) is not None:
+            self.index.remove(icao_address)
+            self.expiry.discard(icao_address)
+
+    def expire(self, now=None):
+        """移除超过stale_after没有更新的目标 (精度一个tick)，返回被移除的ICAO地址列表"""
+        if now is None:
+            now = time.time()
+        expired = self.expiry.advance(now)
+        records = self.records
+        for icao in expired:
+            del records[icao]
+            self.index.remove(icao)
+        return expired
+
+    def active_records(self):
+        """返回全部活跃目标 (已过期的目标在expire时移除)"""
+        return list(self.records.values())
+
+class TrafficSource:
+    """交通数据源接口: 每个周期把新数据写入共享目标表"""
+
+    name = 'source'
+
+    def poll(self, table, now):
+        """把截至now的新数据写入table，返回本次写入的目标数"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放数据源占用的资源"""
+        pass
+
+# =============================================================================
+# 录制轨迹回放数据源 (CSV / JSON Lines)
+# =============================================================================
+
+TRACK_FIELDS = ('timestamp', 'icao', 'lat', 'lon', 'alt', 'speed', 'track', 'vs', 'callsign')
+
+def _parse_icao(value):
+    """ICAO地址可以是整数、'0xABCDEF' 或 'ABCDEF'"""
+    if isinstance(value, int):
+        return value & 0xFFFFFF
+    text = str(value).strip()
+    if text.lower().startswith('0x'):
+        text = text[2:]
+    return int(text, 16) & 0xFFFFFF
+
+def _track_record(row):
+    """把一行CSV/JSON转换为 (timestamp, icao, fields)"""
+    fields = {}
+    for key in ('lat', 'lon', 'alt', 'speed', 'track', 'vs'):
+        value = row.get(key)
+        if value not in (None, ''):
+            fields[key] = float(value)
+    callsign = row.get('callsign')
+    if callsign:
+        fields['callsign'] = str(callsign).strip()[:8]
+    return float(row['timestamp']), _parse_icao(row['icao']), fields
+
+def read_track_file(path):
+    """
+    流式读取轨迹文件，逐条生成 (timestamp, icao, fields)
+
+    根据扩展名选择格式: .jsonl/.json 为每行一个JSON对象，其余按带表头的CSV读取。
+    .gz/.bz2/.xz 压缩的文件边解压边读取 (按去掉压缩扩展名后的扩展名选择格式)。
+    文件按行读取，不会整体载入内存；格式错误的行被跳过。
+    """
+    import csv
+    import json
+    from gdl90_logrotate import open_log, strip_compression
+
+    with open_log(path, 'rt', encoding='utf-8', newline='') as f:
+        if strip_compression(path).endswith(('.jsonl', '.json')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            try:
+                yield _track_record(row)
+            except (KeyError, ValueError, TypeError):
+                continue
+
+class TrackFileSource(TrafficSource):
+    """
+    按录制时间回放轨迹文件的交通数据源
+
+    文件中的时间戳需要单调递增 (秒，任意起点)。speed为回放倍速 (0.5x-50x)，
+    seek为从录制起点跳过的秒数。每次poll只读到当前回放时刻为止。
+    """
+
+    name = 'replay'
+    MIN_SPEED = 0.5
+    MAX_SPEED = 50.0
+
+    def __init__(self, path, speed=1.0, seek=0.0, loop=False):
+        if not self.MIN_SPEED <= speed <= self.MAX_SPEED:
+            raise ValueError(f"回放倍速必须在 {self.MIN_SPEED}-{self.MAX_SPEED} 之间")
+        self.path = path
+        self.speed = speed
+        self.seek_offset = seek
+        self.loop = loop
+        self.updates = 0          # 已写入目标表的更新数
+        self.finished = False
+        self._open()
+
+    def _open(self):
+        self._records = read_track_file(self.path)
+        self._pending = next(self._records, None)
+        self._origin = self._pending[0] if self._pending else 0.0
+        self._wall_start = None
+        if self.seek_offset > 0:
+            self._skip_to(self._origin + self.seek_offset)
+
+    def _skip_to(self, timestamp):
+        """跳过timestamp之前的记录 (流式，不回读)"""
+        while self._pending is not None and self._pending[0] < timestamp:
+            self._pending = next(self._records, None)
+
+    def replay_time(self, now):
+        """当前墙钟时间对应的录制时间"""
+        if self._wall_start is None:
+            self._wall_start = now
+        return self._origin + self.seek_offset + (now - self._wall_start) * self.speed
+
+    def poll(self, table, now):
+        if self.finished:
+            return 0
+        target_time = self.replay_time(now)
+        count = 0
+        while self._pending is not None and self._pending[0] <= target_time:
+            timestamp, icao, fields = self._pending
+            # 样本时间换算回墙钟，航位推算据此推算到发送时刻
+            sample_time = self._wall_start + (timestamp - self._origin - self.seek_offset) / self.speed
+            table.upsert(icao, fields, sample_time=sample_time, source=self.name, now=now)
+            count += 1
+            self._pending = next(self._records, None)
+
+        if self._pending is None:
+            if self.loop:
+                self._records.close()
+                self._open()
+            else:
+                self.finished = True
+        self.updates += count
+        return count
+
+    def close(self):
+        self._records.close()
+        self.finished = True
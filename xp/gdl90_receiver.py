@@ -5,6 +5,8 @@ Receives GDL90 messages from X-Plane plugin and extracts aircraft information
 Based on working GDL90 implementation and standard traffic report format
 """
 
+import os
+import sys
 import socket
 import struct
 import threading
@@ -12,7 +14,15 @@ import time
 import json
 import binascii
 from dataclasses import dataclass
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+
+# Shared modules (spatial index, expiry, ...) live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spatial_index import SpatialGrid
+from expiry import TimingWheel
+from gdl90_framing import FrameSplitter
+
+AIRCRAFT_STALE_AFTER = 30.0  # Drop aircraft not heard from for this many seconds
 
 
 @dataclass
@@ -74,9 +84,38 @@ class GDL90Parser:
         0x6e17, 0x7e36, 0x4e55, 0x5e74, 0x2e93, 0x3eb2, 0x0ed1, 0x1ef0,
     )
     
-    def __init__(self):
+    def __init__(self, stale_after: float = AIRCRAFT_STALE_AFTER):
         self.aircraft: Dict[int, AircraftData] = {}
+        self.index = SpatialGrid()  # Spatial index over self.aircraft, keyed by mode_s_id
+        self.expiry = TimingWheel()  # Expiry deadlines for self.aircraft, keyed by mode_s_id
+        self.stale_after = stale_after
         self.message_count = 0
+        # Guards aircraft/index/expiry: the receive thread updates them while callers
+        # (e.g. an EFB thread) run the receiver's query methods
+        self.lock = threading.Lock()
+    
+    @property
+    def aircraft_version(self) -> int:
+        """Incremented whenever an aircraft is added or expired"""
+        return self.expiry.version
+    
+    def track_aircraft(self, aircraft: AircraftData):
+        """Store the latest report for an aircraft and update the spatial index"""
+        with self.lock:
+            self.aircraft[aircraft.mode_s_id] = aircraft
+            self.index.update(aircraft.mode_s_id, aircraft.latitude, aircraft.longitude)
+            self.expiry.touch(aircraft.mode_s_id, aircraft.timestamp + self.stale_after)
+    
+    def expire_aircraft(self, now: Optional[float] = None) -> List[int]:
+        """Drop aircraft whose last report is older than stale_after; returns their IDs"""
+        if now is None:
+            now = time.time()
+        with self.lock:
+            expired = self.expiry.advance(now)
+            for mode_s_id in expired:
+                del self.aircraft[mode_s_id]
+                self.index.remove(mode_s_id)
+        return expired
         
     def calculate_crc(self, data: bytes) -> int:
         """Calculate GDL90 CRC-16-CCITT (using working implementation method)"""
@@ -385,7 +424,7 @@ class GDL90Receiver:
             if self.debug:
                 print("🔍 Debug mode enabled - showing detailed message info")
             
-            buffer = b""  # Buffer to handle partial messages
+            splitter = FrameSplitter()  # Carries partial frames across datagrams
             
             while self.running:
                 try:
@@ -397,35 +436,18 @@ class GDL90Receiver:
                     self.message_count += 1
                     current_time = time.time()
                     self.last_message_time = current_time
+                    self.parser.expire_aircraft(current_time)
                     
                     if self.debug:
                         print(f"📥 Raw UDP data from {addr}: {len(data)} bytes")
                         print(f"   Hex: {binascii.hexlify(data).decode()}")
                         
-                    # Add to buffer
-                    buffer += data
-                    
-                    # Process all complete messages in buffer
-                    while self.FLAG_BYTE in buffer:
-                        # Find start of message
-                        start_idx = buffer.find(self.parser.FLAG_BYTE)
-                        if start_idx == -1:
-                            break
-                            
-                        # Find end of message (next flag byte after start)
-                        end_idx = buffer.find(self.parser.FLAG_BYTE, start_idx + 1)
-                        if end_idx == -1:
-                            break  # Incomplete message, wait for more data
-                            
-                        # Extract complete message
-                        message = buffer[start_idx:end_idx + 1]
-                        buffer = buffer[end_idx + 1:]  # Remove processed message
-                        
-                        # Parse the message
+                    # Process every complete frame in the datagram (single scan, no copies)
+                    for message in splitter.feed(data):
                         aircraft = self.parser.parse_message(message)
                         if aircraft:
-                            # Update aircraft dictionary
-                            self.parser.aircraft[aircraft.mode_s_id] = aircraft
+                            # Update aircraft dictionary and spatial index
+                            self.parser.track_aircraft(aircraft)
                             
                             # Call callback if set
                             if self.aircraft_callback:
@@ -441,6 +463,7 @@ class GDL90Receiver:
                                       f"ID: {aircraft.mode_s_id:06X}")
                         
                 except socket.timeout:
+                    self.parser.expire_aircraft()  # Keep expiring while the sender is silent
                     continue  # Continue loop, allows for graceful shutdown
                 except Exception as e:
                     print(f"Error receiving data: {e}")
@@ -461,12 +484,38 @@ class GDL90Receiver:
     
     def get_aircraft_list(self) -> List[AircraftData]:
         """Get list of current aircraft"""
-        return list(self.parser.aircraft.values())
+        with self.parser.lock:
+            return list(self.parser.aircraft.values())
+    
+    # The query methods may run on any thread; they hold the parser lock so the receive
+    # thread cannot update or expire aircraft while the index is being walked
+    
+    def get_aircraft_within(self, lat: float, lon: float, radius_nm: float) -> List[Tuple[AircraftData, float]]:
+        """Get (aircraft, distance_nm) pairs within radius_nm, closest first"""
+        parser = self.parser
+        with parser.lock:
+            aircraft = parser.aircraft
+            return [(aircraft[key], dist) for key, dist in parser.index.query_radius(lat, lon, radius_nm)]
+    
+    def get_aircraft_in_bbox(self, lat_min: float, lon_min: float,
+                             lat_max: float, lon_max: float) -> List[AircraftData]:
+        """Get aircraft inside a lat/lon bounding box (lon_min > lon_max crosses the antimeridian)"""
+        parser = self.parser
+        with parser.lock:
+            aircraft = parser.aircraft
+            return [aircraft[key] for key in parser.index.query_bbox(lat_min, lon_min, lat_max, lon_max)]
+    
+    def get_nearest_aircraft(self, lat: float, lon: float, count: int) -> List[Tuple[AircraftData, float]]:
+        """Get the nearest count (aircraft, distance_nm) pairs, e.g. for an EFB overlay"""
+        parser = self.parser
+        with parser.lock:
+            aircraft = parser.aircraft
+            return [(aircraft[key], dist) for key, dist in parser.index.nearest(lat, lon, count)]
     
     def get_aircraft_json(self) -> str:
         """Get aircraft data as JSON string"""
         aircraft_list = []
-        for aircraft in self.parser.aircraft.values():
+        for aircraft in self.get_aircraft_list():
             aircraft_dict = {
                 'callsign': aircraft.callsign,
                 'latitude': aircraft.latitude,